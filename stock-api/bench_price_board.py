@@ -0,0 +1,95 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+from price_board import normalize_price_board
+
+
+def make_price_board(rows):
+    """Tạo DataFrame price_board giả lập với MultiIndex columns giống vnstock 3.x"""
+    rng = np.random.default_rng(42)
+    symbols = [f"S{i:04d}" for i in range(rows)]
+    ref_price = rng.integers(5_000, 150_000, rows).astype(float)
+    match_price = ref_price * (1 + rng.uniform(-0.07, 0.07, rows)).round(3)
+    match_price[::10] = 0  # Một số mã chưa khớp lệnh
+    columns = pd.MultiIndex.from_tuples([
+        ('listing', 'symbol'), ('listing', 'exchange'), ('listing', 'ref_price'),
+        ('match', 'match_price'), ('match', 'avg_match_price'),
+        ('match', 'accumulated_volume'), ('match', 'match_vol')
+    ])
+    data = {
+        ('listing', 'symbol'): symbols,
+        ('listing', 'exchange'): rng.choice(["HOSE", "HNX", "UPCOM"], rows),
+        ('listing', 'ref_price'): ref_price,
+        ('match', 'match_price'): match_price,
+        ('match', 'avg_match_price'): match_price,
+        ('match', 'accumulated_volume'): rng.integers(0, 10_000_000, rows),
+        ('match', 'match_vol'): rng.integers(0, 10_000, rows),
+    }
+    return pd.DataFrame(data, columns=columns), symbols
+
+
+def legacy_iterrows(price_data, symbols):
+    """Cách chuyển đổi cũ: iterrows() và row.get(...) cho từng dòng"""
+    result = []
+    for idx, row in price_data.iterrows():
+        symbol_val = (row.get(('listing', 'symbol')) or row.get('symbol') or
+                      symbols[idx] if idx < len(symbols) else 'N/A')
+        price_val = (row.get(('match', 'match_price')) or
+                     row.get(('match', 'avg_match_price')) or
+                     row.get('close') or row.get('price') or 0)
+        match_price = row.get(('match', 'match_price'), 0)
+        ref_price = row.get(('listing', 'ref_price'), 0)
+        change_val = float(match_price - ref_price) if match_price and ref_price else 0
+        volume_val = (row.get(('match', 'accumulated_volume')) or
+                      row.get(('match', 'match_vol')) or
+                      row.get('volume') or 0)
+        pct_change = 0
+        if ref_price and ref_price > 0 and change_val != 0:
+            pct_change = round((change_val / ref_price) * 100, 2)
+        result.append({
+            "symbol": str(symbol_val),
+            "price": float(price_val) if price_val else 0,
+            "change": float(change_val) if change_val else 0,
+            "pct_change": pct_change,
+            "volume": int(volume_val) if volume_val else 0,
+        })
+    return result
+
+
+def best_of(fn, repeat=5):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def bench_price_board(rows=1500):
+    """So sánh thời gian chuyển đổi price_board giữa iterrows và bản vectorized"""
+    print(f"Benchmark chuyển đổi price_board với {rows} dòng")
+    price_data, symbols = make_price_board(rows)
+
+    legacy = legacy_iterrows(price_data, symbols)
+    vectorized = normalize_price_board(price_data, symbols)
+
+    # Kiểm tra hai cách cho cùng kết quả
+    fields = ("symbol", "price", "change", "pct_change", "volume")
+    mismatches = sum(
+        1 for old, new in zip(legacy, vectorized)
+        if any(old[f] != new[f] for f in fields)
+    )
+    print(f"  Số dòng khác biệt: {mismatches}")
+
+    legacy_time = best_of(lambda: legacy_iterrows(price_data, symbols))
+    vectorized_time = best_of(lambda: normalize_price_board(price_data, symbols))
+
+    print(f"  iterrows:   {legacy_time * 1000:.2f} ms")
+    print(f"  vectorized: {vectorized_time * 1000:.2f} ms")
+    print(f"  Tăng tốc:   {legacy_time / vectorized_time:.1f}x")
+
+
+if __name__ == "__main__":
+    bench_price_board()
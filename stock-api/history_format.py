@@ -0,0 +1,112 @@
+"""
+Chuyển DataFrame OHLCV của Quote.history thành dữ liệu JSON.
+
+Việc ép kiểu và định dạng ngày được thực hiện trên cả cột thay vì từng dòng,
+hỗ trợ hai dạng kết quả:
+- "records": list các dict {"date", "open", "high", "low", "close", "volume", ...}
+- "columnar": dict các list {"date": [...], "open": [...], ...} (gọn hơn cho biểu đồ)
+"""
+import numpy as np
+import pandas as pd
+
+PRICE_FIELDS = ("open", "high", "low", "close")
+OPTIONAL_FIELDS = ("change", "pct_change")
+HISTORY_SHAPES = ("records", "columnar")
+
+
+def history_dates(df):
+    """
+    Định dạng cột ngày của dữ liệu lịch sử.
+
+    Ưu tiên cột 'time' (vnstock 3.x), nếu không có thì dùng index.
+    Dữ liệu intraday (có giờ phút) được giữ nguyên phần giờ.
+
+    Returns:
+        List chuỗi ngày theo thứ tự dòng
+    """
+    raw = df['time'] if 'time' in df.columns else df.index.to_series(index=df.index)
+    dates = pd.to_datetime(raw, errors='coerce')
+    if dates.isna().all():
+        return [str(value) for value in raw.tolist()]
+
+    has_time = bool((dates.dropna() != dates.dropna().dt.normalize()).any())
+    formatted = dates.dt.strftime('%Y-%m-%d %H:%M:%S' if has_time else '%Y-%m-%d')
+    # Giá trị không chuyển được sang ngày thì giữ dạng chuỗi gốc
+    return formatted.where(dates.notna(), raw.astype(str)).tolist()
+
+
+def slice_history(df, start_date, end_date):
+    """
+    Cắt DataFrame lịch sử theo đúng khoảng ngày [start_date, end_date].
+
+    Dùng tìm kiếm nhị phân (np.searchsorted) trên cột ngày đã sắp xếp thay vì
+    lọc bằng mặt nạ trên toàn bộ dữ liệu; ngày kết thúc được tính trọn ngày
+    để giữ các nến intraday của ngày đó.
+
+    Args:
+        df: DataFrame do Quote.history trả về
+        start_date: Ngày bắt đầu 'YYYY-MM-DD'
+        end_date: Ngày kết thúc 'YYYY-MM-DD'
+
+    Returns:
+        DataFrame chỉ gồm các dòng trong khoảng yêu cầu, sắp xếp theo ngày
+    """
+    if df is None or df.empty:
+        return df
+    raw = df['time'] if 'time' in df.columns else df.index.to_series(index=df.index)
+    dates = pd.to_datetime(raw, errors='coerce')
+    if dates.isna().any():
+        return df
+    values = dates.to_numpy(dtype='datetime64[ns]')
+    if not dates.is_monotonic_increasing:
+        order = np.argsort(values, kind='stable')
+        df, values = df.iloc[order], values[order]
+    lo = np.searchsorted(values, np.datetime64(start_date, 'D'), side='left')
+    hi = np.searchsorted(values, np.datetime64(end_date, 'D') + np.timedelta64(1, 'D'), side='left')
+    return df.iloc[lo:hi]
+
+
+def history_columns(df):
+    """
+    Ép kiểu các cột OHLCV theo lô.
+
+    Returns:
+        Dict {tên trường: list giá trị} theo thứ tự trường trả về
+    """
+    count = len(df)
+    columns = {"date": history_dates(df)}
+    for field in PRICE_FIELDS:
+        if field in df.columns:
+            values = pd.to_numeric(df[field], errors='coerce').to_numpy(dtype=np.float64, na_value=0.0)
+        else:
+            values = np.zeros(count, dtype=np.float64)
+        columns[field] = values.tolist()
+
+    if 'volume' in df.columns:
+        volume = pd.to_numeric(df['volume'], errors='coerce').to_numpy(dtype=np.float64, na_value=0.0)
+        columns["volume"] = volume.astype(np.int64).tolist()
+    else:
+        columns["volume"] = [0] * count
+
+    for field in OPTIONAL_FIELDS:
+        if field in df.columns:
+            columns[field] = pd.to_numeric(df[field], errors='coerce').to_numpy(dtype=np.float64, na_value=0.0).tolist()
+    return columns
+
+
+def serialize_history(df, shape="records"):
+    """
+    Chuyển DataFrame lịch sử giá sang dạng JSON.
+
+    Args:
+        df: DataFrame do Quote.history trả về
+        shape: "records" (mặc định) hoặc "columnar"
+
+    Returns:
+        List dict (records) hoặc dict các list (columnar)
+    """
+    columns = history_columns(df)
+    if shape == "columnar":
+        return columns
+    keys = tuple(columns.keys())
+    return [dict(zip(keys, values)) for values in zip(*columns.values())]
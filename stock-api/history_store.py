@@ -0,0 +1,313 @@
+"""
+Kho lịch sử giá OHLCV lưu trên đĩa theo từng nguồn/khung thời gian/mã.
+
+Nến ngày đã qua không thay đổi nên chỉ cần tải một lần. Mỗi mã được lưu thành
+một file .npz dạng cột (time, open, high, low, close, volume) kèm khoảng ngày đã
+được tải (coverage). Khi có request, kho chỉ gọi upstream cho phần còn thiếu ở
+đầu (trước coverage) và phần đuôi (từ nến cuối cùng, để cập nhật nến đang hình
+thành), sau đó ghép vào file và trả về đúng khoảng yêu cầu.
+
+Chỉ nến ngày được lưu; nến tuần/tháng được gộp từ nến ngày khi đọc, vì nến
+tuần/tháng tải ở biên khoảng bất kỳ chỉ là một phần của kỳ và không ghép được.
+"""
+import asyncio
+import os
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from logging_config import get_logger
+from trading_calendar import VN_TZ, TradingCalendar
+
+logger = get_logger("history_store")
+
+# Các khung phục vụ từ kho (1W/1M gộp từ 1D); dữ liệu intraday luôn lấy trực tiếp
+STORE_INTERVALS = ("1D", "1W", "1M")
+VALUE_COLUMNS = ("open", "high", "low", "close", "volume")
+ONE_DAY = np.timedelta64(1, "D")
+# Một ngày thứ Hai dùng làm mốc chia tuần
+_MONDAY = np.datetime64("1969-12-29", "D")
+
+
+def empty_arrays():
+    arrays = {"time": np.array([], dtype="datetime64[D]")}
+    for column in VALUE_COLUMNS:
+        arrays[column] = np.array([], dtype=np.float64)
+    return arrays
+
+
+def frame_to_arrays(df):
+    """
+    Chuyển DataFrame của Quote.history thành dict các mảng NumPy sắp xếp theo ngày.
+
+    Returns:
+        Dict {"time": datetime64[D], "open": float64, ...}, mỗi ngày xuất hiện một lần
+    """
+    if df is None or df.empty:
+        return empty_arrays()
+
+    raw = df['time'] if 'time' in df.columns else df.index.to_series(index=df.index)
+    dates = pd.to_datetime(raw, errors='coerce')
+    valid = dates.notna().to_numpy()
+    arrays = {"time": dates.to_numpy()[valid].astype("datetime64[D]")}
+    for column in VALUE_COLUMNS:
+        if column in df.columns:
+            values = pd.to_numeric(df[column], errors='coerce').to_numpy(dtype=np.float64, na_value=0.0)
+            arrays[column] = values[valid]
+        else:
+            arrays[column] = np.zeros(int(valid.sum()), dtype=np.float64)
+    return merge_arrays(empty_arrays(), arrays)
+
+
+def merge_arrays(old, new):
+    """
+    Ghép hai bộ mảng theo ngày; ngày trùng nhau thì giữ giá trị của `new`.
+
+    Returns:
+        Dict mảng đã sắp xếp tăng dần theo ngày, không trùng ngày
+    """
+    times = np.concatenate([old["time"], new["time"]])
+    # Sắp xếp ổn định: với ngày trùng, bản ghi của `new` đứng sau và được giữ lại
+    order = np.argsort(times, kind="stable")
+    sorted_times = times[order]
+    keep = np.ones(len(sorted_times), dtype=bool)
+    keep[:-1] = sorted_times[1:] != sorted_times[:-1]
+    index = order[keep]
+
+    merged = {"time": times[index]}
+    for column in VALUE_COLUMNS:
+        merged[column] = np.concatenate([old[column], new[column]])[index]
+    return merged
+
+
+def period_start(date, interval):
+    """Ngày đầu kỳ (thứ Hai của tuần / ngày 1 của tháng) chứa date; giữ nguyên với 1D."""
+    if interval == "1W":
+        return date - (date - _MONDAY).astype(np.int64) % 7
+    if interval == "1M":
+        return date.astype("datetime64[M]").astype("datetime64[D]")
+    return date
+
+
+def resample_arrays(arrays, interval):
+    """
+    Gộp nến ngày thành nến tuần (bắt đầu thứ Hai) hoặc tháng.
+
+    Mỗi nến gộp mang ngày giao dịch đầu tiên của kỳ; open của ngày đầu, close
+    của ngày cuối, high/low lớn nhất/nhỏ nhất và tổng volume.
+
+    Returns:
+        Dict mảng cùng dạng với đầu vào (giữ nguyên với 1D)
+    """
+    times = arrays["time"]
+    if interval not in ("1W", "1M") or not len(times):
+        return arrays
+    if interval == "1W":
+        keys = (times - _MONDAY).astype(np.int64) // 7
+    else:
+        keys = times.astype("datetime64[M]").astype(np.int64)
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    ends = np.r_[starts[1:], len(times)] - 1
+    return {
+        "time": times[starts],
+        "open": arrays["open"][starts],
+        "high": np.maximum.reduceat(arrays["high"], starts),
+        "low": np.minimum.reduceat(arrays["low"], starts),
+        "close": arrays["close"][ends],
+        "volume": np.add.reduceat(arrays["volume"], starts),
+    }
+
+
+def arrays_to_frame(arrays):
+    """Tạo DataFrame (cột 'time' + OHLCV) từ dict mảng, cùng dạng với Quote.history."""
+    data = {"time": pd.to_datetime(arrays["time"])}
+    for column in VALUE_COLUMNS:
+        data[column] = arrays[column]
+    df = pd.DataFrame(data)
+    df["volume"] = df["volume"].astype(np.int64)
+    return df
+
+
+def _today():
+    return np.datetime64(datetime.now(VN_TZ).date(), "D")
+
+
+class HistoryStore:
+    """
+    Kho lịch sử giá trên đĩa với cơ chế lấp khoảng trống tăng dần.
+
+    Args:
+        root: Thư mục lưu dữ liệu
+        fetcher: Coroutine function (symbol, source, start, end, interval) -> tuple
+            (DataFrame, nguồn đã trả dữ liệu), với start/end là chuỗi 'YYYY-MM-DD'.
+            Dữ liệu do nguồn khác (fallback) trả về chỉ được dùng cho request hiện
+            tại, không ghi vào file của nguồn được yêu cầu
+        tail_ttl: Số giây giữ phần đuôi khi khoảng yêu cầu chạm tới hôm nay
+            (nến của phiên hiện tại vẫn đang thay đổi)
+        calendar: TradingCalendar; ngoài phiên, phần đuôi chỉ cần tải lại nếu
+            lần tải trước diễn ra trước khi phiên gần nhất kết thúc
+    """
+
+    def __init__(self, root, fetcher, tail_ttl=60.0, calendar=None):
+        self.root = root
+        self._fetcher = fetcher
+        self.tail_ttl = tail_ttl
+        self.calendar = calendar or TradingCalendar()
+        self._locks = {}
+        self.hits = 0
+        self.partial = 0
+        self.misses = 0
+
+    def _path(self, symbol, source, interval):
+        return os.path.join(self.root, str(source).upper(), interval, f"{symbol.upper()}.npz")
+
+    @staticmethod
+    def _read_file(path):
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                arrays = {"time": data["time"].astype("datetime64[D]")}
+                for column in VALUE_COLUMNS:
+                    arrays[column] = data[column]
+                coverage = data["coverage"].astype("datetime64[D]")
+                fetched_at = float(data["fetched_at"])
+        except Exception as e:
+            logger.warning("Không đọc được file lịch sử %s: %s", path, e)
+            return None
+        return arrays, (coverage[0], coverage[1]), fetched_at
+
+    @staticmethod
+    def _write_file(path, arrays, coverage, fetched_at):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, coverage=np.array(coverage, dtype="datetime64[D]"),
+                     fetched_at=np.float64(fetched_at), **arrays)
+        os.replace(tmp_path, path)
+
+    async def _fetch(self, symbol, source, start, end, interval):
+        """
+        Tải nến trong khoảng [start, end].
+
+        Returns:
+            Tuple (dict mảng, có được lưu hay không): chỉ lưu khi nguồn được yêu
+            cầu trả về ít nhất một nến, để coverage không bao trùm khoảng trả về rỗng
+            và file của một nguồn không chứa nến của nguồn khác
+        """
+        df, answered = await self._fetcher(symbol, source, str(start), str(end), interval)
+        arrays = frame_to_arrays(df)
+        storable = len(arrays["time"]) > 0 and str(answered).upper() == str(source).upper()
+        return arrays, storable
+
+    async def get(self, symbol, source, start_date, end_date, interval="1D"):
+        """
+        Lấy lịch sử giá trong khoảng [start_date, end_date], ưu tiên đọc từ đĩa.
+
+        Args:
+            symbol: Mã chứng khoán
+            source: Nguồn dữ liệu
+            start_date: Ngày bắt đầu 'YYYY-MM-DD'
+            end_date: Ngày kết thúc 'YYYY-MM-DD'
+            interval: Một trong STORE_INTERVALS
+
+        Returns:
+            DataFrame (cột 'time' + OHLCV) chỉ gồm các nến trong khoảng yêu cầu
+        """
+        return arrays_to_frame(await self.get_arrays(symbol, source, start_date, end_date, interval))
+
+    async def get_arrays(self, symbol, source, start_date, end_date, interval="1D"):
+        """
+        Như get() nhưng trả về dict mảng NumPy thay vì DataFrame.
+
+        Với 1W/1M, nến ngày được lấy từ đầu kỳ chứa start_date rồi gộp lại, nên
+        nến đầu tiên là nến đủ kỳ và có thể mang ngày trước start_date.
+
+        Returns:
+            Dict {"time": datetime64[D], "open": float64, ...} chỉ gồm các nến trong khoảng yêu cầu
+        """
+        start = period_start(np.datetime64(start_date, "D"), interval)
+        end = np.datetime64(end_date, "D")
+        return resample_arrays(await self._get_daily(symbol.upper(), source, start, end), interval)
+
+    async def _get_daily(self, symbol, source, start, end):
+        interval = "1D"
+        today = _today()
+        path = self._path(symbol, source, interval)
+        loop = asyncio.get_running_loop()
+
+        # Nến không được lưu (nguồn fallback hoặc khoảng rỗng): chỉ dùng cho request này
+        served = []
+        lock = self._locks.setdefault(path, asyncio.Lock())
+        async with lock:
+            stored = await loop.run_in_executor(None, self._read_file, path)
+            if stored is None:
+                arrays, changed = await self._fetch(symbol, source, start, end, interval)
+                coverage = (start, min(end, today))
+                fetched_at = time.time()
+                self.misses += 1
+            else:
+                arrays, coverage, fetched_at = stored
+                changed = False
+
+                # Phần đầu còn thiếu
+                if start < coverage[0]:
+                    head, storable = await self._fetch(symbol, source, start, coverage[0] - ONE_DAY, interval)
+                    if storable:
+                        arrays = merge_arrays(arrays, head)
+                        coverage = (start, coverage[1])
+                        changed = True
+                    else:
+                        served.append(head)
+
+                # Phần đuôi: tải lại từ nến cuối cùng để cập nhật nến chưa hoàn tất
+                tail_stale = coverage[1] >= today and self._tail_stale(fetched_at)
+                # (ngày sau hôm nay chưa có nến nên chỉ xét tới hôm nay)
+                if min(end, today) > coverage[1] or (end >= today and tail_stale):
+                    tail_start = arrays["time"][-1] if len(arrays["time"]) else coverage[1]
+                    tail, storable = await self._fetch(symbol, source, min(tail_start, end), end, interval)
+                    if storable:
+                        arrays = merge_arrays(arrays, tail)
+                        coverage = (coverage[0], max(coverage[1], min(end, today)))
+                        fetched_at = time.time()
+                        changed = True
+                    else:
+                        served.append(tail)
+
+                if changed or served:
+                    self.partial += 1
+                else:
+                    self.hits += 1
+
+            if changed:
+                try:
+                    await loop.run_in_executor(None, self._write_file, path, arrays, coverage, fetched_at)
+                except OSError as e:
+                    logger.warning("Không ghi được file lịch sử %s: %s", path, e)
+
+        for extra in served:
+            arrays = merge_arrays(arrays, extra)
+
+        # Mảng đã sắp xếp theo ngày: cắt bằng tìm kiếm nhị phân
+        lo = np.searchsorted(arrays["time"], start, side="left")
+        hi = np.searchsorted(arrays["time"], end, side="right")
+        return {column: values[lo:hi] for column, values in arrays.items()}
+
+    def _tail_stale(self, fetched_at):
+        if self.calendar.is_open():
+            return time.time() - fetched_at >= self.tail_ttl
+        last_close = self.calendar.last_close()
+        return last_close is not None and fetched_at < last_close.timestamp()
+
+    def stats(self):
+        """Thống kê số lần đọc hoàn toàn từ đĩa, phải tải thêm một phần hoặc tải mới."""
+        total = self.hits + self.partial + self.misses
+        return {
+            "root": self.root,
+            "hits": self.hits,
+            "partial": self.partial,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0
+        }
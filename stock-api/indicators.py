@@ -0,0 +1,289 @@
+"""
+Chỉ báo kỹ thuật (SMA, EMA, RSI, MACD, Bollinger Bands) tính trên lịch sử giá đã cache.
+
+Các chỉ báo được tính trên cả mảng giá đóng cửa bằng NumPy: chỉ báo theo cửa sổ
+(SMA, Bollinger) dùng sliding_window_view, chỉ báo đệ quy (EMA, RSI, MACD) dùng
+kernel EMA tính theo khối bằng cumsum thay vì lặp từng nến.
+
+Kết quả được cache theo (mã, nguồn, khung thời gian, chỉ báo, tham số). Khi có nến
+mới hoặc nến cuối thay đổi, chỉ phần từ nến khác biệt đầu tiên được tính lại từ
+trạng thái đã lưu (giá trị EMA/trung bình của nến trước đó) thay vì cả chuỗi.
+"""
+import math
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Giới hạn chu kỳ của một chỉ báo (số nến)
+MAX_PERIOD = 500
+
+# Số ngày lịch trung bình cho một nến (dùng để lùi ngày bắt đầu lấy thêm nến khởi động)
+_BAR_DAYS = {"1D": 1.5, "1W": 7, "1M": 31}
+
+
+def _window(close, period, start, reduce):
+    """
+    Giá trị reduce(cửa sổ) cho các nến từ start trở đi, NaN khi chưa đủ period nến.
+
+    Chỉ các cửa sổ kết thúc tại nến >= start được tính.
+    """
+    n = len(close)
+    out = np.full(n - start, np.nan)
+    lo = max(0, start - period + 1)
+    if n - lo < period:
+        return out
+    values = reduce(sliding_window_view(close[lo:], period))
+    first = lo + period - 1
+    begin = max(start, first)
+    out[begin - start:] = values[begin - first:]
+    return out
+
+
+def _ema_kernel(values, alpha, prev):
+    """
+    y[i] = alpha * x[i] + (1 - alpha) * y[i - 1] với y[-1] = prev.
+
+    Trong mỗi khối, y[j] = d^(j+1) * (prev + alpha * cumsum(x[i] / d^(i+1))) với
+    d = 1 - alpha; kích thước khối được chọn để d^khối không nhỏ hơn 1e-100.
+    """
+    decay = 1.0 - alpha
+    if decay <= 0.0:
+        return values.astype(np.float64, copy=True)
+    block = int(min(1024, max(1, 100 / -math.log10(decay))))
+    powers = decay ** np.arange(1, block + 1)
+    out = np.empty(len(values))
+    for s in range(0, len(values), block):
+        x = values[s:s + block]
+        p = powers[:len(x)]
+        y = p * (prev + alpha * np.cumsum(x / p))
+        out[s:s + len(x)] = y
+        prev = y[-1]
+    return out
+
+
+def _ema(values, period, prev, start, alpha=None):
+    """
+    EMA khởi đầu bằng trung bình của period giá trị hợp lệ đầu tiên (bỏ qua NaN ở đầu).
+
+    Args:
+        values: Toàn bộ chuỗi đầu vào
+        period: Chu kỳ
+        prev: Chuỗi EMA đã tính cho các nến trước start (None khi tính từ đầu)
+        start: Nến đầu tiên cần tính
+        alpha: Hệ số làm trơn (mặc định 2 / (period + 1))
+
+    Returns:
+        Mảng EMA cho các nến từ start trở đi
+    """
+    n = len(values)
+    out = np.full(n - start, np.nan)
+    valid = np.flatnonzero(~np.isnan(values))
+    if len(valid) < period:
+        return out
+    seed_index = valid[0] + period - 1
+    alpha = 2.0 / (period + 1) if alpha is None else alpha
+    if prev is not None and start > seed_index:
+        begin, last = start, prev[start - 1]
+    else:
+        last = values[valid[0]:seed_index + 1].mean()
+        out[seed_index - start] = last
+        begin = seed_index + 1
+    out[begin - start:] = _ema_kernel(values[begin:], alpha, last)
+    return out
+
+
+def _prev(prev, column):
+    return None if prev is None else prev[column]
+
+
+def sma(close, prev, start, period):
+    return {"sma": _window(close, period, start, lambda w: w.mean(axis=1))}
+
+
+def ema(close, prev, start, period):
+    return {"ema": _ema(close, period, _prev(prev, "ema"), start)}
+
+
+def rsi(close, prev, start, period):
+    # Wilder: trung bình lãi/lỗ làm trơn với alpha = 1 / period
+    diff = np.diff(close, prepend=np.nan)
+    avg_gain = _ema(np.maximum(diff, 0.0), period, _prev(prev, "_avg_gain"), start, alpha=1.0 / period)
+    avg_loss = _ema(np.maximum(-diff, 0.0), period, _prev(prev, "_avg_loss"), start, alpha=1.0 / period)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        value = 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
+    value = np.where(avg_loss == 0, np.where(avg_gain == 0, 50.0, 100.0), value)
+    return {"rsi": value, "_avg_gain": avg_gain, "_avg_loss": avg_loss}
+
+
+def macd(close, prev, start, fast, slow, signal):
+    ema_fast = _ema(close, fast, _prev(prev, "_ema_fast"), start)
+    ema_slow = _ema(close, slow, _prev(prev, "_ema_slow"), start)
+    line = ema_fast - ema_slow
+    full_line = line if prev is None else np.concatenate([prev["macd"], line])
+    signal_line = _ema(full_line, signal, _prev(prev, "signal"), start)
+    return {"macd": line, "signal": signal_line, "histogram": line - signal_line,
+            "_ema_fast": ema_fast, "_ema_slow": ema_slow}
+
+
+def bollinger(close, prev, start, period, std):
+    middle = _window(close, period, start, lambda w: w.mean(axis=1))
+    deviation = _window(close, period, start, lambda w: w.std(axis=1))
+    return {"upper": middle + std * deviation, "middle": middle, "lower": middle - std * deviation}
+
+
+# Tên chỉ báo -> (hàm tính, tham số mặc định, số nến khởi động theo tham số)
+INDICATORS = {
+    "sma": (sma, {"period": 20}, lambda p: p["period"]),
+    "ema": (ema, {"period": 20}, lambda p: 4 * p["period"]),
+    "rsi": (rsi, {"period": 14}, lambda p: 8 * p["period"]),
+    "macd": (macd, {"fast": 12, "slow": 26, "signal": 9}, lambda p: 4 * (p["slow"] + p["signal"])),
+    "bollinger": (bollinger, {"period": 20, "std": 2.0}, lambda p: p["period"]),
+}
+
+
+def indicator_params(name, **given):
+    """
+    Tham số của một chỉ báo: giá trị được truyền (khác None) ghi đè mặc định.
+
+    Raises:
+        ValueError: Chỉ báo không hỗ trợ hoặc tham số không hợp lệ
+
+    Returns:
+        Dict tham số theo thứ tự khai báo
+    """
+    if name not in INDICATORS:
+        raise ValueError(f"Không hỗ trợ chỉ báo '{name}'")
+    defaults = INDICATORS[name][1]
+    params = {key: default if given.get(key) is None else type(default)(given[key])
+              for key, default in defaults.items()}
+    for key, value in params.items():
+        if key != "std" and not 1 <= value <= MAX_PERIOD:
+            raise ValueError(f"Tham số {key} của {name} phải trong khoảng 1-{MAX_PERIOD}")
+    if name == "bollinger" and params["std"] <= 0:
+        raise ValueError("Tham số std của bollinger phải lớn hơn 0")
+    if name == "macd" and params["fast"] >= params["slow"]:
+        raise ValueError("Tham số fast của macd phải nhỏ hơn slow")
+    return params
+
+
+def warmup_start(start_date, bars, interval):
+    """Ngày bắt đầu lấy lịch sử sao cho có khoảng `bars` nến trước start_date."""
+    days = math.ceil(bars * _BAR_DAYS.get(interval, 1.5)) + 10
+    return (datetime.strptime(start_date, "%Y-%m-%d") - timedelta(days=days)).strftime("%Y-%m-%d")
+
+
+def _common_prefix(times, close, new_times, new_close):
+    n = min(len(times), len(new_times))
+    differs = (times[:n] != new_times[:n]) | (close[:n] != new_close[:n])
+    index = np.flatnonzero(differs)
+    return int(index[0]) if len(index) else n
+
+
+class IndicatorEngine:
+    """
+    Tính và cache chỉ báo trên lịch sử giá.
+
+    Args:
+        loader: Coroutine function (symbol, source, start, end, interval) -> dict mảng
+            {"time": datetime64[D], "close": float64, ...} sắp xếp theo ngày
+        max_entries: Số chuỗi chỉ báo tối đa giữ trong cache (LRU)
+    """
+
+    def __init__(self, loader, max_entries=512):
+        self._loader = loader
+        self.max_entries = max_entries
+        # key -> (ngày bắt đầu, time, close, kết quả)
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.incremental = 0
+        self.full = 0
+
+    def _compute(self, key, anchor, times, close, name, params):
+        entry = self._entries.get(key)
+        start = 0
+        if entry is not None and entry[0] == anchor:
+            start = _common_prefix(entry[1], entry[2], times, close)
+            if start == len(times):
+                # Không có nến mới: dùng lại (một phần đầu của) chuỗi đã tính
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return {column: values[:start] for column, values in entry[3].items()}
+
+        compute = INDICATORS[name][0]
+        if start:
+            prev = {column: values[:start] for column, values in entry[3].items()}
+            tail = compute(close, prev, start, **params)
+            result = {column: np.concatenate([prev[column], values]) for column, values in tail.items()}
+            self.incremental += 1
+        else:
+            result = compute(close, None, 0, **params)
+            self.full += 1
+
+        self._entries[key] = (anchor, times, close, result)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return result
+
+    async def get(self, symbol, source, interval, name, params, start_date, end_date):
+        """
+        Chỉ báo của một mã trong khoảng [start_date, end_date].
+
+        Args:
+            name: Tên chỉ báo trong INDICATORS
+            params: Dict tham số (xem indicator_params)
+
+        Returns:
+            Như get_many()
+        """
+        return await self.get_many(symbol, source, interval, {name: params}, start_date, end_date)
+
+    async def get_many(self, symbol, source, interval, requested, start_date, end_date):
+        """
+        Nhiều chỉ báo của một mã trong khoảng [start_date, end_date], tính trên cùng một lần tải lịch sử.
+
+        Lịch sử được lấy một lần từ trước start_date đủ số nến khởi động của chỉ báo
+        cần nhiều nến nhất; nếu chuỗi đã cache bắt đầu sớm hơn thì dùng lại điểm bắt
+        đầu đó để chỉ phải tính phần nến mới.
+
+        Args:
+            requested: Dict {tên chỉ báo: dict tham số (xem indicator_params)}
+
+        Returns:
+            Tuple (mảng ngày, dict {cột: mảng giá trị}) chỉ gồm các nến trong khoảng
+            yêu cầu, mọi cột cùng độ dài với mảng ngày; giá trị chưa xác định (chưa
+            đủ nến) là NaN
+        """
+        keys = {name: (symbol, source.upper(), interval, name, tuple(params.items()))
+                for name, params in requested.items()}
+        anchor = None
+        for name, params in requested.items():
+            candidate = warmup_start(start_date, INDICATORS[name][2](params), interval)
+            entry = self._entries.get(keys[name])
+            if entry is not None and entry[0] < candidate:
+                candidate = entry[0]
+            anchor = candidate if anchor is None else min(anchor, candidate)
+
+        arrays = await self._loader(symbol, source, anchor, end_date, interval)
+        times, close = arrays["time"], arrays["close"]
+
+        lo = np.searchsorted(times, np.datetime64(start_date, "D"), side="left")
+        hi = np.searchsorted(times, np.datetime64(end_date, "D"), side="right")
+        columns = {"close": close[lo:hi]}
+        for name, params in requested.items():
+            result = self._compute(keys[name], anchor, times, close, name, params)
+            columns.update({column: values[lo:hi] for column, values in result.items() if not column.startswith("_")})
+        return times[lo:hi], columns
+
+    def stats(self):
+        total = self.hits + self.incremental + self.full
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "incremental": self.incremental,
+            "full": self.full,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0
+        }
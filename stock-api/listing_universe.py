@@ -0,0 +1,162 @@
+"""
+Danh sách công ty niêm yết (listing universe) được giữ trong bộ nhớ.
+
+Danh sách được tải một lần, làm mới định kỳ bằng task chạy nền và phục vụ theo
+kiểu stale-while-revalidate: request luôn nhận ngay bản đang có (kể cả khi đã cũ)
+trong khi bản mới được tải ở nền, nên endpoint không bao giờ phải chờ tải listing.
+Có thể lưu thêm ra file để lần khởi động sau có dữ liệu ngay.
+"""
+import asyncio
+import os
+import time
+
+import pandas as pd
+
+from logging_config import get_logger
+
+logger = get_logger("listing")
+
+
+class ListingUniverse:
+    """
+    Bộ nhớ đệm cho bảng listing_companies.
+
+    Args:
+        loader: Coroutine function không tham số, trả về DataFrame listing
+        refresh_interval: Chu kỳ làm mới (giây)
+        cache_file: Đường dẫn file lưu listing (tuỳ chọn)
+    """
+
+    def __init__(self, loader, refresh_interval=6 * 3600, cache_file=None):
+        self._loader = loader
+        self.refresh_interval = refresh_interval
+        self.cache_file = cache_file
+        self._df = None
+        self._loaded_at = None
+        self._refresh_task = None
+        self._loop_task = None
+        self.refresh_count = 0
+        self.version = 0
+        self.last_error = None
+
+    @property
+    def age(self):
+        """Số giây kể từ lần tải gần nhất (None nếu chưa có dữ liệu)."""
+        if self._loaded_at is None:
+            return None
+        return time.monotonic() - self._loaded_at
+
+    def expires_in(self):
+        """Số giây tới lần làm mới kế tiếp (0 nếu đã cũ hoặc chưa có dữ liệu)."""
+        if self._df is None:
+            return 0.0
+        return max(0.0, self.refresh_interval - self.age)
+
+    def is_stale(self):
+        return self._df is None or self.age >= self.refresh_interval
+
+    def set(self, df, age=0.0):
+        """Đặt dữ liệu listing (ví dụ từ file hoặc snapshot) với tuổi cho trước (giây)."""
+        self._df = df
+        self._loaded_at = time.monotonic() - age
+        self.version += 1
+
+    def load_file(self):
+        """
+        Đọc listing từ file nếu có.
+
+        Returns:
+            True nếu đọc thành công
+        """
+        if not self.cache_file or not os.path.exists(self.cache_file):
+            return False
+        try:
+            df = pd.read_pickle(self.cache_file)
+        except Exception as e:
+            logger.warning("Không đọc được listing cache %s: %s", self.cache_file, e)
+            return False
+        self.set(df, age=max(0.0, time.time() - os.path.getmtime(self.cache_file)))
+        logger.info("Đã nạp %d công ty niêm yết từ %s", len(df), self.cache_file)
+        return True
+
+    def _save_file(self, df):
+        if not self.cache_file:
+            return
+        tmp_path = f"{self.cache_file}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.cache_file) or ".", exist_ok=True)
+            df.to_pickle(tmp_path)
+            os.replace(tmp_path, self.cache_file)
+        except Exception as e:
+            logger.warning("Không ghi được listing cache %s: %s", self.cache_file, e)
+
+    async def refresh(self):
+        """
+        Tải lại listing từ upstream và cập nhật bộ nhớ (và file nếu có cấu hình).
+
+        Returns:
+            DataFrame listing mới, hoặc bản cũ nếu tải lỗi
+        """
+        try:
+            df = await self._loader()
+        except Exception as e:
+            self.last_error = str(e)
+            logger.warning("Làm mới listing_companies thất bại: %s", e)
+            return self._df
+
+        if df is not None and not df.empty:
+            self.set(df)
+            self.refresh_count += 1
+            self.last_error = None
+            await asyncio.get_running_loop().run_in_executor(None, self._save_file, df)
+        return self._df
+
+    def _refresh_in_background(self):
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.ensure_future(self.refresh())
+
+    async def get(self):
+        """
+        Lấy listing hiện có ngay lập tức.
+
+        Nếu dữ liệu đã cũ hoặc chưa có, một lần làm mới được khởi chạy ở nền;
+        request hiện tại vẫn nhận bản cũ (hoặc None khi chưa từng tải được).
+
+        Returns:
+            DataFrame listing hoặc None
+        """
+        if self.is_stale():
+            self._refresh_in_background()
+        return self._df
+
+    async def _run(self):
+        while True:
+            if self.is_stale():
+                # Dùng chung lần làm mới với get() nếu đang có một lần chạy dở
+                self._refresh_in_background()
+                await asyncio.shield(self._refresh_task)
+            await asyncio.sleep(min(self.refresh_interval, 60) if self._df is None else self.refresh_interval)
+
+    def start(self):
+        """Nạp file (nếu có) và khởi chạy task làm mới định kỳ."""
+        self.load_file()
+        if self._loop_task is None:
+            self._loop_task = asyncio.ensure_future(self._run())
+
+    def stop(self):
+        """Dừng task làm mới định kỳ."""
+        if self._loop_task is not None:
+            self._loop_task.cancel()
+            self._loop_task = None
+
+    def stats(self):
+        """Thông tin trạng thái listing cache."""
+        return {
+            "loaded": self._df is not None,
+            "rows": 0 if self._df is None else len(self._df),
+            "age": None if self.age is None else round(self.age, 1),
+            "refresh_interval": self.refresh_interval,
+            "refresh_count": self.refresh_count,
+            "version": self.version,
+            "last_error": self.last_error
+        }
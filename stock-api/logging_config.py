@@ -0,0 +1,115 @@
+"""
+Cấu hình logging cho Stock API.
+
+Thay cho các lệnh print() rải rác: log có cấp độ (LOG_LEVEL), có thể xuất dạng
+JSON (LOG_FORMAT=json) và log debug chi tiết được lấy mẫu theo từng endpoint
+(LOG_DEBUG_SAMPLE_RATE, LOG_DEBUG_SAMPLE_RATES) để không phải trả chi phí
+định dạng dữ liệu lớn cho mọi request trên production.
+"""
+import json
+import logging
+import os
+import random
+import sys
+
+LOGGER_NAME = "stock_api"
+
+# Các thuộc tính chuẩn của LogRecord, không đưa vào phần "extra" của log JSON
+_RECORD_ATTRS = frozenset(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """Định dạng mỗi bản ghi log thành một dòng JSON."""
+
+    def format(self, record):
+        payload = {
+            "time": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                payload[key] = value
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+class Lazy:
+    """
+    Trì hoãn việc tính giá trị cho tới khi log thực sự được định dạng.
+
+    Ví dụ: logger.debug("columns: %s", Lazy(lambda: df.columns.tolist()))
+    """
+
+    __slots__ = ("_fn",)
+
+    def __init__(self, fn):
+        self._fn = fn
+
+    def __str__(self):
+        return str(self._fn())
+
+    __repr__ = __str__
+
+
+def _parse_sample_rates(value):
+    """Đọc chuỗi dạng "realtime=0.1,stocks=0.01" thành dict {endpoint: tỉ lệ}."""
+    rates = {}
+    for part in (value or "").split(","):
+        name, sep, rate = part.partition("=")
+        if sep and name.strip():
+            try:
+                rates[name.strip()] = min(1.0, max(0.0, float(rate)))
+            except ValueError:
+                continue
+    return rates
+
+
+DEBUG_SAMPLE_RATE = float(os.getenv("LOG_DEBUG_SAMPLE_RATE", "1.0"))
+DEBUG_SAMPLE_RATES = _parse_sample_rates(os.getenv("LOG_DEBUG_SAMPLE_RATES"))
+
+
+def setup_logging():
+    """
+    Cấu hình logger của ứng dụng theo biến môi trường.
+
+    Returns:
+        Logger gốc của ứng dụng
+    """
+    logger = logging.getLogger(LOGGER_NAME)
+    if not logger.handlers:
+        handler = logging.StreamHandler(sys.stdout)
+        if os.getenv("LOG_FORMAT", "text").lower() == "json":
+            handler.setFormatter(JsonFormatter())
+        else:
+            handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+        logger.addHandler(handler)
+        logger.propagate = False
+    logger.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+    return logger
+
+
+def get_logger(name=None):
+    """Logger con của ứng dụng (ví dụ get_logger("listing") -> "stock_api.listing")."""
+    return logging.getLogger(f"{LOGGER_NAME}.{name}" if name else LOGGER_NAME)
+
+
+def debug_enabled(logger, endpoint):
+    """
+    Kiểm tra có ghi log debug chi tiết cho request hiện tại hay không.
+
+    Chỉ trả về True khi logger bật cấp DEBUG và request được chọn theo tỉ lệ lấy
+    mẫu của endpoint, nên có thể dùng để bỏ qua hoàn toàn việc chuẩn bị dữ liệu log.
+    """
+    if not logger.isEnabledFor(logging.DEBUG):
+        return False
+    rate = DEBUG_SAMPLE_RATES.get(endpoint, DEBUG_SAMPLE_RATE)
+    return rate >= 1.0 or random.random() < rate
+
+
+def debug_sampled(logger, endpoint, msg, *args):
+    """Ghi log debug cho endpoint theo tỉ lệ lấy mẫu, tham số được định dạng lười."""
+    if debug_enabled(logger, endpoint):
+        logger.debug(msg, *args, extra={"endpoint": endpoint})
@@ -1,17 +1,45 @@
-from fastapi import FastAPI, Query
+from fastapi import FastAPI, Query, Request
+from pydantic import BaseModel
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 import pandas as pd
+import numpy as np
+import asyncio
 from datetime import datetime, timedelta
 import os
 import sys
+import time
 
 # Import vnstock
 import vnstock
 
+from quote_cache import QuoteCache
+from singleflight import SingleFlight, flight_key
+from upstream import UpstreamBusyError, UpstreamExecutor
+from source_router import SourceRouter
+from resilience import UpstreamGuard
+from price_board import normalize_price_board, price_board_columns
+from history_format import HISTORY_SHAPES, serialize_history, slice_history
+from history_store import STORE_INTERVALS, HistoryStore, frame_to_arrays
+from indicators import INDICATORS, IndicatorEngine, indicator_params
+import stock_metadata
+from listing_universe import ListingUniverse
+from quote_stream import QuoteStreamHub, format_event
+from market_poller import MarketPoller
+from snapshot import BoardSnapshot
+from quote_table import SORT_FIELDS
+from responses import FastJSONResponse, ResponseCache, encoded_response, json_response
+from trading_calendar import load_calendar
+from stock_metadata import INDUSTRY_NAMES, INDUSTRY_SYMBOLS, UNCLASSIFIED
+from logging_config import Lazy, debug_enabled, debug_sampled, setup_logging
+
+logger = setup_logging()
+
 app = FastAPI(
     title="Stock API",
     description="API cung cấp thông tin về thị trường chứng khoán Việt Nam",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=FastJSONResponse
 )
 
 # Lấy FRONTEND_URL từ biến môi trường.
@@ -37,7 +65,7 @@ else:
     # Chỉ sử dụng default_local_origins nếu không có FRONTEND_URL (ví dụ: khi chạy local)
     # Trong môi trường production trên Render, FRONTEND_URL NÊN được đặt.
     allowed_origins.extend(default_local_origins)
-    print("Cảnh báo: Biến môi trường FRONTEND_URL không được đặt. Sử dụng origin mặc định cho local development.")
+    logger.warning("Biến môi trường FRONTEND_URL không được đặt. Sử dụng origin mặc định cho local development.")
 
 
 app.add_middleware(
@@ -46,6 +74,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "OPTIONS"], # Hoặc ["*"]
     allow_headers=["*"], # Hoặc chỉ định cụ thể
+    expose_headers=["ETag"], # Cho phép client đọc ETag để gửi If-None-Match
 )
 
 def clean_symbol(symbol_str):
@@ -75,8 +104,377 @@ def clean_symbol(symbol_str):
     
     return str(symbol_str)
 
+# Bytes JSON đã mã hoá của các response dựng từ bảng giá / listing, theo phiên bản dữ liệu
+response_cache = ResponseCache(max_entries=int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "256")))
+
+# Lịch giao dịch dùng chung cho cache và vòng poll
+trading_calendar = load_calendar(os.getenv("TRADING_CALENDAR_FILE"))
+
+# Cache giá dùng chung cho mọi endpoint đọc price_board
+quote_cache = QuoteCache(
+    max_size=int(os.getenv("QUOTE_CACHE_MAX_SIZE", "5000")),
+    ttl=float(os.getenv("QUOTE_CACHE_TTL", "3")),
+    closed_ttl=float(os.getenv("QUOTE_CACHE_CLOSED_TTL") or 0) or None,
+    calendar=trading_calendar
+)
+
+# Giới hạn max-age (giây) gửi cho client/CDN với response giá: ngoài giờ giao dịch
+# TTL của cache có thể kéo dài tới phiên kế tiếp, client vẫn nên hỏi lại (304) định kỳ
+QUOTE_MAX_AGE = int(os.getenv("QUOTE_MAX_AGE", "300"))
+
+def quote_max_age():
+    """max-age cho response dựng từ giá: TTL hiện tại của cache giá, giới hạn bởi QUOTE_MAX_AGE."""
+    return min(quote_cache.current_ttl(), QUOTE_MAX_AGE)
+
+def cacheable_quotes(version, items):
+    """
+    Response giá chỉ được lưu cache và gửi max-age khi dựng trọn từ bảng giá
+    (có version) và không có bản ghi giá cũ, lỗi hay danh sách dự phòng.
+    """
+    return version is not None and bool(items) and not any(item.get("stale") or item.get("error") for item in items)
+
+# Gộp các lời gọi upstream trùng nhau đang chạy đồng thời
+upstream_flight = SingleFlight()
+
+# Thread pool riêng cho các lời gọi vnstock (blocking HTTP)
+upstream = UpstreamExecutor(
+    max_workers=int(os.getenv("UPSTREAM_MAX_WORKERS", "16")),
+    max_queue=int(os.getenv("UPSTREAM_MAX_QUEUE", "64")),
+    timeout=float(os.getenv("UPSTREAM_TIMEOUT", "15"))
+)
+
+def _source_list(value):
+    return [s.strip().upper() for s in value.split(",") if s.strip()]
+
+# Giới hạn tốc độ và circuit breaker cho từng nguồn upstream
+UPSTREAM_RATE_LIMIT = float(os.getenv("UPSTREAM_RATE_LIMIT", "10"))
+UPSTREAM_RATE_BURST = int(os.getenv("UPSTREAM_RATE_BURST", "20"))
+
+def _default_rate_max_wait():
+    # Đủ để mọi lời gọi executor nhận (max_workers + max_queue) đều có lượt trước
+    # khi bị từ chối: fan-out Quote.history theo mã và các lô price_board của
+    # scheduler xếp hàng chờ lượt thay vì lỗi RateLimitedError
+    if UPSTREAM_RATE_LIMIT <= 0:
+        return 0.0
+    capacity = upstream.max_workers + upstream.max_queue
+    return max(1.0, (capacity - UPSTREAM_RATE_BURST) / UPSTREAM_RATE_LIMIT)
+
+upstream_guard = UpstreamGuard(
+    rate=UPSTREAM_RATE_LIMIT,
+    burst=UPSTREAM_RATE_BURST,
+    max_wait=float(os.getenv("UPSTREAM_RATE_MAX_WAIT") or _default_rate_max_wait()),
+    failure_threshold=int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5")),
+    reset_timeout=float(os.getenv("BREAKER_RESET_TIMEOUT", "30"))
+)
+
+# Chọn nguồn dữ liệu theo độ trễ/tỉ lệ lỗi, failover và hedge sang nguồn khác
+source_router = SourceRouter(
+    sources={
+        "history": _source_list(os.getenv("HISTORY_SOURCES", "VCI,TCBS")),
+        "price_board": _source_list(os.getenv("PRICE_BOARD_SOURCES", "VCI,TCBS"))
+    },
+    hedge_factor=float(os.getenv("ROUTER_HEDGE_FACTOR", "3")),
+    hedge_min=float(os.getenv("ROUTER_HEDGE_MIN", "0.3")),
+    hedge_max=float(os.getenv("ROUTER_HEDGE_MAX", "3")),
+    max_hedges=int(os.getenv("ROUTER_MAX_HEDGES", "1")),
+    cooldown=float(os.getenv("ROUTER_COOLDOWN", "30")),
+    passthrough_errors=(UpstreamBusyError,),
+    guard=upstream_guard
+)
+
+@app.on_event("shutdown")
+def shutdown_upstream():
+    upstream.shutdown()
+
+async def _load_listing_companies():
+    return await upstream.run(vnstock.listing_companies)
+
+# Thư mục snapshot bảng giá và listing cho lần khởi động sau; đặt rỗng để tắt
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", "data/snapshot")
+
+# Danh sách công ty niêm yết, làm mới ở nền (stale-while-revalidate)
+listing_universe = ListingUniverse(
+    loader=_load_listing_companies,
+    refresh_interval=float(os.getenv("LISTING_REFRESH_INTERVAL", "21600")),
+    cache_file=os.getenv("LISTING_CACHE_FILE", os.path.join(SNAPSHOT_DIR, "listing.pkl") if SNAPSHOT_DIR else "") or None
+)
+
+@app.on_event("startup")
+async def start_listing_refresh():
+    if hasattr(vnstock, 'listing_companies'):
+        listing_universe.start()
+
+@app.on_event("shutdown")
+def stop_listing_refresh():
+    listing_universe.stop()
+
+def _price_board_upstream(symbols, source):
+    trading = vnstock.Trading(source=source)
+    return trading.price_board(symbols)
+
+def _quote_history_upstream(symbol, source, **kwargs):
+    quote = vnstock.Quote(symbol=symbol, source=source)
+    return quote.history(**kwargs)
+
+async def fetch_quote_history(symbol, source, with_source=False, **kwargs):
+    """
+    Gọi vnstock.Quote(...).history(...) qua source_router và lớp single-flight.
+
+    Args:
+        symbol: Mã chứng khoán
+        source: Nguồn dữ liệu client yêu cầu (được ưu tiên, nguồn khác dùng khi nguồn này lỗi/chậm)
+        with_source: Trả thêm tên nguồn đã trả kết quả
+        kwargs: Tham số truyền cho Quote.history (start/end hoặc period, interval, ...)
+
+    Returns:
+        DataFrame lịch sử giá do vnstock trả về, hoặc tuple (DataFrame, nguồn) khi with_source
+    """
+    params = tuple(sorted(kwargs.items()))
+
+    async def _from(src):
+        key = flight_key("history", src, [symbol], params)
+        return await upstream_flight.do(key, upstream.run, _quote_history_upstream, symbol, src, **kwargs)
+
+    df, answered = await source_router.call("history", _from, preferred=source)
+    return (df, answered) if with_source else df
+
+async def _fetch_history_range(symbol, source, start, end, interval):
+    return await fetch_quote_history(symbol, source, with_source=True, start=start, end=end, interval=interval)
+
+# Kho lịch sử giá trên đĩa; đặt HISTORY_STORE_DIR rỗng để tắt
+HISTORY_STORE_DIR = os.getenv("HISTORY_STORE_DIR", "data/history")
+history_store = HistoryStore(
+    root=HISTORY_STORE_DIR,
+    fetcher=_fetch_history_range,
+    tail_ttl=float(os.getenv("HISTORY_STORE_TAIL_TTL", "60")),
+    calendar=trading_calendar
+) if HISTORY_STORE_DIR else None
+
+async def _load_indicator_history(symbol, source, start, end, interval):
+    if history_store is not None:
+        return await history_store.get_arrays(symbol, source, start, end, interval)
+    df = await fetch_quote_history(symbol, source, start=start, end=end, interval=interval)
+    return frame_to_arrays(slice_history(df, start, end))
+
+# Chỉ báo kỹ thuật tính trên lịch sử giá, cache theo (mã, nguồn, interval, chỉ báo, tham số)
+indicator_engine = IndicatorEngine(
+    loader=_load_indicator_history,
+    max_entries=int(os.getenv("INDICATOR_CACHE_MAX_ENTRIES", "512"))
+)
+
+# Thời gian tối đa client/CDN được giữ response lịch sử (giây)
+HISTORY_MAX_AGE = int(os.getenv("HISTORY_MAX_AGE", "86400"))
+
+def history_max_age(end_date):
+    """
+    max-age cho response lịch sử: khoảng đã kết thúc trước hôm nay không còn đổi,
+    khoảng chạm tới hôm nay được giữ theo TTL của nến cuối (trong phiên) hoặc tới
+    phiên kế tiếp.
+    """
+    if end_date < trading_calendar.now().strftime('%Y-%m-%d'):
+        return HISTORY_MAX_AGE
+    if trading_calendar.is_open():
+        return history_store.tail_ttl if history_store is not None else quote_cache.ttl
+    return min(trading_calendar.seconds_until_open(), HISTORY_MAX_AGE)
+
+# Giới hạn fan-out cho đường fallback Quote.history theo từng mã
+HISTORY_FALLBACK_CONCURRENCY = int(os.getenv("HISTORY_FALLBACK_CONCURRENCY", "8"))
+HISTORY_FALLBACK_TIMEOUT = float(os.getenv("HISTORY_FALLBACK_TIMEOUT", "8"))
+
+async def fetch_latest_history_rows(symbols, source):
+    """
+    Lấy phiên gần nhất từ Quote.history cho nhiều mã song song.
+
+    Dùng làm đường fallback khi Trading.price_board lỗi. Số lời gọi đồng thời bị
+    giới hạn bởi HISTORY_FALLBACK_CONCURRENCY, mỗi mã có timeout riêng
+    (HISTORY_FALLBACK_TIMEOUT) và mã lỗi không làm hỏng kết quả của các mã khác.
+
+    Args:
+        symbols: Danh sách mã chứng khoán
+        source: Nguồn dữ liệu
+
+    Returns:
+        List các tuple (symbol, dòng dữ liệu cuối hoặc None nếu rỗng, lỗi hoặc None)
+        theo đúng thứ tự symbols
+    """
+    semaphore = asyncio.Semaphore(HISTORY_FALLBACK_CONCURRENCY)
+
+    async def _latest(symbol):
+        async with semaphore:
+            try:
+                stock_data = await asyncio.wait_for(
+                    fetch_quote_history(symbol, source, period='1D', interval='1D'),
+                    HISTORY_FALLBACK_TIMEOUT
+                )
+            except asyncio.TimeoutError:
+                return symbol, None, TimeoutError(f"Quá thời gian {HISTORY_FALLBACK_TIMEOUT}s")
+            except Exception as e:
+                return symbol, None, e
+            if stock_data is None or stock_data.empty:
+                return symbol, None, None
+            return symbol, stock_data.iloc[-1], None
+
+    return await asyncio.gather(*[_latest(symbol) for symbol in symbols])
+
+# Tuổi tối đa (giây) của giá gần nhất đã biết được trả về khi upstream lỗi
+STALE_MAX_AGE = float(os.getenv("STALE_MAX_AGE", "86400"))
+
+def last_known_quotes(symbols):
+    """
+    Giá gần nhất đã biết (bảng giá trong bộ nhớ, rồi cache đã hết hạn) cho các mã,
+    mỗi bản ghi được đánh dấu "stale": True.
+    """
+    found = market_poller.last_known(symbols, STALE_MAX_AGE)
+    found.update(quote_cache.get_stale([s for s in symbols if s not in found], STALE_MAX_AGE))
+    return {symbol: {**quote, "stale": True} for symbol, quote in found.items()}
+
+def with_stale(item, quote):
+    """Gắn "stale": true vào bản ghi response dựng từ giá gần nhất đã biết."""
+    if quote.get("stale"):
+        item["stale"] = True
+    return item
+
+async def fetch_price_board(symbols):
+    """
+    Lấy giá cho danh sách mã, ưu tiên đọc từ bảng giá trong bộ nhớ.
+
+    Thứ tự đọc: bảng giá do market_poller cập nhật, cache dùng chung, cuối cùng
+    là upstream cho những mã chưa có ở đâu (hoặc đã hết hạn).
+    Kết quả price_board được chuẩn hoá một lần (vectorized) trước khi lưu cache.
+    Khi upstream lỗi (mọi nguồn lỗi, breaker mở, hết lượt gọi), giá gần nhất đã
+    biết được trả về với "stale": True; chỉ báo lỗi khi không có giá nào.
+
+    Args:
+        symbols: Danh sách mã chứng khoán
+
+    Returns:
+        List bản ghi giá (xem price_board.QUOTE_FIELDS) theo thứ tự mã yêu cầu
+    """
+    symbols = [str(s).upper().strip() for s in symbols]
+    quotes, missing = market_poller.get_many(symbols)
+
+    if missing:
+        # Mã chưa có trên bảng giá sẽ được poll từ lượt sau
+        market_poller.track(missing)
+        cached, missing = quote_cache.get_many(missing)
+        quotes.update(cached)
+
+    if missing:
+        try:
+            price_data, _ = await source_router.call("price_board", lambda src: upstream_flight.do(
+                flight_key("price_board", src, missing), upstream.run, _price_board_upstream, missing, src))
+        except Exception as e:
+            stale = last_known_quotes(missing)
+            if not stale and not quotes:
+                raise
+            logger.warning("price_board lỗi (%s), trả về giá gần nhất đã biết cho %d/%d mã",
+                           e, len(stale), len(missing))
+            quotes.update(stale)
+            return [quotes[s] for s in dict.fromkeys(symbols) if s in quotes]
+        if debug_enabled(logger, "price_board") and price_data is not None:
+            # Chỉ in cột và vài dòng mẫu, không bao giờ in toàn bộ bảng
+            logger.debug("price_board %d mã, columns: %s, sample: %s", len(missing),
+                         price_data.columns.tolist(), price_data.head(3).to_dict(orient="records"),
+                         extra={"endpoint": "price_board"})
+        fetched = {quote["symbol"]: quote for quote in normalize_price_board(price_data, missing)}
+        quote_cache.set_many(fetched)
+        quotes.update(fetched)
+
+    return [quotes[s] for s in dict.fromkeys(symbols) if s in quotes]
+
+async def _poll_price_board(symbols):
+    price_data, _ = await source_router.call("price_board", lambda src: upstream.run(_price_board_upstream, symbols, src))
+    return price_board_columns(price_data, symbols)
+
+# Phát giá thay đổi tới các client của /api/stock/stream
+quote_stream = QuoteStreamHub()
+
+# Bảng giá trong bộ nhớ, cập nhật bởi task poll chạy nền
+market_poller = MarketPoller(
+    fetcher=_poll_price_board,
+    base_symbols=stock_metadata.CLASSIFIED_SYMBOLS,
+    interval=float(os.getenv("MARKET_POLL_INTERVAL", "3")),
+    closed_interval=float(os.getenv("MARKET_POLL_CLOSED_INTERVAL") or 0) or None,
+    batch_size=int(os.getenv("MARKET_POLL_BATCH_SIZE", "300")),
+    max_in_flight=int(os.getenv("MARKET_POLL_MAX_IN_FLIGHT", "4")),
+    track_ttl=float(os.getenv("MARKET_TRACK_TTL", "3600")),
+    max_tracked=int(os.getenv("MARKET_MAX_TRACKED", "3000")),
+    extra_symbols=quote_stream.tracked_symbols,
+    calendar=trading_calendar
+)
+market_poller.add_listener(quote_stream.publish)
+MARKET_POLLER_ENABLED = os.getenv("MARKET_POLLER_ENABLED", "1") not in ("0", "false", "False")
+
+board_snapshot = BoardSnapshot(
+    root=SNAPSHOT_DIR,
+    poller=market_poller,
+    interval=float(os.getenv("SNAPSHOT_INTERVAL", "60")),
+    max_age=float(os.getenv("SNAPSHOT_MAX_AGE", "900"))
+) if SNAPSHOT_DIR else None
+
+@app.on_event("startup")
+async def start_board_snapshot():
+    # Chạy trước start_market_poller để bảng giá có dữ liệu trước lượt poll đầu tiên
+    if board_snapshot is not None:
+        board_snapshot.start()
+
+@app.on_event("shutdown")
+def stop_board_snapshot():
+    if board_snapshot is not None:
+        board_snapshot.stop()
+
+@app.on_event("startup")
+async def start_market_poller():
+    if MARKET_POLLER_ENABLED and hasattr(vnstock, 'Trading'):
+        market_poller.start()
+
+@app.on_event("shutdown")
+def stop_market_poller():
+    market_poller.stop()
+
+# Chia lô price_board cho danh sách mã lớn
+PRICE_BOARD_BATCH_MIN = int(os.getenv("PRICE_BOARD_BATCH_MIN", "20"))
+PRICE_BOARD_BATCH_MAX = int(os.getenv("PRICE_BOARD_BATCH_MAX", "100"))
+PRICE_BOARD_MAX_IN_FLIGHT = int(os.getenv("PRICE_BOARD_MAX_IN_FLIGHT", "8"))
+
+def price_board_batch_size(total):
+    """
+    Chọn kích thước lô sao cho toàn bộ danh sách được gửi trong khoảng một lượt
+    PRICE_BOARD_MAX_IN_FLIGHT lô song song, nhưng vẫn nằm trong
+    [PRICE_BOARD_BATCH_MIN, PRICE_BOARD_BATCH_MAX].
+    """
+    size = -(-total // max(PRICE_BOARD_MAX_IN_FLIGHT, 1))
+    return max(PRICE_BOARD_BATCH_MIN, min(PRICE_BOARD_BATCH_MAX, size))
+
+async def fetch_price_board_batches(symbols):
+    """
+    Lấy price_board cho danh sách mã lớn bằng nhiều lô chạy song song.
+
+    Args:
+        symbols: Danh sách mã chứng khoán
+
+    Returns:
+        List các tuple (danh sách mã của lô, DataFrame hoặc None, lỗi hoặc None)
+        theo đúng thứ tự các lô
+    """
+    batch_size = price_board_batch_size(len(symbols))
+    batches = [symbols[i:i + batch_size] for i in range(0, len(symbols), batch_size)]
+    semaphore = asyncio.Semaphore(PRICE_BOARD_MAX_IN_FLIGHT)
+
+    async def _batch(batch_symbols):
+        async with semaphore:
+            try:
+                return batch_symbols, await fetch_price_board(batch_symbols), None
+            except Exception as e:
+                return batch_symbols, None, e
+
+    return await asyncio.gather(*[_batch(batch) for batch in batches])
+
+STREAM_HEARTBEAT = float(os.getenv("STREAM_HEARTBEAT", "15"))
+STREAM_MAX_SYMBOLS = int(os.getenv("STREAM_MAX_SYMBOLS", "200"))
+
 @app.get("/")
-def read_root():
+async def read_root():
     # Thêm thông tin debug về vnstock
     try:
         vnstock_version = vnstock.__version__ if hasattr(vnstock, '__version__') else "unknown"
@@ -105,16 +503,8 @@ def read_root():
         "message": "Stock API Service - Vietnam Stock Market",
         "total_stocks": "100+ Vietnamese stocks",
         "industries": [
-            "Ngân hàng (15 mã)",
-            "Bất động sản (13 mã)",
-            "Sản xuất & Tiêu dùng (13 mã)",
-            "Thép & Khai khoáng (10 mã)",
-            "Dầu khí (10 mã)",
-            "Công nghệ (10 mã)",
-            "Bán lẻ (10 mã)",
-            "Hàng không & Logistics (10 mã)",
-            "Điện & Tiện ích (10 mã)",
-            "Thực phẩm & Nông nghiệp (10 mã)"
+            f"{INDUSTRY_NAMES[key]} ({len(symbols)} mã)"
+            for key, symbols in stock_metadata.CORE_INDUSTRY_SYMBOLS.items()
         ],
         "endpoints": [
             "/api/price?symbol=CODE&source=TCBS",
@@ -122,8 +512,12 @@ def read_root():
             "/api/stocks/by-industry?industry=banking&limit=20",
             "/api/stocks/all-exchanges?exchange=HOSE&limit=100",
             "/api/stocks/statistics",
+            "/api/stocks/top?by=pct_change&order=desc&limit=10",
             "/api/stock/history?symbol=VNM&source=TCBS&start_date=2024-01-01&end_date=2024-05-01&interval=1D",
+            "/api/stock/indicators?symbol=VNM&indicators=sma,rsi,macd&period=14&interval=1D",
             "/api/stock/realtime?symbols=VNM,VCB,HPG&source=TCBS",
+            "/api/stock/stream?symbols=VNM,VCB,HPG",
+            "/api/cache/stats",
         ],
         "available_sources": ["VCI", "TCBS", "SSI", "DNSE"],
         "cors_origins": allowed_origins,
@@ -138,7 +532,7 @@ def read_root():
     }
 
 @app.get("/api/price")
-def get_stock_price(symbol: str = "VNM", source: str = "TCBS"):
+async def get_stock_price(symbol: str = "VNM", source: str = "TCBS"):
     """
     Lấy giá hiện tại của một mã chứng khoán.
 
@@ -150,12 +544,13 @@ def get_stock_price(symbol: str = "VNM", source: str = "TCBS"):
         Dữ liệu giá cổ phiếu hoặc thông báo lỗi.
     """
     try:
-        # Sử dụng vnstock 3.x class-based API
+        # Không đọc bảng giá trong bộ nhớ: bảng chứa giá khớp lệnh do poller lấy từ
+        # nguồn bất kỳ, còn endpoint này trả giá đóng cửa từ Quote.history của `source`
+        # Sử dụng vnstock 3.x class-based API; nguồn cho từng lời gọi do source_router chọn
         # Thử Quote class để lấy giá realtime
         if hasattr(vnstock, 'Quote'):
             try:
-                quote = vnstock.Quote(symbol=symbol.upper(), source=source)
-                price_data = quote.history(period='1D', interval='1D')
+                price_data = await fetch_quote_history(symbol.upper(), source, period='1D', interval='1D')
 
                 if not price_data.empty:
                     latest_data = price_data.iloc[-1]
@@ -169,48 +564,27 @@ def get_stock_price(symbol: str = "VNM", source: str = "TCBS"):
                         "method": "Quote.history"
                     }
             except Exception as e:
-                print(f"Quote.history failed: {e}")
+                logger.warning("Quote.history failed for %s: %s", symbol, e)
 
         # Thử Trading class
         if hasattr(vnstock, 'Trading'):
             try:
-                trading = vnstock.Trading()
-                price_data = trading.price_board([symbol.upper()])
-
-                if not price_data.empty:
-                    # Debug: In ra cấu trúc dữ liệu price
-                    print(f"Price Trading.price_board columns: {price_data.columns.tolist()}")
-                    print(f"Price Trading.price_board shape: {price_data.shape}")
-                    print(f"Price sample data: {price_data.iloc[0].to_dict()}")
-
-                    latest_data = price_data.iloc[0]
-                    print(f"Price latest_data: {latest_data.to_dict()}")
+                quotes = await fetch_price_board([symbol.upper()])
 
-                    # vnstock 3.x sử dụng MultiIndex columns với format (category, field)
-                    price_val = (latest_data.get(('match', 'match_price')) or
-                                latest_data.get(('match', 'avg_match_price')) or
-                                latest_data.get('close') or latest_data.get('price') or 0)
+                if quotes:
+                    latest_data = quotes[0]
 
-                    # Tính change từ match_price và ref_price
-                    match_price = latest_data.get(('match', 'match_price'), 0)
-                    ref_price = latest_data.get(('listing', 'ref_price'), 0)
-                    change_val = float(match_price - ref_price) if match_price and ref_price else 0
-
-                    volume_val = (latest_data.get(('match', 'accumulated_volume')) or
-                                 latest_data.get(('match', 'match_vol')) or
-                                 latest_data.get('volume') or 0)
-
-                    return {
+                    return with_stale({
                         "symbol": symbol.upper(),
-                        "price": float(price_val) if price_val else 0,
-                        "change": float(change_val) if change_val else 0,
-                        "volume": int(volume_val) if volume_val else 0,
+                        "price": latest_data["price"],
+                        "change": latest_data["change"],
+                        "volume": latest_data["volume"],
                         "source": source,
                         "timestamp": datetime.now().isoformat(),
                         "method": "Trading.price_board"
-                    }
+                    }, latest_data)
             except Exception as e:
-                print(f"Trading.price_board failed: {e}")
+                logger.warning("Trading.price_board failed for %s: %s", symbol, e)
 
         # Fallback: Trả về lỗi với thông tin debug
         return {
@@ -220,11 +594,132 @@ def get_stock_price(symbol: str = "VNM", source: str = "TCBS"):
         }
 
     except Exception as e:
-        print(f"Error fetching stock price for {symbol} from {source}: {e}")
+        logger.exception("Error fetching stock price for %s from %s", symbol, source)
         return {"error": f"Đã xảy ra lỗi khi lấy dữ liệu: {str(e)}"}
 
+# Số mã tối đa trong một request lấy giá theo lô
+PRICE_BATCH_MAX_SYMBOLS = int(os.getenv("PRICE_BATCH_MAX_SYMBOLS", "500"))
+
+class PriceBatchRequest(BaseModel):
+    """Body của POST /api/price/batch."""
+    symbols: list[str]
+    source: str = "TCBS"
+
+async def fetch_prices(symbols, source):
+    """
+    Lấy giá hiện tại cho nhiều mã, mỗi mã một bản ghi cùng dạng với /api/price.
+
+    Toàn bộ danh sách được lấy bằng price_board theo lô (bảng giá trong bộ nhớ,
+    cache, rồi upstream); chỉ những mã price_board không trả về mới lấy riêng
+    bằng Quote.history.
+
+    Args:
+        symbols: Danh sách mã đã chuẩn hoá, không trùng lặp
+        source: Nguồn dữ liệu
+
+    Returns:
+        List bản ghi theo đúng thứ tự symbols, mỗi bản ghi có "status" là "ok" hoặc "error"
+    """
+    timestamp = datetime.now().isoformat()
+    prices = {}
+    errors = {}
+
+    if hasattr(vnstock, 'Trading'):
+        for batch_symbols, quotes, batch_e in await fetch_price_board_batches(symbols):
+            if batch_e is not None:
+                logger.warning("Trading.price_board failed for batch %s-%s: %s", batch_symbols[0], batch_symbols[-1], batch_e)
+                continue
+            for quote in quotes or []:
+                prices[quote["symbol"]] = with_stale({
+                    "symbol": quote["symbol"],
+                    "price": quote["price"],
+                    "change": quote["change"],
+                    "volume": quote["volume"],
+                    "source": source,
+                    "timestamp": timestamp,
+                    "method": "Trading.price_board",
+                    "status": "ok"
+                }, quote)
+
+    missing = [symbol for symbol in symbols if symbol not in prices]
+    if missing and hasattr(vnstock, 'Quote'):
+        for symbol, latest_data, stock_e in await fetch_latest_history_rows(missing, source):
+            if stock_e is not None:
+                errors[symbol] = f"Lỗi: {str(stock_e)}"
+            elif latest_data is not None:
+                prices[symbol] = {
+                    "symbol": symbol,
+                    "price": float(latest_data.get('close', 0)),
+                    "change": float(latest_data.get('change', 0)) if 'change' in latest_data else 0,
+                    "volume": int(latest_data.get('volume', 0)) if 'volume' in latest_data else 0,
+                    "source": source,
+                    "timestamp": timestamp,
+                    "method": "Quote.history",
+                    "status": "ok"
+                }
+
+    return [prices.get(symbol) or {
+        "symbol": symbol,
+        "status": "error",
+        "error": errors.get(symbol, "Không tìm thấy dữ liệu giá cho mã này")
+    } for symbol in symbols]
+
+async def _price_batch_response(symbols, source):
+    symbol_list = list(dict.fromkeys(clean for clean in (s.strip().upper() for s in symbols) if clean))
+    if not symbol_list:
+        return {"error": "Danh sách mã chứng khoán trống", "timestamp": datetime.now().isoformat()}
+    if len(symbol_list) > PRICE_BATCH_MAX_SYMBOLS:
+        return {
+            "error": f"Tối đa {PRICE_BATCH_MAX_SYMBOLS} mã mỗi request (nhận {len(symbol_list)})",
+            "timestamp": datetime.now().isoformat()
+        }
+    debug_sampled(logger, "price_batch", "Lấy giá theo lô cho %d mã", len(symbol_list))
+
+    try:
+        prices = await fetch_prices(symbol_list, source)
+    except Exception as e:
+        logger.exception("Error fetching batch prices from %s", source)
+        return {"error": f"Đã xảy ra lỗi khi lấy dữ liệu: {str(e)}", "timestamp": datetime.now().isoformat()}
+
+    ok = sum(1 for item in prices if item["status"] == "ok")
+    return json_response({
+        "source": source,
+        "count": len(prices),
+        "ok": ok,
+        "errors": len(prices) - ok,
+        "timestamp": datetime.now().isoformat(),
+        "prices": prices
+    })
+
+@app.get("/api/price/batch")
+async def get_stock_prices(symbols: str = Query(..., description="Danh sách mã chứng khoán, phân cách bằng dấu phẩy"),
+                           source: str = Query("TCBS", description="Nguồn dữ liệu")):
+    """
+    Lấy giá hiện tại của nhiều mã chứng khoán trong một request.
+
+    Args:
+        symbols: Danh sách mã chứng khoán, phân cách bằng dấu phẩy
+        source: Nguồn dữ liệu
+
+    Returns:
+        Giá của từng mã (cùng dạng với /api/price) kèm trạng thái "ok"/"error"
+    """
+    return await _price_batch_response(symbols.split(','), source)
+
+@app.post("/api/price/batch")
+async def post_stock_prices(body: PriceBatchRequest):
+    """
+    Lấy giá hiện tại của nhiều mã chứng khoán, danh sách mã gửi trong body JSON
+    (dùng khi danh sách quá dài cho query string).
+
+    Returns:
+        Giá của từng mã (cùng dạng với /api/price) kèm trạng thái "ok"/"error"
+    """
+    return await _price_batch_response(body.symbols, body.source)
+
 @app.get("/api/stocks")
-def get_all_stocks(limit: int = Query(20, description="Số lượng cổ phiếu muốn lấy"),
+async def get_all_stocks(request: Request,
+                  limit: int = Query(20, description="Số lượng cổ phiếu muốn lấy"),
                   source: str = Query("TCBS", description="Nguồn dữ liệu")):
     """
     API lấy danh sách các mã cổ phiếu.
@@ -233,148 +728,50 @@ def get_all_stocks(limit: int = Query(20, description="Số lượng cổ phiế
         Danh sách các mã cổ phiếu và thông tin cơ bản
     """
     try:
-        # Danh sách cổ phiếu Việt Nam theo ngành (đã bổ sung thêm các mã phổ biến)
-        banking_stocks = ["VCB", "BID", "CTG", "TCB", "MBB", "VPB", "ACB", "HDB", "STB", "TPB", "EIB", "SHB", "MSB", "OCB", "LPB", "NAB", "BAB", "ABB", "VBB"]
-        real_estate_stocks = ["VIC", "VHM", "NVL", "VRE", "KDH", "DXG", "PDR", "BCM", "DIG", "HDG", "IJC", "KBC", "SCR", "CEO", "HDC", "NLG", "IDC", "CRE", "TDH"]
-        manufacturing_stocks = ["VNM", "SAB", "MSN", "MML", "VIS", "CII", "DHG", "TRA", "BHN", "KDC", "MCH", "ANV", "SBT", "VCF", "BBC", "TAC", "DPM", "BMP", "VHG"]
-        steel_mining_stocks = ["HPG", "HSG", "NKG", "TLH", "SMC", "VGS", "TVN", "KSB", "POM", "TIS", "DTL", "VCA", "TNA", "VNS", "CSM", "VCS", "SHI", "VGC"]
-        oil_gas_stocks = ["GAS", "PLX", "PVS", "PVD", "PVC", "PVB", "BSR", "OIL", "PVT", "CNG", "PVG", "PSH", "PVX", "PGS", "PGD", "PGC", "PSW", "PGV"]
-        technology_stocks = ["FPT", "CMG", "ELC", "ITD", "SAM", "VGI", "VTC", "VNG", "SFI", "VCS", "CMT", "CMX", "ICT", "TNG", "VTI", "VTS", "VDS", "VGT"]
-        retail_stocks = ["MWG", "PNJ", "DGW", "FRT", "VGR", "AST", "SCS", "VDS", "TNG", "HAG", "FRT", "VRE", "VGC", "VGS", "VGI", "VGT", "VGV", "VGX"]
-        aviation_logistics_stocks = ["VJC", "HVN", "ACV", "VTP", "GMD", "VSC", "TCO", "STG", "TMS", "HAH", "VOS", "VTO", "VTG", "VTS", "VTV", "VTX", "VTY", "VTZ"]
-        utilities_stocks = ["POW", "GEG", "PC1", "NT2", "SBA", "REE", "EVE", "VSH", "BWE", "TBC", "EVG", "EVS", "EVF", "GEX", "HND", "SJD", "QTP", "VSI"]
-        food_agriculture_stocks = ["VHC", "BAF", "LAF", "HNG", "SLS", "FMC", "CAP", "LSS", "ASM", "HAP", "VNF", "VIF", "VCG", "VTF", "VFF", "VGF", "VHF", "VKF"]
-
-        # Kết hợp tất cả các mã cổ phiếu
-        all_symbols = (banking_stocks + real_estate_stocks + manufacturing_stocks +
-                      steel_mining_stocks + oil_gas_stocks + technology_stocks +
-                      retail_stocks + aviation_logistics_stocks + utilities_stocks +
-                      food_agriculture_stocks)
-
-        # Loại bỏ trùng lặp và sắp xếp
-        popular_symbols = sorted(list(set(all_symbols)))
+        # Các mã đã phân ngành, đã loại bỏ trùng lặp và sắp xếp
+        popular_symbols = stock_metadata.CLASSIFIED_SYMBOLS
 
         symbols_to_query = popular_symbols[:limit]
 
+        # Dữ liệu trên bảng giá chưa đổi thì trả lại bytes đã mã hoá
+        cache_key = ("stocks", limit, source)
+        version = market_poller.snapshot_version(symbols_to_query)
+        max_age = quote_max_age()
+        cached = response_cache.get(cache_key, version)
+        if cached is not None:
+            return encoded_response(cached, request, max_age)
+
         stocks = []
 
         # Thử sử dụng Trading class để lấy price_board cho nhiều mã
         if hasattr(vnstock, 'Trading'):
             try:
-                trading = vnstock.Trading()
-                price_data = trading.price_board(symbols_to_query)
-
-                if not price_data.empty:
-                    # Debug: In ra cấu trúc dữ liệu
-                    print(f"Trading.price_board columns: {price_data.columns.tolist()}")
-                    print(f"Trading.price_board shape: {price_data.shape}")
-                    if len(price_data) > 0:
-                        print(f"Sample row data: {price_data.iloc[0].to_dict()}")
-
-                    for idx, row in price_data.iterrows():
-                        # Debug: In ra dữ liệu từng row
-                        print(f"Row {idx}: {row.to_dict()}")
-
-                        # vnstock 3.x sử dụng MultiIndex columns với format (category, field)
-                        symbol_val = (row.get(('listing', 'symbol')) or row.get('symbol') or
-                                     symbols_to_query[idx] if idx < len(symbols_to_query) else 'N/A')
-
-                        price_val = (row.get(('match', 'match_price')) or
-                                    row.get(('match', 'avg_match_price')) or
-                                    row.get('close') or row.get('price') or 0)
-
-                        # Tính change từ match_price và ref_price
-                        match_price = row.get(('match', 'match_price'), 0)
-                        ref_price = row.get(('listing', 'ref_price'), 0)
-                        change_val = float(match_price - ref_price) if match_price and ref_price else 0
-
-                        volume_val = (row.get(('match', 'accumulated_volume')) or
-                                     row.get(('match', 'match_vol')) or
-                                     row.get('volume') or 0)
-
-                        # Tính phần trăm thay đổi
-                        pct_change = 0
-                        if ref_price and ref_price > 0 and change_val != 0:
-                            pct_change = round((change_val / ref_price) * 100, 2)
-
-                        # Xác định ngành dựa trên symbol (case-insensitive)
-                        def get_industry(symbol):
-                            symbol_upper = str(symbol).upper().strip()
-                            print(f"Checking industry for symbol: '{symbol_upper}'")  # Debug log
-
-                            if symbol_upper in banking_stocks:
-                                return "Ngân hàng"
-                            elif symbol_upper in real_estate_stocks:
-                                return "Bất động sản"
-                            elif symbol_upper in manufacturing_stocks:
-                                return "Sản xuất & Tiêu dùng"
-                            elif symbol_upper in steel_mining_stocks:
-                                return "Thép & Khai khoáng"
-                            elif symbol_upper in oil_gas_stocks:
-                                return "Dầu khí"
-                            elif symbol_upper in technology_stocks:
-                                return "Công nghệ"
-                            elif symbol_upper in retail_stocks:
-                                return "Bán lẻ"
-                            elif symbol_upper in aviation_logistics_stocks:
-                                return "Hàng không & Logistics"
-                            elif symbol_upper in utilities_stocks:
-                                return "Điện & Tiện ích"
-                            elif symbol_upper in food_agriculture_stocks:
-                                return "Thực phẩm & Nông nghiệp"
-                            else:
-                                print(f"Symbol '{symbol_upper}' not found in any industry list")  # Debug log
-                                return "Chưa phân loại"
+                quotes = await fetch_price_board(symbols_to_query)
 
+                if quotes:
+                    for quote in quotes:
                         # Tạo dữ liệu cổ phiếu từ price_board
-                        stock_info = {
-                            "symbol": str(symbol_val),
-                            "name": str(symbol_val),
-                            "price": float(price_val) if price_val else 0,
-                            "change": float(change_val) if change_val else 0,
-                            "pct_change": pct_change,
-                            "volume": int(volume_val) if volume_val else 0,
-                            "industry": get_industry(str(symbol_val)),
-                            "exchange": "HOSE"
-                        }
-                        stocks.append(stock_info)
-
-                    print(f"Đã lấy được dữ liệu từ Trading.price_board cho {len(stocks)} cổ phiếu")
+                        stocks.append(with_stale({
+                            "symbol": quote["symbol"],
+                            "name": quote["symbol"],
+                            "price": quote["price"],
+                            "change": quote["change"],
+                            "pct_change": quote["pct_change"],
+                            "volume": quote["volume"],
+                            "industry": stock_metadata.industry_of(quote["symbol"]),
+                            "exchange": stock_metadata.lookup(quote["symbol"]).exchange or "HOSE"
+                        }, quote))
+
+                    debug_sampled(logger, "stocks", "Đã lấy được dữ liệu từ Trading.price_board cho %d cổ phiếu", len(stocks))
 
             except Exception as trading_e:
-                print(f"Trading.price_board failed: {trading_e}")
-
-        # Nếu Trading không hoạt động, thử từng mã một với Quote class
-        if not stocks:
-            for symbol in symbols_to_query:
-                try:
-                    # Thử Quote class
-                    if hasattr(vnstock, 'Quote'):
-                        quote = vnstock.Quote(symbol=symbol, source=source)
-                        stock_data = quote.history(period='1D', interval='1D')
-
-                        if not stock_data.empty:
-                            latest_data = stock_data.iloc[-1]
-
-                            stock_info = {
-                                "symbol": symbol,
-                                "name": symbol,
-                                "price": float(latest_data.get('close', 0)),
-                                "change": float(latest_data.get('change', 0)) if 'change' in latest_data else 0,
-                                "pct_change": 0,
-                                "volume": int(latest_data.get('volume', 0)) if 'volume' in latest_data else 0,
-                                "industry": "Chưa phân loại",
-                                "exchange": "HOSE"
-                            }
-
-                            # Tính phần trăm thay đổi
-                            if stock_info["price"] > 0 and stock_info["change"] != 0:
-                                stock_info["pct_change"] = round((stock_info["change"] / (stock_info["price"] - stock_info["change"])) * 100, 2)
-
-                            stocks.append(stock_info)
-
-                except Exception as stock_e:
-                    print(f"Lỗi khi lấy dữ liệu cho {symbol}: {str(stock_e)}")
+                logger.warning("Trading.price_board failed: %s", trading_e)
+
+        # Nếu Trading không hoạt động, lấy song song từng mã với Quote class
+        if not stocks and hasattr(vnstock, 'Quote'):
+            for symbol, latest_data, stock_e in await fetch_latest_history_rows(symbols_to_query, source):
+                if stock_e is not None:
+                    logger.warning("Lỗi khi lấy dữ liệu cho %s: %s", symbol, stock_e)
                     # Thêm dữ liệu trống cho symbol này
                     stocks.append({
                         "symbol": symbol,
@@ -383,23 +780,44 @@ def get_all_stocks(limit: int = Query(20, description="Số lượng cổ phiế
                         "change": 0,
                         "pct_change": 0,
                         "volume": 0,
-                        "industry": "Chưa phân loại",
-                        "exchange": "HOSE"
+                        "industry": stock_metadata.industry_of(symbol),
+                        "exchange": stock_metadata.lookup(symbol).exchange or "HOSE",
+                        "error": f"Lỗi: {str(stock_e)}"
                     })
+                elif latest_data is not None:
+                    stock_info = {
+                        "symbol": symbol,
+                        "name": symbol,
+                        "price": float(latest_data.get('close', 0)),
+                        "change": float(latest_data.get('change', 0)) if 'change' in latest_data else 0,
+                        "pct_change": 0,
+                        "volume": int(latest_data.get('volume', 0)) if 'volume' in latest_data else 0,
+                        "industry": stock_metadata.industry_of(symbol),
+                        "exchange": stock_metadata.lookup(symbol).exchange or "HOSE"
+                    }
+
+                    # Tính phần trăm thay đổi
+                    if stock_info["price"] > 0 and stock_info["change"] != 0:
+                        stock_info["pct_change"] = round((stock_info["change"] / (stock_info["price"] - stock_info["change"])) * 100, 2)
 
-        print(f"Tổng cộng đã lấy được dữ liệu cho {len(stocks)} cổ phiếu")
+                    stocks.append(stock_info)
+
+        debug_sampled(logger, "stocks", "Tổng cộng đã lấy được dữ liệu cho %d cổ phiếu", len(stocks))
 
         # Sắp xếp theo mã chứng khoán
         stocks.sort(key=lambda x: x["symbol"])
 
-        return {
+        if not cacheable_quotes(version, stocks):
+            version, max_age = None, 0
+
+        return json_response({
             "stocks": stocks,
             "count": len(stocks),
             "timestamp": datetime.now().isoformat(),
             "source": source
-        }
+        }, response_cache, cache_key, version, request, max_age)
     except Exception as e:
-        print(f"Lỗi khi lấy danh sách cổ phiếu: {str(e)}")
+        logger.exception("Lỗi khi lấy danh sách cổ phiếu")
         return {
             "stocks": [],
             "count": 0,
@@ -408,7 +826,8 @@ def get_all_stocks(limit: int = Query(20, description="Số lượng cổ phiế
         }
 
 @app.get("/api/stocks/all-exchanges")
-def get_all_exchange_stocks(exchange: str = Query("all", description="Sàn giao dịch: HOSE, HNX, UPCOM, all"),
+async def get_all_exchange_stocks(request: Request,
+                           exchange: str = Query("all", description="Sàn giao dịch: HOSE, HNX, UPCOM, all"),
                            limit: int = Query(1000, description="Số lượng cổ phiếu muốn lấy"),
                            source: str = Query("TCBS", description="Nguồn dữ liệu")):
     """
@@ -424,16 +843,19 @@ def get_all_exchange_stocks(exchange: str = Query("all", description="Sàn giao
     """
     try:
         all_stocks = []
+        cache_key = ("all_exchanges", exchange.upper(), limit, source)
+        version = None
+        max_age = quote_max_age()
 
         # Thử sử dụng vnstock để lấy danh sách công ty niêm yết
         if hasattr(vnstock, 'listing_companies'):
             try:
-                # Lấy danh sách công ty niêm yết
-                companies_df = vnstock.listing_companies()
+                # Lấy danh sách công ty niêm yết (từ bộ nhớ, làm mới ở nền)
+                companies_df = await listing_universe.get()
 
-                if not companies_df.empty:
-                    print(f"Found {len(companies_df)} companies from listing_companies()")
-                    print(f"Columns: {companies_df.columns.tolist()}")
+                if companies_df is not None and not companies_df.empty:
+                    debug_sampled(logger, "all_exchanges", "Found %d companies from listing_companies(), columns: %s",
+                                  len(companies_df), Lazy(lambda: companies_df.columns.tolist()))
 
                     # Lọc theo sàn giao dịch
                     if exchange.upper() != "ALL":
@@ -460,128 +882,95 @@ def get_all_exchange_stocks(exchange: str = Query("all", description="Sàn giao
                     # Giới hạn số lượng
                     symbols = symbols[:limit]
 
-                    print(f"Extracted {len(symbols)} symbols: {symbols[:10]}...")
-
-                    # Lấy dữ liệu giá cho từng nhóm nhỏ (để tránh timeout)
-                    batch_size = 20
-                    for i in range(0, len(symbols), batch_size):
-                        batch_symbols = symbols[i:i+batch_size]
-
-                        try:
-                            if hasattr(vnstock, 'Trading'):
-                                trading = vnstock.Trading()
-                                price_data = trading.price_board(batch_symbols)
-
-                                if not price_data.empty:
-                                    for idx, row in price_data.iterrows():
-                                        symbol_val = row.get(('listing', 'symbol')) or batch_symbols[idx] if idx < len(batch_symbols) else 'N/A'
-                                        exchange_val = row.get(('listing', 'exchange')) or 'UNKNOWN'
-
-                                        price_val = row.get(('match', 'match_price')) or 0
-                                        match_price = row.get(('match', 'match_price'), 0)
-                                        ref_price = row.get(('listing', 'ref_price'), 0)
-                                        change_val = float(match_price - ref_price) if match_price and ref_price else 0
-                                        volume_val = row.get(('match', 'accumulated_volume')) or 0
-
-                                        pct_change = 0
-                                        if ref_price and ref_price > 0 and change_val != 0:
-                                            pct_change = round((change_val / ref_price) * 100, 2)
-
-                                        stock_info = {
-                                            "symbol": str(symbol_val),
-                                            "name": str(symbol_val),
-                                            "price": float(price_val) if price_val else 0,
-                                            "change": float(change_val) if change_val else 0,
-                                            "pct_change": pct_change,
-                                            "volume": int(volume_val) if volume_val else 0,
-                                            "exchange": str(exchange_val),
-                                            "industry": "Chưa phân loại"
-                                        }
-                                        all_stocks.append(stock_info)
-
-                        except Exception as batch_e:
-                            print(f"Error processing batch {i}-{i+batch_size}: {batch_e}")
-                            # Thêm dữ liệu trống cho batch này
-                            for symbol in batch_symbols:
-                                all_stocks.append({
-                                    "symbol": symbol,
-                                    "name": symbol,
-                                    "price": 0,
-                                    "change": 0,
-                                    "pct_change": 0,
-                                    "volume": 0,
-                                    "exchange": exchange.upper() if exchange.upper() != "ALL" else "UNKNOWN",
-                                    "industry": "Chưa phân loại"
-                                })
+                    debug_sampled(logger, "all_exchanges", "Extracted %d symbols: %s...", len(symbols), Lazy(lambda: symbols[:10]))
+
+                    board_version = market_poller.snapshot_version(symbols)
+                    if board_version is not None:
+                        version = (listing_universe.version, board_version)
+                        cached = response_cache.get(cache_key, version)
+                        if cached is not None:
+                            return encoded_response(cached, request, max_age)
+
+                    # Lấy dữ liệu giá theo từng lô, các lô chạy song song (để tránh timeout)
+                    if hasattr(vnstock, 'Trading'):
+                        for batch_symbols, quotes, batch_e in await fetch_price_board_batches(symbols):
+                            if batch_e is not None:
+                                logger.warning("Error processing batch %s-%s: %s", batch_symbols[0], batch_symbols[-1], batch_e)
+                                # Thêm dữ liệu trống cho batch này
+                                for symbol in batch_symbols:
+                                    all_stocks.append({
+                                        "symbol": symbol,
+                                        "name": symbol,
+                                        "price": 0,
+                                        "change": 0,
+                                        "pct_change": 0,
+                                        "volume": 0,
+                                        "exchange": exchange.upper() if exchange.upper() != "ALL" else "UNKNOWN",
+                                        "industry": stock_metadata.industry_of(symbol)
+                                    })
+                                continue
+
+                            for quote in quotes:
+                                all_stocks.append(with_stale({
+                                    "symbol": quote["symbol"],
+                                    "name": quote["symbol"],
+                                    "price": quote["price"],
+                                    "change": quote["change"],
+                                    "pct_change": quote["pct_change"],
+                                    "volume": quote["volume"],
+                                    "exchange": str(quote["exchange"] or 'UNKNOWN'),
+                                    "industry": stock_metadata.industry_of(quote["symbol"])
+                                }, quote))
 
             except Exception as listing_e:
-                print(f"listing_companies() failed: {listing_e}")
+                logger.warning("listing_companies() failed: %s", listing_e)
 
         # Fallback: Sử dụng danh sách cố định nếu vnstock không hoạt động
-        if not all_stocks:
-            print("Fallback to predefined stock lists...")
-
-            # Danh sách cổ phiếu HOSE phổ biến
-            hose_stocks = [
-                "VCB", "BID", "CTG", "TCB", "MBB", "VPB", "ACB", "HDB", "STB", "TPB",
-                "VIC", "VHM", "NVL", "VRE", "KDH", "DXG", "PDR", "BCM", "DIG", "HDG",
-                "VNM", "SAB", "MSN", "MML", "VIS", "CII", "DHG", "TRA", "BHN", "KDC",
-                "HPG", "HSG", "NKG", "TLH", "SMC", "VGS", "TVN", "KSB", "POM", "TIS",
-                "GAS", "PLX", "PVS", "PVD", "PVC", "PVB", "BSR", "OIL", "PVT", "CNG",
-                "FPT", "CMG", "ELC", "ITD", "SAM", "VGI", "VTC", "VNG", "SFI", "VCS",
-                "MWG", "PNJ", "DGW", "FRT", "VGR", "AST", "SCS", "VDS", "TNG", "HAG",
-                "VJC", "HVN", "ACV", "VTP", "GMD", "VSC", "TCO", "STG", "TMS", "HAH",
-                "POW", "GEG", "PC1", "NT2", "SBA", "REE", "EVE", "VSH", "BWE", "TBC"
-            ]
-
-            # Danh sách cổ phiếu HNX phổ biến
-            hnx_stocks = [
-                "SHB", "MSB", "OCB", "LPB", "EIB", "NAB", "BAB", "ABB", "VBB",
-                "CEO", "HDC", "NLG", "IDC", "CRE", "TDH", "IJC", "KBC", "SCR",
-                "VHC", "BAF", "LAF", "HNG", "SLS", "FMC", "CAP", "LSS", "ASM", "HAP",
-                "DTL", "VCA", "TNA", "VNS", "CSM", "VCS", "SHI", "VGC",
-                "PVG", "PSH", "PVX", "PGS", "PGD", "PGC", "PSW", "PGV",
-                "CMT", "CMX", "ICT", "VTI", "VTS", "VDS", "VGT"
-            ]
+        fallback = not all_stocks
+        if fallback:
+            logger.info("Fallback to predefined stock lists (exchange=%s)", exchange)
 
             # Chọn danh sách theo sàn
             if exchange.upper() == "HOSE":
-                symbols_to_use = hose_stocks
+                symbols_to_use = stock_metadata.HOSE_SYMBOLS
             elif exchange.upper() == "HNX":
-                symbols_to_use = hnx_stocks
+                symbols_to_use = stock_metadata.HNX_SYMBOLS
             else:  # ALL
-                symbols_to_use = hose_stocks + hnx_stocks
+                symbols_to_use = stock_metadata.HOSE_SYMBOLS + stock_metadata.HNX_SYMBOLS
 
             symbols_to_use = symbols_to_use[:limit]
 
             # Tạo dữ liệu fallback
             for symbol in symbols_to_use:
-                exchange_name = "HOSE" if symbol in hose_stocks else "HNX"
+                info = stock_metadata.lookup(symbol)
                 all_stocks.append({
                     "symbol": symbol,
-                    "name": symbol,
+                    "name": info.name,
                     "price": 0,
                     "change": 0,
                     "pct_change": 0,
                     "volume": 0,
-                    "exchange": exchange_name,
-                    "industry": "Chưa phân loại"
+                    "exchange": info.exchange,
+                    "industry": info.industry
                 })
 
         # Sắp xếp theo symbol
         all_stocks.sort(key=lambda x: x["symbol"])
 
-        return {
+        if fallback or not cacheable_quotes(version, all_stocks):
+            version, max_age = None, 0
+
+        return json_response({
             "exchange": exchange.upper(),
             "stocks": all_stocks,
             "count": len(all_stocks),
             "timestamp": datetime.now().isoformat(),
             "source": source,
             "method": "listing_companies" if hasattr(vnstock, 'listing_companies') else "fallback"
-        }
+        }, response_cache, cache_key, version, request, max_age)
 
     except Exception as e:
-        print(f"Error getting all exchange stocks: {e}")
+        logger.exception("Error getting all exchange stocks")
         return {
             "exchange": exchange.upper(),
             "stocks": [],
@@ -591,7 +980,8 @@ def get_all_exchange_stocks(exchange: str = Query("all", description="Sàn giao
         }
 
 @app.get("/api/stocks/by-industry")
-def get_stocks_by_industry(industry: str = Query("all", description="Ngành cần lọc"),
+async def get_stocks_by_industry(request: Request,
+                          industry: str = Query("all", description="Ngành cần lọc"),
                           limit: int = Query(50, description="Số lượng cổ phiếu muốn lấy"),
                           source: str = Query("TCBS", description="Nguồn dữ liệu")):
     """
@@ -606,115 +996,69 @@ def get_stocks_by_industry(industry: str = Query("all", description="Ngành cầ
         Danh sách các mã cổ phiếu theo ngành
     """
     try:
-        # Định nghĩa các ngành
-        industry_mapping = {
-            "banking": ["VCB", "BID", "CTG", "TCB", "MBB", "VPB", "ACB", "HDB", "STB", "TPB", "EIB", "SHB", "MSB", "OCB", "LPB"],
-            "real_estate": ["VIC", "VHM", "NVL", "VRE", "KDH", "DXG", "PDR", "BCM", "DIG", "HDG", "IJC", "KBC", "SCR"],
-            "manufacturing": ["VNM", "SAB", "MSN", "MML", "VIS", "CII", "DHG", "TRA", "BHN", "KDC", "MCH", "ANV", "SBT"],
-            "steel_mining": ["HPG", "HSG", "NKG", "TLH", "SMC", "VGS", "TVN", "KSB", "POM", "TIS"],
-            "oil_gas": ["GAS", "PLX", "PVS", "PVD", "PVC", "PVB", "BSR", "OIL", "PVT", "CNG"],
-            "technology": ["FPT", "CMG", "ELC", "ITD", "SAM", "VGI", "VTC", "VNG", "SFI", "VCS"],
-            "retail": ["MWG", "PNJ", "DGW", "FRT", "VGR", "AST", "SCS", "VDS", "TNG", "HAG"],
-            "aviation_logistics": ["VJC", "HVN", "ACV", "VTP", "GMD", "VSC", "TCO", "STG", "TMS", "HAH"],
-            "utilities": ["POW", "GEG", "PC1", "NT2", "SBA", "REE", "EVE", "VSH", "BWE", "TBC"],
-            "food_agriculture": ["VHC", "BAF", "LAF", "HNG", "SLS", "FMC", "CAP", "LSS", "ASM", "HAP"]
-        }
-
         # Chọn symbols theo ngành
         if industry == "all":
-            symbols_to_query = []
-            for industry_symbols in industry_mapping.values():
-                symbols_to_query.extend(industry_symbols)
-            symbols_to_query = sorted(list(set(symbols_to_query)))[:limit]
-        elif industry in industry_mapping:
-            symbols_to_query = industry_mapping[industry][:limit]
+            symbols_to_query = list(stock_metadata.CORE_CLASSIFIED_SYMBOLS[:limit])
+        elif industry in stock_metadata.CORE_INDUSTRY_SYMBOLS:
+            symbols_to_query = list(stock_metadata.CORE_INDUSTRY_SYMBOLS[industry][:limit])
         else:
             return {
                 "error": f"Ngành '{industry}' không hợp lệ",
-                "available_industries": list(industry_mapping.keys()) + ["all"],
+                "available_industries": list(INDUSTRY_NAMES.keys()) + ["all"],
                 "timestamp": datetime.now().isoformat()
             }
 
+        cache_key = ("by_industry", industry, limit, source)
+        version = market_poller.snapshot_version(symbols_to_query)
+        max_age = quote_max_age()
+        cached = response_cache.get(cache_key, version)
+        if cached is not None:
+            return encoded_response(cached, request, max_age)
+
         # Lấy dữ liệu giống như endpoint /api/stocks
         stocks = []
         if hasattr(vnstock, 'Trading'):
             try:
-                trading = vnstock.Trading()
-                price_data = trading.price_board(symbols_to_query)
-
-                if not price_data.empty:
-                    for idx, row in price_data.iterrows():
-                        symbol_val = row.get(('listing', 'symbol')) or symbols_to_query[idx] if idx < len(symbols_to_query) else 'N/A'
-                        price_val = row.get(('match', 'match_price')) or 0
-                        match_price = row.get(('match', 'match_price'), 0)
-                        ref_price = row.get(('listing', 'ref_price'), 0)
-                        change_val = float(match_price - ref_price) if match_price and ref_price else 0
-                        volume_val = row.get(('match', 'accumulated_volume')) or 0
-
-                        pct_change = 0
-                        if ref_price and ref_price > 0 and change_val != 0:
-                            pct_change = round((change_val / ref_price) * 100, 2)
-
-                        # Xác định ngành (case-insensitive)
-                        stock_industry = "Chưa phân loại"
-                        symbol_upper = str(symbol_val).upper().strip()
-                        print(f"By-industry - Checking industry for symbol: '{symbol_upper}'")  # Debug log
-
-                        for ind_name, ind_symbols in industry_mapping.items():
-                            if symbol_upper in ind_symbols:
-                                industry_names = {
-                                    "banking": "Ngân hàng",
-                                    "real_estate": "Bất động sản",
-                                    "manufacturing": "Sản xuất & Tiêu dùng",
-                                    "steel_mining": "Thép & Khai khoáng",
-                                    "oil_gas": "Dầu khí",
-                                    "technology": "Công nghệ",
-                                    "retail": "Bán lẻ",
-                                    "aviation_logistics": "Hàng không & Logistics",
-                                    "utilities": "Điện & Tiện ích",
-                                    "food_agriculture": "Thực phẩm & Nông nghiệp"
-                                }
-                                stock_industry = industry_names.get(ind_name, "Chưa phân loại")
-                                print(f"By-industry - Found industry '{stock_industry}' for symbol '{symbol_upper}'")  # Debug log
-                                break
-
-                        if stock_industry == "Chưa phân loại":
-                            print(f"By-industry - Symbol '{symbol_upper}' not found in any industry list")  # Debug log
-
-                        stock_info = {
-                            "symbol": str(symbol_val),
-                            "name": str(symbol_val),
-                            "price": float(price_val) if price_val else 0,
-                            "change": float(change_val) if change_val else 0,
-                            "pct_change": pct_change,
-                            "volume": int(volume_val) if volume_val else 0,
-                            "industry": stock_industry,
-                            "exchange": "HOSE"
-                        }
-                        stocks.append(stock_info)
+                quotes = await fetch_price_board(symbols_to_query)
+
+                for quote in quotes:
+                    stocks.append(with_stale({
+                        "symbol": quote["symbol"],
+                        "name": quote["symbol"],
+                        "price": quote["price"],
+                        "change": quote["change"],
+                        "pct_change": quote["pct_change"],
+                        "volume": quote["volume"],
+                        "industry": stock_metadata.core_industry_of(quote["symbol"]),
+                        "exchange": "HOSE"
+                    }, quote))
 
             except Exception as e:
-                print(f"Error getting industry stocks: {e}")
+                logger.warning("Error getting industry stocks (%s): %s", industry, e)
 
-        return {
+        if not cacheable_quotes(version, stocks):
+            version, max_age = None, 0
+
+        return json_response({
             "industry": industry,
             "stocks": stocks,
             "count": len(stocks),
-            "available_industries": list(industry_mapping.keys()) + ["all"],
+            "available_industries": list(INDUSTRY_NAMES.keys()) + ["all"],
             "timestamp": datetime.now().isoformat(),
             "source": source
-        }
+        }, response_cache, cache_key, version, request, max_age)
 
     except Exception as e:
         return {
             "industry": industry,
             "error": f"Lỗi khi lấy dữ liệu ngành: {str(e)}",
-            "available_industries": ["banking", "real_estate", "manufacturing", "steel_mining", "oil_gas", "technology", "retail", "aviation_logistics", "utilities", "food_agriculture", "all"],
+            "available_industries": list(INDUSTRY_NAMES.keys()) + ["all"],
             "timestamp": datetime.now().isoformat()
         }
 
 @app.get("/api/stocks/statistics")
-def get_market_statistics(source: str = Query("TCBS", description="Nguồn dữ liệu")):
+async def get_market_statistics(request: Request,
+                                source: str = Query("TCBS", description="Nguồn dữ liệu")):
     """
     API lấy thống kê tổng quan thị trường chứng khoán Việt Nam.
 
@@ -729,30 +1073,29 @@ def get_market_statistics(source: str = Query("TCBS", description="Nguồn dữ
                 "HNX": 0,
                 "UPCOM": 0
             },
-            "industries": {
-                "Ngân hàng": 0,
-                "Bất động sản": 0,
-                "Sản xuất & Tiêu dùng": 0,
-                "Thép & Khai khoáng": 0,
-                "Dầu khí": 0,
-                "Công nghệ": 0,
-                "Bán lẻ": 0,
-                "Hàng không & Logistics": 0,
-                "Điện & Tiện ích": 0,
-                "Thực phẩm & Nông nghiệp": 0,
-                "Chưa phân loại": 0
-            },
+            "industries": {name: 0 for name in stock_metadata.INDUSTRY_COUNTS},
             "sample_stocks": [],
             "timestamp": datetime.now().isoformat(),
             "source": source
         }
 
+        cache_key = ("statistics", source)
+        version = None
+        max_age = 0
+
         # Thử lấy danh sách từ vnstock
         if hasattr(vnstock, 'listing_companies'):
             try:
-                companies_df = vnstock.listing_companies()
+                companies_df = await listing_universe.get()
+
+                if companies_df is not None and not companies_df.empty:
+                    # Thống kê chỉ phụ thuộc vào listing: chưa làm mới thì dùng lại bytes cũ
+                    version = listing_universe.version
+                    max_age = listing_universe.expires_in()
+                    cached = response_cache.get(cache_key, version)
+                    if cached is not None:
+                        return encoded_response(cached, request, max_age)
 
-                if not companies_df.empty:
                     stats["total_stocks"] = len(companies_df)
 
                     # Đếm theo sàn giao dịch
@@ -762,6 +1105,13 @@ def get_market_statistics(source: str = Query("TCBS", description="Nguồn dữ
                             if exchange.upper() in stats["exchanges"]:
                                 stats["exchanges"][exchange.upper()] = int(count)
 
+                    # Đếm theo ngành dựa trên chỉ mục mã cổ phiếu
+                    symbol_column = next((c for c in ('symbol', 'Symbol') if c in companies_df.columns), None)
+                    if symbol_column:
+                        industry_counts = companies_df[symbol_column].map(stock_metadata.industry_of).value_counts()
+                        for industry_name, count in industry_counts.items():
+                            stats["industries"][industry_name] = int(count)
+
                     # Lấy mẫu 20 cổ phiếu đầu tiên
                     sample_symbols = []
                     if 'symbol' in companies_df.columns:
@@ -772,60 +1122,123 @@ def get_market_statistics(source: str = Query("TCBS", description="Nguồn dữ
                     stats["sample_stocks"] = sample_symbols
 
             except Exception as e:
-                print(f"Error getting statistics from listing_companies: {e}")
+                logger.warning("Error getting statistics from listing_companies: %s", e)
 
         # Fallback: Đếm từ danh sách cố định
         if stats["total_stocks"] == 0:
-            banking_stocks = ["VCB", "BID", "CTG", "TCB", "MBB", "VPB", "ACB", "HDB", "STB", "TPB", "EIB", "SHB", "MSB", "OCB", "LPB", "NAB", "BAB", "ABB", "VBB"]
-            real_estate_stocks = ["VIC", "VHM", "NVL", "VRE", "KDH", "DXG", "PDR", "BCM", "DIG", "HDG", "IJC", "KBC", "SCR", "CEO", "HDC", "NLG", "IDC", "CRE", "TDH"]
-            manufacturing_stocks = ["VNM", "SAB", "MSN", "MML", "VIS", "CII", "DHG", "TRA", "BHN", "KDC", "MCH", "ANV", "SBT", "VCF", "BBC", "TAC", "DPM", "BMP", "VHG"]
-            steel_mining_stocks = ["HPG", "HSG", "NKG", "TLH", "SMC", "VGS", "TVN", "KSB", "POM", "TIS", "DTL", "VCA", "TNA", "VNS", "CSM", "VCS", "SHI", "VGC"]
-            oil_gas_stocks = ["GAS", "PLX", "PVS", "PVD", "PVC", "PVB", "BSR", "OIL", "PVT", "CNG", "PVG", "PSH", "PVX", "PGS", "PGD", "PGC", "PSW", "PGV"]
-            technology_stocks = ["FPT", "CMG", "ELC", "ITD", "SAM", "VGI", "VTC", "VNG", "SFI", "VCS", "CMT", "CMX", "ICT", "TNG", "VTI", "VTS", "VDS", "VGT"]
-            retail_stocks = ["MWG", "PNJ", "DGW", "FRT", "VGR", "AST", "SCS", "VDS", "TNG", "HAG", "FRT", "VRE", "VGC", "VGS", "VGI", "VGT", "VGV", "VGX"]
-            aviation_logistics_stocks = ["VJC", "HVN", "ACV", "VTP", "GMD", "VSC", "TCO", "STG", "TMS", "HAH", "VOS", "VTO", "VTG", "VTS", "VTV", "VTX", "VTY", "VTZ"]
-            utilities_stocks = ["POW", "GEG", "PC1", "NT2", "SBA", "REE", "EVE", "VSH", "BWE", "TBC", "EVG", "EVS", "EVF", "GEX", "HND", "SJD", "QTP", "VSI"]
-            food_agriculture_stocks = ["VHC", "BAF", "LAF", "HNG", "SLS", "FMC", "CAP", "LSS", "ASM", "HAP", "VNF", "VIF", "VCG", "VTF", "VFF", "VGF", "VHF", "VKF"]
-
-            all_stocks = (banking_stocks + real_estate_stocks + manufacturing_stocks +
-                         steel_mining_stocks + oil_gas_stocks + technology_stocks +
-                         retail_stocks + aviation_logistics_stocks + utilities_stocks +
-                         food_agriculture_stocks)
-
-            stats["total_stocks"] = len(set(all_stocks))
-            stats["industries"]["Ngân hàng"] = len(banking_stocks)
-            stats["industries"]["Bất động sản"] = len(real_estate_stocks)
-            stats["industries"]["Sản xuất & Tiêu dùng"] = len(manufacturing_stocks)
-            stats["industries"]["Thép & Khai khoáng"] = len(steel_mining_stocks)
-            stats["industries"]["Dầu khí"] = len(oil_gas_stocks)
-            stats["industries"]["Công nghệ"] = len(technology_stocks)
-            stats["industries"]["Bán lẻ"] = len(retail_stocks)
-            stats["industries"]["Hàng không & Logistics"] = len(aviation_logistics_stocks)
-            stats["industries"]["Điện & Tiện ích"] = len(utilities_stocks)
-            stats["industries"]["Thực phẩm & Nông nghiệp"] = len(food_agriculture_stocks)
+            stats["total_stocks"] = len(stock_metadata.SYMBOL_INDEX)
+            stats["industries"].update(stock_metadata.INDUSTRY_COUNTS)
 
             # Ước tính số lượng theo sàn (dựa trên thực tế)
             stats["exchanges"]["HOSE"] = 400  # Ước tính
             stats["exchanges"]["HNX"] = 350   # Ước tính
             stats["exchanges"]["UPCOM"] = 800 # Ước tính
 
-            stats["sample_stocks"] = sorted(list(set(all_stocks)))[:20]
+            stats["sample_stocks"] = sorted(stock_metadata.SYMBOL_INDEX)[:20]
 
-        return stats
+        return json_response(stats, response_cache, cache_key, version, request, max_age)
 
     except Exception as e:
-        print(f"Error getting market statistics: {e}")
+        logger.exception("Error getting market statistics")
         return {
             "error": f"Lỗi khi lấy thống kê thị trường: {str(e)}",
             "timestamp": datetime.now().isoformat()
         }
 
+@app.get("/api/stocks/top")
+async def get_top_stocks(request: Request,
+                         by: str = Query("pct_change", description="Trường sắp xếp: price, change, pct_change, volume"),
+                         order: str = Query("desc", description="Thứ tự: desc hoặc asc"),
+                         limit: int = Query(10, description="Số lượng cổ phiếu muốn lấy"),
+                         exchange: str = Query("all", description="Sàn giao dịch: HOSE, HNX, UPCOM, all"),
+                         industry: str = Query("all", description="Ngành cần lọc"),
+                         min_volume: int = Query(0, description="Khối lượng tối thiểu")):
+    """
+    API lấy top cổ phiếu (tăng/giảm mạnh nhất, khối lượng lớn nhất, ...) từ bảng giá trong bộ nhớ.
+
+    Lọc và sắp xếp được thực hiện trên các cột NumPy của bảng giá, chỉ những
+    dòng được trả về mới được chuyển thành dict.
+
+    Returns:
+        Danh sách cổ phiếu đã sắp xếp theo trường yêu cầu
+    """
+    try:
+        if by not in SORT_FIELDS or order not in ("desc", "asc"):
+            return {
+                "error": f"Tham số sắp xếp không hợp lệ: by='{by}', order='{order}'",
+                "available_fields": list(SORT_FIELDS),
+                "timestamp": datetime.now().isoformat()
+            }
+        if industry != "all" and industry not in INDUSTRY_SYMBOLS:
+            return {
+                "error": f"Ngành '{industry}' không hợp lệ",
+                "available_industries": list(INDUSTRY_NAMES.keys()) + ["all"],
+                "timestamp": datetime.now().isoformat()
+            }
+
+        table = market_poller.table
+        if not market_poller.running and hasattr(vnstock, 'Trading') and (
+                not len(table) or market_poller.last_poll_at is None
+                or time.time() - market_poller.last_poll_at >= quote_cache.current_ttl()):
+            # Vòng poll nền không chạy: tự nạp lại bảng giá khi đã cũ
+            await market_poller.poll_once()
+
+        cache_key = ("top", by, order, limit, exchange.upper(), industry, min_volume)
+        version = table.version if len(table) else None
+        max_age = quote_max_age()
+        cached = response_cache.get(cache_key, version)
+        if cached is not None:
+            return encoded_response(cached, request, max_age)
+
+        mask = table.column("price") > 0
+        if min_volume > 0:
+            mask &= table.column("volume") >= min_volume
+        if exchange.upper() != "ALL":
+            mask &= table.column("exchange").astype(str) == exchange.upper()
+        if industry != "all":
+            mask &= np.isin(table.column("symbol"), INDUSTRY_SYMBOLS[industry])
+
+        rows = table.select(mask, sort_by=by, descending=(order == "desc"), limit=max(limit, 0))
+        stocks = []
+        for quote in table.records(rows):
+            info = stock_metadata.lookup(quote["symbol"])
+            stocks.append({
+                "symbol": quote["symbol"],
+                "name": info.name,
+                "price": quote["price"],
+                "change": quote["change"],
+                "pct_change": quote["pct_change"],
+                "volume": quote["volume"],
+                "industry": info.industry,
+                "exchange": quote["exchange"] or info.exchange
+            })
+
+        return json_response({
+            "by": by,
+            "order": order,
+            "exchange": exchange.upper(),
+            "industry": industry,
+            "stocks": stocks,
+            "count": len(stocks),
+            "universe": int(mask.sum()),
+            "timestamp": datetime.now().isoformat()
+        }, response_cache, cache_key, version, request, max_age)
+
+    except Exception as e:
+        logger.exception("Error getting top stocks")
+        return {
+            "error": f"Lỗi khi lấy top cổ phiếu: {str(e)}",
+            "timestamp": datetime.now().isoformat()
+        }
+
 @app.get("/api/stock/history")
-def get_stock_history(symbol: str = "VNM", 
+async def get_stock_history(request: Request,
+                     symbol: str = "VNM",
                      source: str = "TCBS",
                      start_date: str = None,
                      end_date: str = None,
-                     interval: str = "1D"):
+                     interval: str = "1D",
+                     format: str = Query("records", description="Dạng dữ liệu trả về: records hoặc columnar")):
     """
     Lấy dữ liệu lịch sử giá của một mã chứng khoán.
     
@@ -835,11 +1248,19 @@ def get_stock_history(symbol: str = "VNM",
         start_date: Ngày bắt đầu (định dạng YYYY-MM-DD)
         end_date: Ngày kết thúc (định dạng YYYY-MM-DD)
         interval: Khoảng thời gian (1D, 1W, 1M)
+        format: "records" (list các dict) hoặc "columnar" ({"date": [...], "open": [...], ...})
         
     Returns:
         Dữ liệu lịch sử giá của mã chứng khoán
     """
     try:
+        if format not in HISTORY_SHAPES:
+            return {
+                "symbol": symbol,
+                "error": f"Định dạng '{format}' không hợp lệ",
+                "available_formats": list(HISTORY_SHAPES)
+            }
+
         # Xử lý ngày mặc định nếu không được cung cấp
         if not end_date:
             end_date = datetime.now().strftime('%Y-%m-%d')
@@ -850,69 +1271,47 @@ def get_stock_history(symbol: str = "VNM",
         
         # Lấy dữ liệu lịch sử sử dụng Quote class
         df = None
-        if hasattr(vnstock, 'Quote'):
+        if history_store is not None and interval in STORE_INTERVALS and hasattr(vnstock, 'Quote'):
             try:
-                quote = vnstock.Quote(symbol=symbol, source=source)
-                # Tính số ngày để xác định period
-                start_dt = datetime.strptime(start_date, '%Y-%m-%d')
-                end_dt = datetime.strptime(end_date, '%Y-%m-%d')
-                days_diff = (end_dt - start_dt).days
-
-                # Xác định period phù hợp
-                if days_diff <= 7:
-                    period = '1wk'
-                elif days_diff <= 30:
-                    period = '1mo'
-                elif days_diff <= 90:
-                    period = '3mo'
-                elif days_diff <= 180:
-                    period = '6mo'
-                elif days_diff <= 365:
-                    period = '1y'
-                else:
-                    period = '2y'
+                # Đọc từ kho trên đĩa, chỉ tải phần còn thiếu từ upstream
+                df = await history_store.get(symbol, source, start_date, end_date, interval)
+            except Exception as store_e:
+                logger.warning("History store failed for %s: %s", symbol, store_e)
 
-                df = quote.history(period=period, interval=interval)
+        if df is None and hasattr(vnstock, 'Quote'):
+            try:
+                # Chỉ yêu cầu đúng khoảng ngày cần lấy, không dùng period
+                df = await fetch_quote_history(symbol, source, start=start_date, end=end_date, interval=interval)
 
             except Exception as quote_e:
-                print(f"Quote.history failed: {quote_e}")
+                logger.warning("Quote.history failed for %s: %s", symbol, quote_e)
                 # Fallback: thử method cũ nếu có
                 if hasattr(vnstock, 'stock_historical_data'):
-                    df = vnstock.stock_historical_data(
+                    df = await upstream.run(
+                        vnstock.stock_historical_data,
                         symbol=symbol,
                         start_date=start_date,
                         end_date=end_date,
                         resolution=interval
                     )
-        
-        if not df.empty:
-            # Chuyển DataFrame thành danh sách các dict
-            result = []
-            for idx, row in df.iterrows():
-                data_point = {
-                    "date": idx.strftime('%Y-%m-%d') if hasattr(idx, 'strftime') else str(idx),
-                    "open": float(row.get('open', 0)),
-                    "high": float(row.get('high', 0)),
-                    "low": float(row.get('low', 0)),
-                    "close": float(row.get('close', 0)),
-                    "volume": int(row.get('volume', 0)) if 'volume' in row else 0
-                }
-                # Thêm các trường khác nếu có
-                if 'change' in row:
-                    data_point["change"] = float(row['change'])
-                if 'pct_change' in row:
-                    data_point["pct_change"] = float(row['pct_change'])
-                
-                result.append(data_point)
-            
-            return {
+
+            # Upstream có thể trả thừa dòng ngoài khoảng yêu cầu; kho lịch sử đã
+            # trả đúng khoảng (nến tuần/tháng đầu tiên có thể bắt đầu trước start_date)
+            df = slice_history(df, start_date, end_date)
+
+        if df is not None and not df.empty:
+            # Chuyển DataFrame thành JSON theo từng cột
+            result = serialize_history(df, shape=format)
+
+            return json_response({
                 "symbol": symbol,
                 "source": source,
                 "interval": interval,
                 "start_date": start_date,
                 "end_date": end_date,
+                "format": format,
                 "data": result
-            }
+            }, request=request, max_age=history_max_age(end_date))
         else:
             return {
                 "symbol": symbol, 
@@ -928,164 +1327,191 @@ def get_stock_history(symbol: str = "VNM",
             "end_date": end_date
         }
 
+@app.get("/api/stock/indicators")
+async def get_stock_indicators(request: Request,
+                     symbol: str = "VNM",
+                     source: str = "TCBS",
+                     indicators: str = Query("sma", description="Danh sách chỉ báo, phân cách bằng dấu phẩy: sma, ema, rsi, macd, bollinger"),
+                     start_date: str = None,
+                     end_date: str = None,
+                     interval: str = "1D",
+                     period: int = Query(None, description="Chu kỳ cho sma, ema, rsi, bollinger (mặc định theo từng chỉ báo)"),
+                     fast: int = Query(None, description="Chu kỳ EMA nhanh của macd (mặc định 12)"),
+                     slow: int = Query(None, description="Chu kỳ EMA chậm của macd (mặc định 26)"),
+                     signal: int = Query(None, description="Chu kỳ đường tín hiệu của macd (mặc định 9)"),
+                     std: float = Query(None, description="Số lần độ lệch chuẩn của bollinger (mặc định 2)"),
+                     format: str = Query("records", description="Dạng dữ liệu trả về: records hoặc columnar")):
+    """
+    Tính chỉ báo kỹ thuật trên lịch sử giá đóng cửa của một mã chứng khoán.
+
+    Args:
+        symbol: Mã chứng khoán
+        source: Nguồn dữ liệu
+        indicators: Các chỉ báo cần tính, phân cách bằng dấu phẩy
+        start_date: Ngày bắt đầu (định dạng YYYY-MM-DD)
+        end_date: Ngày kết thúc (định dạng YYYY-MM-DD)
+        interval: Khoảng thời gian (1D, 1W, 1M)
+        period, fast, slow, signal, std: Tham số chỉ báo, bỏ trống để dùng mặc định
+        format: "records" (list các dict) hoặc "columnar" ({"date": [...], "close": [...], ...})
+
+    Returns:
+        Giá đóng cửa và giá trị các chỉ báo theo từng nến (null khi chưa đủ nến)
+    """
+    symbol = symbol.upper()
+    try:
+        if format not in HISTORY_SHAPES:
+            return {
+                "symbol": symbol,
+                "error": f"Định dạng '{format}' không hợp lệ",
+                "available_formats": list(HISTORY_SHAPES)
+            }
+        if interval not in STORE_INTERVALS:
+            return {
+                "symbol": symbol,
+                "error": f"Không hỗ trợ interval '{interval}' cho chỉ báo",
+                "available_intervals": list(STORE_INTERVALS)
+            }
+
+        if not end_date:
+            end_date = datetime.now().strftime('%Y-%m-%d')
+        if not start_date:
+            start_date = (datetime.now() - timedelta(days=90)).strftime('%Y-%m-%d')
+
+        names = list(dict.fromkeys(name.strip().lower() for name in indicators.split(',') if name.strip()))
+        try:
+            if not names:
+                raise ValueError("Chưa chọn chỉ báo nào")
+            params = {name: indicator_params(name, period=period, fast=fast, slow=slow, signal=signal, std=std)
+                      for name in names}
+        except ValueError as e:
+            return {
+                "symbol": symbol,
+                "error": str(e),
+                "available_indicators": list(INDICATORS)
+            }
+
+        # Mọi chỉ báo tính trên cùng một lần tải lịch sử nên dùng chung mảng ngày
+        dates, columns = await indicator_engine.get_many(symbol, source, interval, params, start_date, end_date)
+
+        if not len(dates):
+            return {
+                "symbol": symbol,
+                "error": "Không tìm thấy dữ liệu lịch sử cho mã này",
+                "start_date": start_date,
+                "end_date": end_date
+            }
+
+        data = {"date": np.datetime_as_string(dates, unit="D").tolist()}
+        for column, values in columns.items():
+            # NaN (chưa đủ nến) -> null
+            data[column] = [None if value != value else value for value in values.tolist()]
+        if format == "records":
+            keys = tuple(data.keys())
+            data = [dict(zip(keys, row)) for row in zip(*data.values())]
+
+        return json_response({
+            "symbol": symbol,
+            "source": source,
+            "interval": interval,
+            "start_date": start_date,
+            "end_date": end_date,
+            "indicators": params,
+            "format": format,
+            "data": data
+        }, request=request, max_age=history_max_age(end_date))
+    except Exception as e:
+        logger.warning("Indicators failed for %s: %s", symbol, e)
+        return {
+            "symbol": symbol,
+            "error": f"Lỗi khi tính chỉ báo: {str(e)}",
+            "start_date": start_date,
+            "end_date": end_date
+        }
+
 @app.get("/api/stock/realtime")
-def get_stock_realtime(symbols: str = Query("VNM,VCB,HPG", description="Danh sách mã chứng khoán, phân cách bằng dấu phẩy"),
-                     source: str = Query("TCBS", description="Nguồn dữ liệu")):
+async def get_stock_realtime(request: Request,
+                     symbols: str = Query("VNM,VCB,HPG", description="Danh sách mã chứng khoán, phân cách bằng dấu phẩy"),
+                     source: str = Query("TCBS", description="Nguồn dữ liệu"),
+                     since: int = Query(None, description="Cursor nhận được ở lần gọi trước; chỉ trả về các mã thay đổi sau đó")):
     """
     Lấy thông tin giá theo thời gian thực của nhiều mã chứng khoán.
 
     Args:
         symbols: Danh sách mã chứng khoán, phân cách bằng dấu phẩy
         source: Nguồn dữ liệu (mặc định: TCBS vì thường cung cấp dữ liệu realtime tốt hơn)
+        since: Cursor của lần gọi trước. Khi mọi mã có trên bảng giá trong bộ nhớ,
+            chỉ các mã thay đổi sau cursor được trả về; ngược lại trả về đầy đủ
 
     Returns:
-        Thông tin giá theo thời gian thực của các mã chứng khoán
+        Thông tin giá theo thời gian thực của các mã chứng khoán và cursor mới
+        (null khi dữ liệu không lấy từ bảng giá trong bộ nhớ)
     """
     try:
         # Chuyển chuỗi symbols thành list
         symbol_list = [s.strip().upper() for s in symbols.split(',')]
-        print(f"Đang lấy dữ liệu realtime cho: {symbol_list}")
+        debug_sampled(logger, "realtime", "Đang lấy dữ liệu realtime cho: %s", symbol_list)
+
+        cache_key = ("realtime", tuple(symbol_list), source, since)
+        version = market_poller.snapshot_version(symbol_list)
+        max_age = quote_max_age()
+        cached = response_cache.get(cache_key, version)
+        if cached is not None:
+            return encoded_response(cached, request, max_age)
+
+        if since is not None:
+            delta = market_poller.changes_since(list(dict.fromkeys(symbol_list)), since)
+            if delta is not None:
+                quotes, cursor, reset = delta
+                # Chỉ gửi các mã thay đổi sau cursor của client
+                return json_response({
+                    "symbols": symbol_list,
+                    "source": source,
+                    "since": since,
+                    "cursor": cursor,
+                    "reset": reset,
+                    "count": len(quotes),
+                    "timestamp": datetime.now().isoformat(),
+                    "data": [{
+                        "symbol": quote["symbol"],
+                        "name": quote["symbol"],
+                        "price": quote["price"],
+                        "change": quote["change"],
+                        "pct_change": quote["pct_change"],
+                        "volume": quote["volume"],
+                        "industry": stock_metadata.core_industry_of(quote["symbol"])
+                    } for quote in quotes]
+                }, response_cache, cache_key, cursor, request, max_age)
 
         result = []
 
         # Thử sử dụng Trading class để lấy price_board cho nhiều mã
         if hasattr(vnstock, 'Trading'):
             try:
-                trading = vnstock.Trading()
-                price_data = trading.price_board(symbol_list)
-
-                if not price_data.empty:
-                    # Debug: In ra cấu trúc dữ liệu realtime
-                    print(f"Realtime Trading.price_board columns: {price_data.columns.tolist()}")
-                    print(f"Realtime Trading.price_board shape: {price_data.shape}")
-                    if len(price_data) > 0:
-                        print(f"Realtime sample row: {price_data.iloc[0].to_dict()}")
-
-                    for idx, row in price_data.iterrows():
-                        # Debug: In ra dữ liệu từng row
-                        print(f"Realtime Row {idx}: {row.to_dict()}")
-
-                        # vnstock 3.x sử dụng MultiIndex columns với format (category, field)
-                        symbol_val = (row.get(('listing', 'symbol')) or row.get('symbol') or
-                                     symbol_list[idx] if idx < len(symbol_list) else 'N/A')
-
-                        price_val = (row.get(('match', 'match_price')) or
-                                    row.get(('match', 'avg_match_price')) or
-                                    row.get('close') or row.get('price') or 0)
-
-                        # Tính change từ match_price và ref_price
-                        match_price = row.get(('match', 'match_price'), 0)
-                        ref_price = row.get(('listing', 'ref_price'), 0)
-                        change_val = float(match_price - ref_price) if match_price and ref_price else 0
-
-                        volume_val = (row.get(('match', 'accumulated_volume')) or
-                                     row.get(('match', 'match_vol')) or
-                                     row.get('volume') or 0)
-
-                        # Tính phần trăm thay đổi
-                        pct_change = 0
-                        if ref_price and ref_price > 0 and change_val != 0:
-                            pct_change = round((change_val / ref_price) * 100, 2)
-
-                        # Xác định ngành dựa trên symbol (case-insensitive)
-                        def get_industry_realtime(symbol):
-                            symbol_upper = str(symbol).upper().strip()
-                            print(f"Realtime - Checking industry for symbol: '{symbol_upper}'")  # Debug log
-
-                            banking_stocks = ["VCB", "BID", "CTG", "TCB", "MBB", "VPB", "ACB", "HDB", "STB", "TPB", "EIB", "SHB", "MSB", "OCB", "LPB"]
-                            real_estate_stocks = ["VIC", "VHM", "NVL", "VRE", "KDH", "DXG", "PDR", "BCM", "DIG", "HDG", "IJC", "KBC", "SCR"]
-                            manufacturing_stocks = ["VNM", "SAB", "MSN", "MML", "VIS", "CII", "DHG", "TRA", "BHN", "KDC", "MCH", "ANV", "SBT"]
-                            steel_mining_stocks = ["HPG", "HSG", "NKG", "TLH", "SMC", "VGS", "TVN", "KSB", "POM", "TIS"]
-                            oil_gas_stocks = ["GAS", "PLX", "PVS", "PVD", "PVC", "PVB", "BSR", "OIL", "PVT", "CNG"]
-                            technology_stocks = ["FPT", "CMG", "ELC", "ITD", "SAM", "VGI", "VTC", "VNG", "SFI", "VCS"]
-                            retail_stocks = ["MWG", "PNJ", "DGW", "FRT", "VGR", "AST", "SCS", "VDS", "TNG", "HAG"]
-                            aviation_logistics_stocks = ["VJC", "HVN", "ACV", "VTP", "GMD", "VSC", "TCO", "STG", "TMS", "HAH"]
-                            utilities_stocks = ["POW", "GEG", "PC1", "NT2", "SBA", "REE", "EVE", "VSH", "BWE", "TBC"]
-                            food_agriculture_stocks = ["VHC", "BAF", "LAF", "HNG", "SLS", "FMC", "CAP", "LSS", "ASM", "HAP"]
-
-                            if symbol_upper in banking_stocks:
-                                return "Ngân hàng"
-                            elif symbol_upper in real_estate_stocks:
-                                return "Bất động sản"
-                            elif symbol_upper in manufacturing_stocks:
-                                return "Sản xuất & Tiêu dùng"
-                            elif symbol_upper in steel_mining_stocks:
-                                return "Thép & Khai khoáng"
-                            elif symbol_upper in oil_gas_stocks:
-                                return "Dầu khí"
-                            elif symbol_upper in technology_stocks:
-                                return "Công nghệ"
-                            elif symbol_upper in retail_stocks:
-                                return "Bán lẻ"
-                            elif symbol_upper in aviation_logistics_stocks:
-                                return "Hàng không & Logistics"
-                            elif symbol_upper in utilities_stocks:
-                                return "Điện & Tiện ích"
-                            elif symbol_upper in food_agriculture_stocks:
-                                return "Thực phẩm & Nông nghiệp"
-                            else:
-                                print(f"Realtime - Symbol '{symbol_upper}' not found in any industry list")  # Debug log
-                                return "Chưa phân loại"
+                quotes = await fetch_price_board(symbol_list)
 
+                if quotes:
+                    for quote in quotes:
                         # Tạo dữ liệu realtime từ price_board
-                        stock_info = {
-                            "symbol": str(symbol_val),
-                            "name": str(symbol_val),
-                            "price": float(price_val) if price_val else 0,
-                            "change": float(change_val) if change_val else 0,
-                            "pct_change": pct_change,
-                            "volume": int(volume_val) if volume_val else 0,
-                            "industry": get_industry_realtime(str(symbol_val))
-                        }
-                        result.append(stock_info)
-
-                    print(f"Đã lấy được dữ liệu realtime từ Trading.price_board cho {len(result)} cổ phiếu")
+                        result.append(with_stale({
+                            "symbol": quote["symbol"],
+                            "name": quote["symbol"],
+                            "price": quote["price"],
+                            "change": quote["change"],
+                            "pct_change": quote["pct_change"],
+                            "volume": quote["volume"],
+                            "industry": stock_metadata.core_industry_of(quote["symbol"])
+                        }, quote))
+
+                    debug_sampled(logger, "realtime", "Đã lấy được dữ liệu realtime từ Trading.price_board cho %d cổ phiếu", len(result))
 
             except Exception as trading_e:
-                print(f"Trading.price_board failed: {trading_e}")
-
-        # Nếu Trading không hoạt động, thử từng mã một với Quote class
-        if not result:
-            for symbol in symbol_list:
-                try:
-                    # Thử Quote class
-                    if hasattr(vnstock, 'Quote'):
-                        quote = vnstock.Quote(symbol=symbol, source=source)
-                        stock_data = quote.history(period='1D', interval='1D')
-
-                        if not stock_data.empty:
-                            latest_data = stock_data.iloc[-1]
-
-                            stock_info = {
-                                "symbol": symbol,
-                                "name": symbol,
-                                "price": float(latest_data.get('close', 0)),
-                                "change": float(latest_data.get('change', 0)) if 'change' in latest_data else 0,
-                                "pct_change": 0,
-                                "volume": int(latest_data.get('volume', 0)) if 'volume' in latest_data else 0,
-                                "industry": "Chưa phân loại"
-                            }
-
-                            # Tính phần trăm thay đổi
-                            if stock_info["price"] > 0 and stock_info["change"] != 0:
-                                stock_info["pct_change"] = round((stock_info["change"] / (stock_info["price"] - stock_info["change"])) * 100, 2)
-
-                            result.append(stock_info)
-                        else:
-                            # Thêm dữ liệu trống cho symbol này
-                            result.append({
-                                "symbol": symbol,
-                                "name": symbol,
-                                "price": 0,
-                                "change": 0,
-                                "pct_change": 0,
-                                "volume": 0,
-                                "industry": "Chưa phân loại",
-                                "error": "Không có dữ liệu"
-                            })
-
-                except Exception as stock_e:
-                    print(f"Lỗi khi lấy dữ liệu realtime cho {symbol}: {str(stock_e)}")
+                logger.warning("Trading.price_board failed: %s", trading_e)
+
+        # Nếu Trading không hoạt động, lấy song song từng mã với Quote class
+        if not result and hasattr(vnstock, 'Quote'):
+            for symbol, latest_data, stock_e in await fetch_latest_history_rows(symbol_list, source):
+                if stock_e is not None:
+                    logger.warning("Lỗi khi lấy dữ liệu realtime cho %s: %s", symbol, stock_e)
                     result.append({
                         "symbol": symbol,
                         "name": symbol,
@@ -1093,21 +1519,57 @@ def get_stock_realtime(symbols: str = Query("VNM,VCB,HPG", description="Danh sá
                         "change": 0,
                         "pct_change": 0,
                         "volume": 0,
-                        "industry": "Chưa phân loại",
+                        "industry": UNCLASSIFIED,
                         "error": f"Lỗi: {str(stock_e)}"
                     })
+                elif latest_data is not None:
+                    stock_info = {
+                        "symbol": symbol,
+                        "name": symbol,
+                        "price": float(latest_data.get('close', 0)),
+                        "change": float(latest_data.get('change', 0)) if 'change' in latest_data else 0,
+                        "pct_change": 0,
+                        "volume": int(latest_data.get('volume', 0)) if 'volume' in latest_data else 0,
+                        "industry": UNCLASSIFIED
+                    }
 
-        print(f"Tổng cộng đã lấy được dữ liệu realtime cho {len(result)} cổ phiếu")
+                    # Tính phần trăm thay đổi
+                    if stock_info["price"] > 0 and stock_info["change"] != 0:
+                        stock_info["pct_change"] = round((stock_info["change"] / (stock_info["price"] - stock_info["change"])) * 100, 2)
 
-        return {
+                    result.append(stock_info)
+                else:
+                    # Thêm dữ liệu trống cho symbol này
+                    result.append({
+                        "symbol": symbol,
+                        "name": symbol,
+                        "price": 0,
+                        "change": 0,
+                        "pct_change": 0,
+                        "volume": 0,
+                        "industry": UNCLASSIFIED,
+                        "error": "Không có dữ liệu"
+                    })
+
+        debug_sampled(logger, "realtime", "Tổng cộng đã lấy được dữ liệu realtime cho %d cổ phiếu", len(result))
+
+        # cursor vẫn là phiên bản bảng giá, chỉ bỏ cache/max-age
+        cache_version = version
+        if not cacheable_quotes(version, result):
+            cache_version, max_age = None, 0
+
+        return json_response({
             "symbols": symbol_list,
             "source": source,
+            "since": since,
+            "cursor": version,
+            "reset": since is not None,
             "count": len(result),
             "timestamp": datetime.now().isoformat(),
             "data": result
-        }
+        }, response_cache, cache_key, cache_version, request, max_age)
     except Exception as e:
-        print(f"Lỗi tổng thể: {str(e)}")
+        logger.exception("Lỗi khi lấy dữ liệu realtime")
         return {
             "symbols": symbols.split(','),
             "source": source,
@@ -1116,8 +1578,89 @@ def get_stock_realtime(symbols: str = Query("VNM,VCB,HPG", description="Danh sá
             "data": []
         }
 
+def release_stream_poller():
+    """Dừng vòng poll nền do stream bật khi không còn client và MARKET_POLLER_ENABLED=0."""
+    if not MARKET_POLLER_ENABLED and not quote_stream.subscribers:
+        market_poller.stop()
+
+@app.get("/api/stock/stream")
+async def stream_stock_quotes(request: Request,
+                              symbols: str = Query("VNM,VCB,HPG", description="Danh sách mã chứng khoán, phân cách bằng dấu phẩy")):
+    """
+    Đẩy giá realtime qua Server-Sent Events.
+
+    Client nhận sự kiện "quotes" chứa giá hiện có ngay khi kết nối, sau đó chỉ
+    nhận các mã có thay đổi. Khi không có thay đổi, một dòng comment được gửi
+    định kỳ để giữ kết nối.
+
+    Args:
+        symbols: Danh sách mã chứng khoán, phân cách bằng dấu phẩy
+
+    Returns:
+        StreamingResponse text/event-stream
+    """
+    symbol_list = list(dict.fromkeys(s.strip().upper() for s in symbols.split(',') if s.strip()))
+    symbol_list = symbol_list[:STREAM_MAX_SYMBOLS]
+
+    async def _events():
+        subscription = quote_stream.subscribe(symbol_list, initial=market_poller.latest(symbol_list))
+        # Stream luôn cần vòng poll nền; khi MARKET_POLLER_ENABLED=0 vòng poll chỉ
+        # chạy trong lúc còn client stream (xem release_stream_poller)
+        if hasattr(vnstock, 'Trading'):
+            market_poller.start()
+        try:
+            yield format_event("subscribed", {"symbols": symbol_list, "interval": round(market_poller.current_interval(), 1)})
+            while not await request.is_disconnected():
+                quotes = await subscription.next(STREAM_HEARTBEAT)
+                if not quotes:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield format_event("quotes", {
+                    "timestamp": datetime.now().isoformat(),
+                    "data": [
+                        {
+                            "symbol": quote["symbol"],
+                            "name": quote["symbol"],
+                            "price": quote["price"],
+                            "change": quote["change"],
+                            "pct_change": quote["pct_change"],
+                            "volume": quote["volume"],
+                            "industry": stock_metadata.industry_of(quote["symbol"])
+                        }
+                        for quote in quotes
+                    ]
+                })
+        finally:
+            quote_stream.unsubscribe(subscription)
+            release_stream_poller()
+
+    return StreamingResponse(_events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.get("/api/cache/stats")
+async def get_cache_stats():
+    """
+    Thống kê cache giá dùng chung (số lần hit/miss, kích thước, TTL hiện tại).
+    """
+    return {
+        "quote_cache": quote_cache.stats(),
+        "single_flight": upstream_flight.stats(),
+        "upstream_executor": upstream.stats(),
+        "listing_universe": listing_universe.stats(),
+        "history_store": history_store.stats() if history_store is not None else None,
+        "trading_calendar": trading_calendar.stats(),
+        "market_poller": market_poller.stats(),
+        "indicator_engine": indicator_engine.stats(),
+        "snapshot": board_snapshot.stats() if board_snapshot is not None else None,
+        "response_cache": response_cache.stats(),
+        "source_router": source_router.stats(),
+        "upstream_guard": upstream_guard.stats(),
+        "quote_stream": quote_stream.stats(),
+        "timestamp": datetime.now().isoformat()
+    }
+
 if __name__ == "__main__":
     import uvicorn
     # Khi chạy local, uvicorn sẽ không tự động load biến môi trường từ .env như Render
-    print(f"Stock API đang chạy với allowed_origins: {allowed_origins}")
+    logger.info("Stock API đang chạy với allowed_origins: %s", allowed_origins)
     uvicorn.run(app, host="0.0.0.0", port=8000)
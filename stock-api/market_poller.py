@@ -0,0 +1,285 @@
+"""
+Bảng giá trong bộ nhớ (quote_table.QuoteTable) được cập nhật bởi một task poll chạy nền.
+
+Task nền lấy price_board theo lô lớn cho toàn bộ các mã đang được theo dõi
+(danh sách mã cơ sở + các mã được request gần đây + mã của client stream),
+chu kỳ poll ngắn trong giờ giao dịch và dài ngoài giờ. Các endpoint đọc giá
+trực tiếp từ bảng này thay vì gọi upstream cho từng request. Ngoài phiên giao
+dịch, vòng poll ngủ tới phiên kế tiếp (sau một lượt poll để lấy giá đóng cửa).
+"""
+import asyncio
+import time
+
+import numpy as np
+
+from logging_config import get_logger
+from quote_table import QuoteTable
+from trading_calendar import TradingCalendar
+
+logger = get_logger("poller")
+
+
+class MarketPoller:
+    """
+    Bảng giá dùng chung và vòng poll cập nhật nó.
+
+    Args:
+        fetcher: Coroutine function (symbols) -> dict cột giá (xem price_board.price_board_columns)
+        base_symbols: Các mã luôn được theo dõi
+        interval: Chu kỳ poll trong giờ giao dịch (giây)
+        closed_interval: Giới hạn trên cho thời gian ngủ ngoài giờ giao dịch (giây);
+            None để ngủ tới phiên kế tiếp
+        batch_size: Số mã mỗi lần gọi price_board
+        max_in_flight: Số lô chạy song song trong một lượt poll
+        track_ttl: Thời gian (giây) tiếp tục theo dõi một mã kể từ lần request cuối
+        max_tracked: Số mã tối đa được theo dõi thêm ngoài base_symbols
+        extra_symbols: Hàm không tham số trả về các mã cần theo dõi thêm (ví dụ mã của client stream)
+        calendar: TradingCalendar xác định giờ giao dịch
+    """
+
+    def __init__(self, fetcher, base_symbols=(), interval=3.0, closed_interval=None,
+                 batch_size=300, max_in_flight=4, track_ttl=3600.0, max_tracked=3000,
+                 extra_symbols=None, calendar=None):
+        self._fetcher = fetcher
+        self.base_symbols = tuple(base_symbols)
+        self.interval = interval
+        self.closed_interval = closed_interval
+        self.batch_size = batch_size
+        self.max_in_flight = max_in_flight
+        self.track_ttl = track_ttl
+        self.max_tracked = max_tracked
+        self._extra_symbols = extra_symbols
+        self.calendar = calendar or TradingCalendar()
+        self._recent = {}
+        self.table = QuoteTable()
+        self._listeners = []
+        self._task = None
+        self.polls = 0
+        self.failed_polls = 0
+        self.errors = 0
+        self.hits = 0
+        self.misses = 0
+        self.last_poll_at = None
+        self.last_poll_duration = None
+        self._warm_after = None
+
+    @property
+    def running(self):
+        return self._task is not None and not self._task.done()
+
+    def current_interval(self, now=None):
+        """Thời gian chờ tới lượt poll tiếp theo: chu kỳ ngắn trong phiên, tới phiên kế tiếp khi đóng cửa."""
+        if self.calendar.is_open(now):
+            return self.interval
+        interval = max(self.interval, self.calendar.seconds_until_open(now))
+        return min(interval, self.closed_interval) if self.closed_interval else interval
+
+    def add_listener(self, listener):
+        """Đăng ký hàm nhận list bản ghi giá của các mã thay đổi sau mỗi lượt poll."""
+        self._listeners.append(listener)
+
+    def track(self, symbols):
+        """Đánh dấu các mã vừa được request để lượt poll sau lấy giá cho chúng."""
+        now = time.monotonic()
+        for symbol in symbols:
+            self._recent[symbol] = now
+        if len(self._recent) > self.max_tracked:
+            # Bỏ các mã lâu không được request nhất
+            for symbol in sorted(self._recent, key=self._recent.get)[:len(self._recent) - self.max_tracked]:
+                del self._recent[symbol]
+
+    def universe(self):
+        """Danh sách mã được poll ở lượt tiếp theo."""
+        cutoff = time.monotonic() - self.track_ttl
+        for symbol in [s for s, seen in self._recent.items() if seen < cutoff]:
+            del self._recent[symbol]
+        symbols = dict.fromkeys(self.base_symbols)
+        symbols.update(dict.fromkeys(self._recent))
+        if self._extra_symbols is not None:
+            symbols.update(dict.fromkeys(self._extra_symbols()))
+        return list(symbols)
+
+    def get_many(self, symbols):
+        """
+        Đọc giá từ bảng trong bộ nhớ.
+
+        Chỉ trả về dữ liệu khi task poll đang chạy và bản ghi còn mới: trong phiên là
+        chưa quá 3 chu kỳ poll, ngoài phiên là được lấy sau khi phiên gần nhất kết thúc.
+        Nhờ vậy không phục vụ giá cũ khi vòng poll bị dừng hoặc lỗi kéo dài.
+
+        Returns:
+            Tuple (dict {symbol: quote} tìm thấy, list mã không có trên bảng)
+        """
+        if not self.running:
+            return {}, list(symbols)
+        rows = self.table.rows(symbols)
+        fresh = rows >= 0
+        fresh[fresh] = self.table.timestamp[rows[fresh]] >= self._fresh_after()
+        found = {quote["symbol"]: quote for quote in self.table.records(rows[fresh])}
+        missing = [symbol for symbol, ok in zip(symbols, fresh.tolist()) if not ok]
+        self.hits += len(found)
+        self.misses += len(missing)
+        return found, missing
+
+    def _fresh_after(self):
+        if self.calendar.is_open():
+            fresh_after = time.time() - self.interval * 3
+        else:
+            last_close = self.calendar.last_close()
+            fresh_after = last_close.timestamp() if last_close is not None else 0.0
+        if self._warm_after is not None and not self.polls:
+            # Giá nạp từ snapshot được phục vụ cho tới khi lượt poll đầu tiên hoàn tất
+            return min(fresh_after, self._warm_after)
+        return fresh_after
+
+    def restore(self, array, max_age):
+        """
+        Nạp bảng giá từ snapshot (mảng structured của QuoteTable.to_array).
+
+        Các mã đã nạp được theo dõi như vừa được request. Trước khi lượt poll đầu
+        tiên hoàn tất, giá cập nhật trong vòng max_age giây được coi là còn mới để
+        phục vụ ngay sau khi khởi động.
+
+        Returns:
+            Số mã đã nạp
+        """
+        count = self.table.load_array(array)
+        if count:
+            base = set(self.base_symbols)
+            self.track([s for s in self.table.column("symbol").tolist() if s not in base])
+            self._warm_after = time.time() - max_age
+            # Giá trong bảng mới tới đâu thì coi như lượt poll gần nhất diễn ra lúc đó
+            self.last_poll_at = float(self.table.column("timestamp").max())
+        return count
+
+    def snapshot_version(self, symbols):
+        """
+        Phiên bản hiện tại của bảng giá nếu mọi mã đều có giá còn mới trên bảng.
+
+        Dùng làm khoá cache cho response dựng hoàn toàn từ bảng giá.
+
+        Returns:
+            Số phiên bản, None nếu có mã phải lấy từ nguồn khác
+        """
+        if not self.running:
+            return None
+        rows = self.table.rows(symbols)
+        if (rows < 0).any() or (self.table.timestamp[rows] < self._fresh_after()).any():
+            return None
+        return self.table.version
+
+    def changes_since(self, symbols, cursor):
+        """
+        Giá của các mã có thay đổi sau cursor (phiên bản bảng giá client nhận lần trước).
+
+        Returns:
+            Tuple (list bản ghi giá, cursor mới, reset), None nếu bảng giá không
+            phục vụ được toàn bộ các mã (khi đó client cần lấy lại đầy đủ)
+        """
+        version = self.snapshot_version(symbols)
+        if version is None:
+            return None
+        rows, reset = self.table.changed_since(self.table.rows(symbols), cursor)
+        return self.table.records(rows), version, reset
+
+    def last_known(self, symbols, max_age=None):
+        """
+        Giá gần nhất đã biết của các mã kể cả khi vòng poll đã dừng (dùng khi upstream lỗi).
+
+        Args:
+            max_age: Bỏ qua giá được cập nhật cách đây quá số giây này (None: không giới hạn)
+
+        Returns:
+            Dict {symbol: quote}
+        """
+        rows = self.table.rows(symbols)
+        known = rows >= 0
+        if max_age is not None:
+            known[known] = self.table.timestamp[rows[known]] >= time.time() - max_age
+        return {quote["symbol"]: quote for quote in self.table.records(rows[known])}
+
+    def latest(self, symbols):
+        """Giá mới nhất đã biết của các mã (không kiểm tra tuổi)."""
+        rows = self.table.rows(symbols)
+        return self.table.records(rows[rows >= 0])
+
+    async def poll_once(self):
+        """
+        Thực hiện một lượt poll cho toàn bộ universe.
+
+        Returns:
+            List bản ghi giá của các mã có thay đổi
+        """
+        symbols = self.universe()
+        if not symbols:
+            return []
+        started = time.monotonic()
+        batches = [symbols[i:i + self.batch_size] for i in range(0, len(symbols), self.batch_size)]
+        semaphore = asyncio.Semaphore(self.max_in_flight)
+
+        async def _batch(batch_symbols):
+            async with semaphore:
+                try:
+                    return await self._fetcher(batch_symbols)
+                except Exception as e:
+                    self.errors += 1
+                    logger.warning("Poll price_board thất bại cho lô %s-%s: %s", batch_symbols[0], batch_symbols[-1], e)
+                    return None
+
+        results = await asyncio.gather(*[_batch(b) for b in batches])
+        updated_at = time.time()
+        changed_rows = [self.table.update(columns, updated_at) for columns in results if columns is not None]
+        quotes = self.table.records(np.concatenate(changed_rows)) if changed_rows else []
+        self.last_poll_duration = time.monotonic() - started
+        if not changed_rows:
+            # Mọi lô đều lỗi: bảng giá không được làm mới nên không tính là một lượt poll
+            self.failed_polls += 1
+            logger.warning("Poll %d mã thất bại ở cả %d lô", len(symbols), len(batches))
+            return []
+        self.polls += 1
+        self.last_poll_at = updated_at
+        logger.debug("Poll %d mã trong %d lô, %d mã thay đổi (%.3fs)",
+                     len(symbols), len(batches), len(quotes), self.last_poll_duration)
+
+        for listener in self._listeners:
+            try:
+                listener(quotes)
+            except Exception as e:
+                logger.warning("Listener của poller lỗi: %s", e)
+        return quotes
+
+    async def _run(self):
+        while True:
+            try:
+                await self.poll_once()
+            except Exception as e:
+                self.errors += 1
+                logger.exception("Lượt poll giá lỗi: %s", e)
+            await asyncio.sleep(self.current_interval())
+
+    def start(self):
+        if not self.running:
+            self._task = asyncio.ensure_future(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "running": self.running,
+            "board_size": len(self.table),
+            "table": self.table.stats(),
+            "tracked_symbols": len(self.universe()),
+            "interval": round(self.current_interval(), 1),
+            "polls": self.polls,
+            "failed_polls": self.failed_polls,
+            "errors": self.errors,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+            "last_poll_at": self.last_poll_at,
+            "last_poll_duration": None if self.last_poll_duration is None else round(self.last_poll_duration, 3)
+        }
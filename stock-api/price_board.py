@@ -0,0 +1,131 @@
+"""
+Chuẩn hoá DataFrame price_board của vnstock thành danh sách bản ghi giá.
+
+vnstock 3.x trả về price_board với MultiIndex columns dạng (category, field).
+Thay vì duyệt từng dòng bằng iterrows(), module này chọn các cột cần thiết
+một lần, tính change/pct_change bằng NumPy trên cả cột và tạo bản ghi hàng loạt
+(hoặc trả về nguyên các cột để ghi vào quote_table.QuoteTable).
+"""
+import numpy as np
+import pandas as pd
+
+# Thứ tự ưu tiên các cột, tương đương chuỗi `row.get(a) or row.get(b) or ...` trước đây
+SYMBOL_COLUMNS = [('listing', 'symbol'), 'symbol']
+EXCHANGE_COLUMNS = [('listing', 'exchange'), 'exchange']
+PRICE_COLUMNS = [('match', 'match_price'), ('match', 'avg_match_price'), 'close', 'price']
+REF_PRICE_COLUMNS = [('listing', 'ref_price')]
+VOLUME_COLUMNS = [('match', 'accumulated_volume'), ('match', 'match_vol'), 'volume']
+
+QUOTE_FIELDS = ("symbol", "price", "ref_price", "change", "pct_change", "volume", "exchange")
+
+
+def _numeric_column(df, candidates):
+    """
+    Lấy giá trị số khác 0 đầu tiên theo thứ tự các cột ứng viên (vectorized).
+
+    Args:
+        df: DataFrame price_board
+        candidates: Danh sách tên cột theo thứ tự ưu tiên
+
+    Returns:
+        Mảng float64, 0 tại các dòng không có giá trị
+    """
+    result = np.zeros(len(df), dtype=np.float64)
+    for column in candidates:
+        if column not in df.columns:
+            continue
+        values = pd.to_numeric(df[column], errors='coerce').to_numpy(dtype=np.float64, na_value=0.0)
+        result = np.where(result != 0, result, values)
+    return result
+
+
+def _text_column(df, candidates):
+    for column in candidates:
+        if column in df.columns:
+            return df[column]
+    return None
+
+
+def price_board_columns(df, symbols=None):
+    """
+    Chuyển DataFrame price_board thành các cột giá đã chuẩn hoá.
+
+    Args:
+        df: DataFrame price_board (MultiIndex hoặc cột phẳng)
+        symbols: Danh sách mã đã yêu cầu, dùng theo vị trí khi thiếu cột symbol
+
+    Returns:
+        Dict {trường: giá trị}: "symbol"/"exchange" là list, các trường số là mảng NumPy
+    """
+    if df is None or df.empty:
+        return {
+            "symbol": [], "exchange": [],
+            "price": np.zeros(0), "ref_price": np.zeros(0), "change": np.zeros(0),
+            "pct_change": np.zeros(0), "volume": np.zeros(0, dtype=np.int64)
+        }
+
+    count = len(df)
+    symbol_col = _text_column(df, SYMBOL_COLUMNS)
+    if symbol_col is not None:
+        symbol_values = symbol_col.fillna('').astype(str).str.strip().str.upper().tolist()
+    else:
+        symbol_values = [''] * count
+    if symbols:
+        # Dòng thiếu mã thì lấy theo vị trí trong danh sách yêu cầu
+        symbol_values = [
+            value or (str(symbols[pos]).upper() if pos < len(symbols) else 'N/A')
+            for pos, value in enumerate(symbol_values)
+        ]
+    else:
+        symbol_values = [value or 'N/A' for value in symbol_values]
+
+    exchange_col = _text_column(df, EXCHANGE_COLUMNS)
+    if exchange_col is not None:
+        exchange_values = exchange_col.where(exchange_col.notna(), None).tolist()
+    else:
+        exchange_values = [None] * count
+
+    price = _numeric_column(df, PRICE_COLUMNS)
+    ref_price = _numeric_column(df, REF_PRICE_COLUMNS)
+    match_price = _numeric_column(df, PRICE_COLUMNS[:1])
+    volume = _numeric_column(df, VOLUME_COLUMNS)
+
+    # change = match_price - ref_price khi cả hai khác 0
+    has_both = (match_price != 0) & (ref_price != 0)
+    change = np.where(has_both, match_price - ref_price, 0.0)
+
+    # pct_change = change / ref_price * 100 khi ref_price > 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        pct_change = np.where((ref_price > 0) & (change != 0), change / ref_price * 100, 0.0)
+    pct_change = np.round(pct_change, 2)
+
+    return {
+        "symbol": symbol_values,
+        "price": price,
+        "ref_price": ref_price,
+        "change": change,
+        "pct_change": pct_change,
+        "volume": volume.astype(np.int64),
+        "exchange": exchange_values,
+    }
+
+
+def normalize_price_board(df, symbols=None):
+    """
+    Chuyển DataFrame price_board thành danh sách bản ghi giá.
+
+    Args:
+        df: DataFrame price_board (MultiIndex hoặc cột phẳng)
+        symbols: Danh sách mã đã yêu cầu, dùng theo vị trí khi thiếu cột symbol
+
+    Returns:
+        List dict với các khoá trong QUOTE_FIELDS
+    """
+    if df is None or df.empty:
+        return []
+    columns = price_board_columns(df, symbols)
+    values = [
+        column if isinstance(column, list) else column.tolist()
+        for column in (columns[field] for field in QUOTE_FIELDS)
+    ]
+    return [dict(zip(QUOTE_FIELDS, row)) for row in zip(*values)]
@@ -0,0 +1,130 @@
+"""
+Cache giá cổ phiếu dùng chung cho toàn bộ tiến trình.
+
+Mỗi mã cổ phiếu được lưu một bản ghi price_board kèm thời điểm hết hạn.
+Cache giới hạn kích thước theo LRU và đếm số lần hit/miss để theo dõi. Bản ghi
+hết hạn chưa bị loại vẫn được giữ làm giá gần nhất đã biết khi upstream lỗi.
+"""
+import threading
+import time
+from collections import OrderedDict
+from trading_calendar import TradingCalendar
+
+
+class QuoteCache:
+    """
+    Cache theo từng mã cổ phiếu với TTL và cơ chế loại bỏ LRU.
+
+    Args:
+        max_size: Số mã tối đa được giữ trong cache
+        ttl: Thời gian sống (giây) của một bản ghi trong giờ giao dịch
+        closed_ttl: Giới hạn trên (giây) cho TTL ngoài giờ giao dịch; None để giữ
+            bản ghi tới phiên giao dịch kế tiếp
+        calendar: TradingCalendar xác định giờ giao dịch
+    """
+
+    def __init__(self, max_size=5000, ttl=3.0, closed_ttl=None, calendar=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.closed_ttl = closed_ttl
+        self.calendar = calendar or TradingCalendar()
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def current_ttl(self):
+        """
+        Trả về TTL áp dụng cho bản ghi mới tuỳ theo giờ giao dịch.
+
+        Ngoài phiên (nghỉ trưa, sau giờ đóng cửa, cuối tuần, ngày lễ) giá không
+        thay đổi nên bản ghi được giữ tới phiên kế tiếp.
+        """
+        if self.calendar.is_open():
+            return self.ttl
+        ttl = max(self.ttl, self.calendar.seconds_until_open())
+        return min(ttl, self.closed_ttl) if self.closed_ttl else ttl
+
+    def get_many(self, symbols):
+        """
+        Đọc nhiều mã cùng lúc.
+
+        Args:
+            symbols: Danh sách mã cổ phiếu (đã viết hoa)
+
+        Returns:
+            Tuple (dict các mã còn hạn trong cache, list các mã cần lấy từ upstream)
+        """
+        now = time.monotonic()
+        found = {}
+        missing = []
+        with self._lock:
+            for symbol in symbols:
+                entry = self._data.get(symbol)
+                if entry is not None and entry[0] > now:
+                    self._data.move_to_end(symbol)
+                    found[symbol] = entry[1]
+                    self.hits += 1
+                else:
+                    if symbol not in missing:
+                        missing.append(symbol)
+                    self.misses += 1
+        return found, missing
+
+    def get_stale(self, symbols, max_age=None):
+        """
+        Đọc bản ghi của các mã kể cả khi đã hết hạn (giá gần nhất đã biết).
+
+        Args:
+            symbols: Danh sách mã cổ phiếu (đã viết hoa)
+            max_age: Bỏ qua bản ghi được ghi cách đây quá số giây này (None: không giới hạn)
+
+        Returns:
+            Dict {mã cổ phiếu: bản ghi price_board}
+        """
+        now = time.monotonic()
+        found = {}
+        with self._lock:
+            for symbol in symbols:
+                entry = self._data.get(symbol)
+                if entry is not None and (max_age is None or now - entry[2] <= max_age):
+                    found[symbol] = entry[1]
+        return found
+
+    def set_many(self, items, ttl=None):
+        """
+        Ghi nhiều bản ghi vào cache.
+
+        Args:
+            items: Dict {mã cổ phiếu: bản ghi price_board}
+            ttl: TTL tuỳ chọn (giây), mặc định theo giờ giao dịch
+        """
+        now = time.monotonic()
+        expires_at = now + (ttl if ttl is not None else self.current_ttl())
+        with self._lock:
+            for symbol, value in items.items():
+                self._data[symbol] = (expires_at, value, now)
+                self._data.move_to_end(symbol)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Xoá toàn bộ cache (giữ nguyên bộ đếm)."""
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        """Thống kê hit/miss của cache."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "max_size": self.max_size,
+                "ttl": round(self.current_ttl(), 1),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / total, 4) if total else 0
+            }
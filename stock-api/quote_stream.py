@@ -0,0 +1,126 @@
+"""
+Đẩy giá realtime tới client qua Server-Sent Events.
+
+Hub nhận giá sau mỗi lượt poll của bảng giá dùng chung (market_poller), so sánh
+với lần trước và chỉ gửi các mã có thay đổi tới những client đăng ký mã đó.
+N client theo dõi cùng một mã không phát sinh thêm lời gọi upstream nào.
+"""
+import asyncio
+
+from responses import dumps
+
+# Các trường dùng để phát hiện thay đổi của một mã
+CHANGE_FIELDS = ("price", "ref_price", "change", "pct_change", "volume")
+
+
+class Subscription:
+    """
+    Một client đang theo dõi một tập mã.
+
+    Giá chờ gửi được gộp theo mã (chỉ giữ bản mới nhất), nên client chậm không
+    làm đầy bộ nhớ mà chỉ bỏ qua các bản trung gian.
+    """
+
+    def __init__(self, symbols):
+        self.symbols = frozenset(symbols)
+        self._pending = {}
+        self._event = asyncio.Event()
+
+    def push(self, quotes):
+        for quote in quotes:
+            if quote["symbol"] in self.symbols:
+                self._pending[quote["symbol"]] = quote
+        if self._pending:
+            self._event.set()
+
+    async def next(self, timeout):
+        """
+        Chờ các mã thay đổi.
+
+        Returns:
+            List bản ghi giá, rỗng nếu hết thời gian chờ
+        """
+        try:
+            await asyncio.wait_for(self._event.wait(), timeout)
+        except asyncio.TimeoutError:
+            return []
+        self._event.clear()
+        quotes, self._pending = list(self._pending.values()), {}
+        return quotes
+
+
+class QuoteStreamHub:
+    """
+    Bộ phát giá dùng chung cho mọi client SSE.
+
+    Hub không tự gọi upstream: giá được đưa vào qua publish() (listener của
+    MarketPoller), còn tracked_symbols() cho poller biết các mã cần theo dõi.
+    """
+
+    def __init__(self):
+        self._subscriptions = set()
+        self._latest = {}
+        self.sent = 0
+
+    def subscribe(self, symbols, initial=()):
+        """
+        Đăng ký theo dõi một tập mã.
+
+        Args:
+            symbols: Danh sách mã
+            initial: Giá đã biết của các mã, gửi ngay cho client mới
+
+        Returns:
+            Subscription
+        """
+        subscription = Subscription(symbols)
+        self._subscriptions.add(subscription)
+        self.publish(initial)
+        subscription.push([self._latest[s] for s in subscription.symbols if s in self._latest])
+        return subscription
+
+    def unsubscribe(self, subscription):
+        self._subscriptions.discard(subscription)
+
+    @property
+    def subscribers(self):
+        """Số client đang đăng ký."""
+        return len(self._subscriptions)
+
+    def tracked_symbols(self):
+        """Hợp các mã mà client đang theo dõi."""
+        symbols = set()
+        for subscription in self._subscriptions:
+            symbols |= subscription.symbols
+        return sorted(symbols)
+
+    def publish(self, quotes):
+        """
+        So sánh với giá đã biết và gửi các mã thay đổi tới client liên quan.
+
+        Returns:
+            List bản ghi giá đã thay đổi
+        """
+        changed = []
+        for quote in quotes:
+            previous = self._latest.get(quote["symbol"])
+            if previous is None or any(previous.get(f) != quote.get(f) for f in CHANGE_FIELDS):
+                self._latest[quote["symbol"]] = quote
+                changed.append(quote)
+        if changed:
+            for subscription in self._subscriptions:
+                subscription.push(changed)
+            self.sent += len(changed)
+        return changed
+
+    def stats(self):
+        return {
+            "subscribers": self.subscribers,
+            "tracked_symbols": len(self.tracked_symbols()),
+            "sent": self.sent
+        }
+
+
+def format_event(event, data):
+    """Định dạng một sự kiện SSE (data mã hoá bằng cùng bộ mã hoá với các response JSON)."""
+    return f"event: {event}\ndata: {dumps(data).decode()}\n\n"
@@ -0,0 +1,233 @@
+"""
+Bảng giá dạng cột dùng mảng NumPy.
+
+Mỗi mã được gán cố định một dòng (chỉ mục symbol -> dòng), các trường số được
+lưu trong từng mảng NumPy riêng và được cập nhật tại chỗ theo lô từ price_board.
+Lọc, sắp xếp và lấy top-N được thực hiện trên cả mảng thay vì trên list dict,
+chỉ những dòng được trả về mới được chuyển thành dict.
+
+Mỗi lần cập nhật có dòng thay đổi tăng phiên bản của bảng; dòng thay đổi được
+gắn phiên bản đó (row_version) để client chỉ lấy các mã thay đổi sau một cursor.
+"""
+import sys
+import time
+
+import numpy as np
+
+from price_board import QUOTE_FIELDS
+
+# Trường có thể dùng để sắp xếp / lấy top-N
+SORT_FIELDS = ("price", "change", "pct_change", "volume")
+
+# Trường dùng để phát hiện một mã có thay đổi sau khi cập nhật
+_CHANGE_FIELDS = ("price", "ref_price", "volume")
+
+# (tên cột, kiểu dữ liệu, giá trị mặc định)
+_COLUMNS = (
+    ("symbol", object, ""),
+    ("exchange", object, None),
+    ("price", np.float64, 0.0),
+    ("ref_price", np.float64, 0.0),
+    ("change", np.float64, 0.0),
+    ("pct_change", np.float64, 0.0),
+    ("volume", np.int64, 0),
+    ("timestamp", np.float64, 0.0),
+    ("row_version", np.int64, 0),
+)
+
+# Kiểu dữ liệu của cột chuỗi (symbol, exchange) khi ghi ra mảng structured
+_STR_DTYPE = "U16"
+
+
+class QuoteTable:
+    """
+    Bảng giá theo cột với các trường: price, ref_price, change, pct_change,
+    volume, exchange, timestamp (thời điểm cập nhật, epoch giây) và row_version
+    (phiên bản của bảng ở lần gần nhất dòng thay đổi).
+
+    Args:
+        capacity: Số dòng cấp phát ban đầu (tự tăng gấp đôi khi đầy)
+    """
+
+    def __init__(self, capacity=1024):
+        self._index = {}
+        self.size = 0
+        # Phiên bản bắt đầu từ thời điểm tạo bảng (ms) để cursor do tiến trình
+        # trước cấp luôn nhỏ hơn mọi phiên bản của bảng mới
+        self.version = int(time.time() * 1000)
+        self._allocate(max(int(capacity), 1))
+
+    def _allocate(self, capacity):
+        for name, dtype, fill in _COLUMNS:
+            array = np.full(capacity, fill, dtype=dtype)
+            current = getattr(self, name, None)
+            if current is not None:
+                array[:self.size] = current[:self.size]
+            setattr(self, name, array)
+
+    @property
+    def capacity(self):
+        return len(self.price)
+
+    def __len__(self):
+        return self.size
+
+    def __contains__(self, symbol):
+        return symbol in self._index
+
+    def rows(self, symbols):
+        """
+        Dòng của từng mã.
+
+        Returns:
+            Mảng int64 cùng thứ tự symbols, -1 với mã chưa có trong bảng
+        """
+        index = self._index
+        return np.fromiter((index.get(s, -1) for s in symbols), dtype=np.int64, count=len(symbols))
+
+    def _rows_for_update(self, symbols):
+        needed = self.size + sum(1 for s in symbols if s not in self._index)
+        if needed > self.capacity:
+            self._allocate(max(needed, self.capacity * 2))
+        rows = np.empty(len(symbols), dtype=np.int64)
+        for pos, symbol in enumerate(symbols):
+            row = self._index.get(symbol)
+            if row is None:
+                row = self.size
+                symbol = sys.intern(symbol)
+                self._index[symbol] = row
+                self.symbol[row] = symbol
+                self.size += 1
+            rows[pos] = row
+        return rows
+
+    def update(self, columns, timestamp):
+        """
+        Ghi một lô giá vào bảng (tại chỗ).
+
+        Args:
+            columns: Dict cột như price_board.price_board_columns trả về
+            timestamp: Thời điểm cập nhật (epoch giây)
+
+        Returns:
+            Mảng các dòng có giá trị thay đổi (kể cả mã mới)
+        """
+        symbols = columns["symbol"]
+        if not len(symbols):
+            return np.empty(0, dtype=np.int64)
+        rows = self._rows_for_update(symbols)
+
+        changed = self.timestamp[rows] == 0
+        for field in _CHANGE_FIELDS:
+            changed |= getattr(self, field)[rows] != columns[field]
+
+        self.price[rows] = columns["price"]
+        self.ref_price[rows] = columns["ref_price"]
+        self.change[rows] = columns["change"]
+        self.pct_change[rows] = columns["pct_change"]
+        self.volume[rows] = columns["volume"]
+        self.exchange[rows] = columns["exchange"]
+        self.timestamp[rows] = timestamp
+        if changed.any():
+            # Lượt cập nhật không đổi giá trị nào giữ nguyên phiên bản (ETag, cache response)
+            self.version += 1
+            self.row_version[rows[changed]] = self.version
+        return rows[changed]
+
+    def records(self, rows):
+        """Chuyển các dòng thành list dict với các khoá trong price_board.QUOTE_FIELDS."""
+        rows = np.asarray(rows, dtype=np.int64)
+        columns = (
+            self.symbol[rows].tolist(),
+            self.price[rows].tolist(),
+            self.ref_price[rows].tolist(),
+            self.change[rows].tolist(),
+            self.pct_change[rows].tolist(),
+            self.volume[rows].tolist(),
+            self.exchange[rows].tolist(),
+        )
+        return [dict(zip(QUOTE_FIELDS, values)) for values in zip(*columns)]
+
+    def select(self, mask=None, sort_by=None, descending=True, limit=None):
+        """
+        Lọc và sắp xếp các dòng của bảng.
+
+        Args:
+            mask: Mảng bool độ dài len(self) (None: mọi dòng)
+            sort_by: Một trong SORT_FIELDS (None: giữ thứ tự dòng)
+            descending: Sắp xếp giảm dần
+            limit: Số dòng tối đa; khi có sort_by chỉ sắp xếp phần top-N (argpartition)
+
+        Returns:
+            Mảng chỉ số dòng
+        """
+        rows = np.arange(self.size) if mask is None else np.flatnonzero(mask[:self.size])
+        if sort_by is None:
+            return rows if limit is None else rows[:limit]
+        if sort_by not in SORT_FIELDS:
+            raise ValueError(f"Không hỗ trợ sắp xếp theo '{sort_by}'")
+
+        keys = getattr(self, sort_by)[rows].astype(np.float64)
+        if descending:
+            keys = -keys
+        if limit is not None and limit < len(rows):
+            top = np.argpartition(keys, limit)[:limit]
+            return rows[top[np.argsort(keys[top], kind="stable")]]
+        return rows[np.argsort(keys, kind="stable")]
+
+    def changed_since(self, rows, cursor):
+        """
+        Lọc các dòng thay đổi sau phiên bản cursor.
+
+        Returns:
+            Tuple (mảng dòng, reset); reset=True khi cursor không hợp lệ (lớn hơn
+            phiên bản hiện tại) và toàn bộ rows được trả về
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        if cursor > self.version:
+            return rows, True
+        return rows[self.row_version[rows] > cursor], False
+
+    def to_array(self):
+        """
+        Sao chép các dòng đang dùng thành một mảng structured (mỗi cột một field),
+        dùng để ghi snapshot ra file .npy.
+        """
+        dtype = [(name, _STR_DTYPE if kind is object else kind) for name, kind, _ in _COLUMNS]
+        array = np.empty(self.size, dtype=dtype)
+        for name, kind, _ in _COLUMNS:
+            column = self.column(name)
+            array[name] = [value or "" for value in column.tolist()] if kind is object else column
+        return array
+
+    def load_array(self, array):
+        """
+        Ghi các dòng từ mảng structured (ví dụ snapshot đọc bằng np.load) vào bảng,
+        giữ nguyên timestamp và row_version đã lưu.
+
+        Returns:
+            Số dòng đã nạp
+        """
+        if not len(array):
+            return 0
+        rows = self._rows_for_update(array["symbol"].tolist())
+        for name, kind, _ in _COLUMNS[1:]:
+            if name not in array.dtype.names:
+                continue
+            values = array[name]
+            getattr(self, name)[rows] = [value or None for value in values.tolist()] if kind is object else values
+        # Cursor do tiến trình trước cấp vẫn hợp lệ với các row_version đã nạp
+        self.version = max(self.version, int(self.row_version[rows].max()))
+        return len(rows)
+
+    def column(self, name):
+        """View của một cột trên các dòng đang dùng."""
+        return getattr(self, name)[:self.size]
+
+    def stats(self):
+        return {
+            "rows": self.size,
+            "capacity": self.capacity,
+            "version": self.version,
+            "nbytes": int(sum(getattr(self, name).nbytes for name, dtype, _ in _COLUMNS if dtype is not object))
+        }
@@ -0,0 +1,242 @@
+"""
+Giới hạn tốc độ và circuit breaker cho các lời gọi upstream theo từng nguồn.
+
+Mỗi nguồn (TCBS, VCI, ...) có một token bucket giới hạn số lời gọi mỗi giây, và
+mỗi cặp (nguồn, loại lời gọi) có một circuit breaker: sau nhiều lỗi liên tiếp,
+breaker mở và mọi lời gọi đó tới nguồn thất bại ngay (không chờ timeout) cho tới
+khi hết thời gian nghỉ; khi đó một lời gọi thử được cho qua (half-open) để kiểm
+tra nguồn đã hồi phục chưa.
+"""
+import asyncio
+import time
+
+
+class RateLimitedError(Exception):
+    """Nguồn đã hết lượt gọi trong giới hạn tốc độ."""
+
+
+class CircuitOpenError(Exception):
+    """Circuit breaker của nguồn đang mở, lời gọi bị từ chối ngay."""
+
+
+class TokenBucket:
+    """
+    Token bucket: tối đa `burst` lời gọi liên tiếp, hồi `rate` lượt mỗi giây.
+
+    Lời gọi không có lượt ngay sẽ đặt trước lượt kế tiếp (số lượt có thể âm) rồi
+    chờ tới thời điểm đó, nên các lời gọi được phục vụ theo thứ tự đến (FIFO) và
+    lời gọi đến trước không bị lời gọi đến sau tranh mất lượt.
+
+    Args:
+        rate: Số lượt được cấp thêm mỗi giây
+        burst: Số lượt tối đa tích luỹ
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self):
+        """
+        Lấy một lượt nếu có.
+
+        Returns:
+            0 nếu lấy được, ngược lại số giây cần chờ tới khi có lượt
+        """
+        self._refill()
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0.0
+        return (1 - self._tokens) / self.rate
+
+    async def acquire(self, max_wait):
+        """
+        Đặt trước một lượt và chờ tới lượt, tối đa max_wait giây.
+
+        Raises:
+            RateLimitedError: Khi hàng chờ dài hơn max_wait giây
+        """
+        self._refill()
+        wait = max(0.0, (1 - self._tokens) / self.rate)
+        if wait > max_wait:
+            raise RateLimitedError(f"Vượt giới hạn {self.rate:g} lời gọi/giây")
+        self._tokens -= 1
+        if not wait:
+            return
+        try:
+            await asyncio.sleep(wait)
+        except BaseException:
+            # Bị huỷ khi đang chờ (timeout của request): trả lại lượt đã đặt
+            self._tokens += 1
+            raise
+
+    @property
+    def tokens(self):
+        self._refill()
+        return self._tokens
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker ba trạng thái: closed -> open (sau failure_threshold lỗi liên
+    tiếp) -> half_open (sau reset_timeout giây, cho một lời gọi thử) -> closed/open.
+
+    Args:
+        failure_threshold: Số lỗi liên tiếp để mở breaker
+        reset_timeout: Thời gian (giây) breaker mở trước khi cho lời gọi thử
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+        self.opened = 0
+        self.rejected = 0
+
+    @property
+    def state(self):
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            return self.HALF_OPEN
+        return self._state
+
+    def allow(self):
+        """
+        Kiểm tra lời gọi có được phép đi tiếp hay không.
+
+        Raises:
+            CircuitOpenError: Khi breaker đang mở (hoặc đã có lời gọi thử đang chạy)
+        """
+        state = self.state
+        if state == self.CLOSED:
+            return
+        if state == self.HALF_OPEN and not self._trial_in_flight:
+            self._state = self.HALF_OPEN
+            self._trial_in_flight = True
+            return
+        self.rejected += 1
+        retry_in = max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at))
+        raise CircuitOpenError(f"Circuit breaker đang mở, thử lại sau {retry_in:.0f}s")
+
+    def record_success(self):
+        self._state = self.CLOSED
+        self._failures = 0
+        self._trial_in_flight = False
+
+    def record_failure(self):
+        self._failures += 1
+        self._trial_in_flight = False
+        if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+            if self._state != self.OPEN:
+                self.opened += 1
+            self._state = self.OPEN
+            self._opened_at = time.monotonic()
+
+    def release(self):
+        """Kết thúc lời gọi không có kết luận (bị huỷ): cho phép lời gọi thử khác."""
+        self._trial_in_flight = False
+
+    def stats(self):
+        return {
+            "state": self.state,
+            "failures": self._failures,
+            "opened": self.opened,
+            "rejected": self.rejected
+        }
+
+
+class UpstreamGuard:
+    """
+    Token bucket cho từng nguồn và circuit breaker cho từng cặp (nguồn, loại lời gọi).
+
+    Args:
+        rate: Số lời gọi mỗi giây cho mỗi nguồn (0 để tắt giới hạn tốc độ)
+        burst: Số lời gọi liên tiếp tối đa cho mỗi nguồn
+        max_wait: Thời gian (giây) tối đa chờ lượt gọi trước khi báo RateLimitedError;
+            mỗi nguồn nhận tối đa burst + rate * max_wait lời gọi dồn cùng lúc
+        failure_threshold: Số lỗi liên tiếp để mở một breaker
+        reset_timeout: Thời gian (giây) breaker mở trước khi cho lời gọi thử
+    """
+
+    def __init__(self, rate=10.0, burst=20, max_wait=1.0, failure_threshold=5, reset_timeout=30.0):
+        self.rate = rate
+        self.burst = burst
+        self.max_wait = max_wait
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._buckets = {}
+        self._breakers = {}
+        self.rate_limited = 0
+
+    def breaker(self, source, method):
+        key = (source, method)
+        breaker = self._breakers.get(key)
+        if breaker is None:
+            breaker = self._breakers[key] = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+        return breaker
+
+    def bucket(self, source):
+        bucket = self._buckets.get(source)
+        if bucket is None:
+            bucket = self._buckets[source] = TokenBucket(self.rate, self.burst)
+        return bucket
+
+    async def acquire(self, source, method):
+        """
+        Xin phép gọi nguồn: kiểm tra breaker rồi chờ lượt trong token bucket.
+
+        Raises:
+            CircuitOpenError: Breaker của (nguồn, loại lời gọi) đang mở
+            RateLimitedError: Không có lượt gọi trong max_wait giây
+        """
+        breaker = self.breaker(source, method)
+        breaker.allow()
+        if self.rate <= 0:
+            return
+        try:
+            await self.bucket(source).acquire(self.max_wait)
+        except RateLimitedError:
+            self.rate_limited += 1
+            breaker.release()
+            raise
+        except BaseException:
+            # Không gọi upstream thì không kết luận được gì về nguồn
+            breaker.release()
+            raise
+
+    def record_success(self, source, method):
+        self.breaker(source, method).record_success()
+
+    def record_failure(self, source, method):
+        self.breaker(source, method).record_failure()
+
+    def release(self, source, method):
+        self.breaker(source, method).release()
+
+    def stats(self):
+        return {
+            "rate": self.rate,
+            "burst": self.burst,
+            "max_wait": round(self.max_wait, 2),
+            "rate_limited": self.rate_limited,
+            "tokens": {
+                source: round(bucket.tokens, 1) for source, bucket in self._buckets.items()
+            },
+            "breakers": {
+                f"{source}/{method}": breaker.stats()
+                for (source, method), breaker in self._breakers.items()
+            }
+        }
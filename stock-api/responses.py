@@ -0,0 +1,268 @@
+"""
+Mã hoá JSON cho response.
+
+Dùng orjson (nếu có) thay cho jsonable_encoder + json của thư viện chuẩn; kiểu
+số/ngày của NumPy và pandas được mã hoá trực tiếp. Các endpoint nóng trả về
+Response chứa sẵn bytes để bỏ qua jsonable_encoder, và có thể giữ lại bytes đã
+mã hoá theo phiên bản dữ liệu (snapshot version) để request sau không phải mã
+hoá lại khi dữ liệu chưa đổi.
+
+Mỗi body đã mã hoá kèm một ETag (hash nội dung); request có If-None-Match khớp
+nhận 304 không có body. Cache-Control max-age được đặt theo TTL của dữ liệu.
+
+Body từ COMPRESS_MIN_SIZE byte trở lên được nén gzip (hoặc brotli nếu đã cài
+gói brotli và client chấp nhận) với mức nén thấp để ưu tiên độ trễ; bản nén
+được giữ cùng body đã mã hoá nên snapshot trong cache chỉ bị nén một lần.
+"""
+import hashlib
+import json
+import os
+import zlib
+from collections import OrderedDict
+from datetime import date, datetime
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+from fastapi.responses import JSONResponse, Response
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Body nhỏ hơn ngưỡng này (byte) không được nén
+COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", "1024"))
+# Mức nén thấp: JSON lặp nhiều nên vẫn giảm mạnh kích thước mà tốn ít CPU
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "4"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "4"))
+
+
+def _gzip(body):
+    # wbits=31: định dạng gzip, header không chứa thời gian nên bản nén ổn định
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+    return compressor.compress(body) + compressor.flush()
+
+
+_COMPRESSORS = {"gzip": _gzip}
+if brotli is not None:
+    _COMPRESSORS["br"] = lambda body: brotli.compress(body, quality=BROTLI_QUALITY)
+
+# Thứ tự ưu tiên khi client chấp nhận nhiều kiểu nén
+_ENCODINGS = tuple(e for e in ("br", "gzip") if e in _COMPRESSORS)
+
+_compression_stats = {"responses": 0, "bytes_in": 0, "bytes_out": 0}
+
+
+@lru_cache(maxsize=64)
+def negotiate_encoding(accept_encoding):
+    """
+    Chọn kiểu nén từ header Accept-Encoding.
+
+    Returns:
+        "br", "gzip" hoặc None nếu client không chấp nhận kiểu nào
+    """
+    if not accept_encoding:
+        return None
+    accepted = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+    for encoding in _ENCODINGS:
+        if accepted.get(encoding, accepted.get("*", 0.0)) > 0:
+            return encoding
+    return None
+
+
+def compression_stats():
+    saved = _compression_stats["bytes_in"] - _compression_stats["bytes_out"]
+    return {
+        "encodings": list(_ENCODINGS),
+        "min_size": COMPRESS_MIN_SIZE,
+        "gzip_level": GZIP_LEVEL,
+        **_compression_stats,
+        "ratio": round(_compression_stats["bytes_out"] / _compression_stats["bytes_in"], 4)
+        if _compression_stats["bytes_in"] else None,
+        "bytes_saved": saved
+    }
+
+
+def _default(obj):
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if obj is pd.NaT:
+        return None
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    raise TypeError(f"Không mã hoá được kiểu {type(obj).__name__}")
+
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+    def dumps(content):
+        """Mã hoá content thành bytes JSON (UTF-8)."""
+        return orjson.dumps(content, default=_default, option=_ORJSON_OPTIONS)
+else:
+    def dumps(content):
+        """Mã hoá content thành bytes JSON (UTF-8)."""
+        return json.dumps(content, ensure_ascii=False, allow_nan=False, default=_default,
+                          separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse mã hoá bằng dumps() (orjson nếu có)."""
+
+    def render(self, content):
+        return dumps(content)
+
+
+class EncodedBody:
+    """Bytes JSON đã mã hoá cùng ETag tính từ nội dung và các bản nén."""
+
+    __slots__ = ("body", "etag", "_variants")
+
+    def __init__(self, body):
+        self.body = body
+        self.etag = '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+        self._variants = {}
+
+    def variant(self, encoding):
+        """Body nén theo encoding (nén lần đầu, các lần sau dùng lại)."""
+        data = self._variants.get(encoding)
+        if data is None:
+            data = _COMPRESSORS[encoding](self.body)
+            self._variants[encoding] = data
+        return data
+
+
+class ResponseCache:
+    """
+    Cache EncodedBody theo (khoá request, phiên bản dữ liệu).
+
+    Một khoá chỉ giữ bản của phiên bản mới nhất; khi dữ liệu đổi phiên bản,
+    bản cũ bị thay thế ở lần ghi tiếp theo.
+
+    Args:
+        max_entries: Số khoá tối đa (LRU)
+    """
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, version):
+        """EncodedBody của khoá nếu còn đúng phiên bản, ngược lại None."""
+        if version is None:
+            return None
+        entry = self._data.get(key)
+        if entry is None or entry[0] != version:
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key, version, encoded):
+        if version is None:
+            return
+        self._data[key] = (version, encoded)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+            "encoder": "orjson" if orjson is not None else "json",
+            "compression": compression_stats()
+        }
+
+
+def etag_matches(if_none_match, etag):
+    """So khớp header If-None-Match với ETag (so sánh yếu, hỗ trợ danh sách và '*')."""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+def encoded_response(encoded, request=None, max_age=None):
+    """
+    Response từ EncodedBody: nén theo Accept-Encoding nếu body đủ lớn, gắn ETag và
+    Cache-Control, trả 304 nếu client đã có đúng phiên bản (If-None-Match).
+
+    Args:
+        encoded: EncodedBody
+        request: Request hiện tại (để đọc Accept-Encoding, If-None-Match), tuỳ chọn
+        max_age: Số giây client/CDN được dùng lại response; 0 gửi no-cache, None thì không gửi Cache-Control
+    """
+    body = encoded.body
+    etag = encoded.etag
+    headers = {}
+    if len(body) >= COMPRESS_MIN_SIZE and _ENCODINGS:
+        # Cache/CDN phải tách bản nén và bản thường theo Accept-Encoding
+        headers["Vary"] = "Accept-Encoding"
+        encoding = negotiate_encoding(request.headers.get("accept-encoding")) if request is not None else None
+        if encoding is not None:
+            body = encoded.variant(encoding)
+            # Mỗi bản nén là một biểu diễn khác nên có ETag riêng
+            etag = f'{etag[:-1]}-{encoding}"'
+            headers["Content-Encoding"] = encoding
+    headers["ETag"] = etag
+    if max_age is not None:
+        # max-age 0: không cho cache dùng lại mà không hỏi lại (vẫn có thể nhận 304)
+        headers["Cache-Control"] = f"public, max-age={int(max_age)}" if int(max_age) > 0 else "no-cache"
+    if request is not None and etag_matches(request.headers.get("if-none-match"), etag):
+        headers.pop("Content-Encoding", None)
+        return Response(status_code=304, headers=headers)
+    if "Content-Encoding" in headers:
+        _compression_stats["responses"] += 1
+        _compression_stats["bytes_in"] += len(encoded.body)
+        _compression_stats["bytes_out"] += len(body)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def json_response(content, cache=None, key=None, version=None, request=None, max_age=None):
+    """
+    Mã hoá content một lần và trả về Response (bỏ qua jsonable_encoder).
+
+    Args:
+        content: Dữ liệu trả về
+        cache: ResponseCache để lưu bytes đã mã hoá (tuỳ chọn)
+        key: Khoá request trong cache
+        version: Phiên bản dữ liệu; None thì không lưu cache
+        request: Request hiện tại, dùng cho If-None-Match
+        max_age: Giá trị max-age của Cache-Control (giây)
+
+    Returns:
+        Response application/json (hoặc 304)
+    """
+    encoded = EncodedBody(dumps(content))
+    if cache is not None:
+        cache.put(key, version, encoded)
+    return encoded_response(encoded, request, max_age)
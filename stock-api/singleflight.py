@@ -0,0 +1,67 @@
+"""
+Gộp các lời gọi upstream giống nhau đang chạy đồng thời (single-flight).
+
+Khi nhiều request cùng lúc yêu cầu một dữ liệu (cùng nguồn, cùng tập mã,
+cùng loại endpoint), chỉ request đầu tiên thực sự gọi vnstock; các request
+còn lại chờ và nhận chung kết quả (hoặc chung lỗi).
+"""
+import asyncio
+
+
+def flight_key(kind, source, symbols, *extra):
+    """
+    Tạo khoá single-flight.
+
+    Args:
+        kind: Loại lời gọi upstream (ví dụ: "price_board", "history")
+        source: Nguồn dữ liệu
+        symbols: Danh sách mã chứng khoán (thứ tự không quan trọng)
+        extra: Các tham số bổ sung phân biệt lời gọi
+
+    Returns:
+        Tuple có thể dùng làm khoá dict
+    """
+    return (kind, str(source).upper(), tuple(sorted(set(symbols)))) + tuple(extra)
+
+
+class SingleFlight:
+    """
+    Đảm bảo mỗi khoá chỉ có tối đa một lời gọi upstream đang chạy.
+
+    Lời gọi được chạy trong một task riêng nên request khởi tạo bị huỷ
+    (client ngắt kết nối) cũng không làm hỏng kết quả của các request đang chờ.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self.executed = 0
+        self.shared = 0
+
+    async def do(self, key, fn, *args, **kwargs):
+        """
+        Chạy coroutine fn(*args, **kwargs) hoặc chờ lời gọi đang chạy với cùng khoá.
+
+        Args:
+            key: Khoá single-flight (xem flight_key)
+            fn: Coroutine function gọi upstream
+
+        Returns:
+            Kết quả của lời gọi (dùng chung giữa các request đang chờ)
+        """
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn(*args, **kwargs))
+            self._calls[key] = task
+            task.add_done_callback(lambda _t: self._calls.pop(key, None))
+            self.executed += 1
+        else:
+            self.shared += 1
+        return await asyncio.shield(task)
+
+    def stats(self):
+        """Thống kê số lời gọi thực thi và số lời gọi được gộp."""
+        return {
+            "in_flight": len(self._calls),
+            "executed": self.executed,
+            "shared": self.shared
+        }
@@ -0,0 +1,151 @@
+"""
+Snapshot bảng giá trong bộ nhớ ra đĩa để khởi động lại có dữ liệu ngay.
+
+Bảng giá (market_poller.MarketPoller.table) được ghi định kỳ thành một file .npy
+dạng mảng structured (mỗi cột một field, không nén) bằng cách ghi file tạm rồi
+đổi tên, nên file luôn ở trạng thái hoàn chỉnh. Khi khởi động, file được mở bằng
+memory map và nạp thẳng vào các cột của bảng trước khi vòng poll chạy, nên các
+endpoint giá trả lời ngay trong khi lượt poll đầu tiên cập nhật lại bảng ở nền.
+"""
+import asyncio
+import os
+import time
+
+import numpy as np
+
+from logging_config import get_logger
+
+logger = get_logger("snapshot")
+
+
+class BoardSnapshot:
+    """
+    Ghi/nạp snapshot của bảng giá.
+
+    Args:
+        root: Thư mục lưu snapshot
+        poller: MarketPoller có bảng giá cần lưu
+        interval: Chu kỳ ghi snapshot (giây); chỉ ghi khi có lượt poll mới hoặc bảng thay đổi
+        max_age: Giá trong snapshot cập nhật trong vòng số giây này được phục vụ
+            như giá mới cho tới khi lượt poll đầu tiên hoàn tất
+    """
+
+    def __init__(self, root, poller, interval=60.0, max_age=900.0):
+        self.root = root
+        self.poller = poller
+        self.interval = interval
+        self.max_age = max_age
+        self.path = os.path.join(root, "quotes.npy")
+        self._task = None
+        self._saved_version = None
+        self.loaded = 0
+        self.saves = 0
+        self.last_saved_at = None
+        self.last_error = None
+
+    def load(self):
+        """
+        Nạp snapshot vào bảng giá nếu có file.
+
+        Returns:
+            Số mã đã nạp
+        """
+        if not os.path.exists(self.path):
+            return 0
+        started = time.monotonic()
+        try:
+            array = np.load(self.path, mmap_mode="r")
+            self.loaded = self.poller.restore(array, self.max_age)
+        except Exception as e:
+            self.last_error = str(e)
+            logger.warning("Không đọc được snapshot %s: %s", self.path, e)
+            return 0
+        self._saved_version = self._version()
+        logger.info("Đã nạp %d mã từ snapshot %s (%.3fs, lưu cách đây %.0fs)", self.loaded, self.path,
+                    time.monotonic() - started, time.time() - os.path.getmtime(self.path))
+        return self.loaded
+
+    def _write(self, array):
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.save(f, array)
+        os.replace(tmp_path, self.path)
+
+    def _version(self):
+        # Bảng giữ nguyên phiên bản khi lượt poll không đổi giá, nhưng timestamp
+        # (độ mới của giá) vẫn cần được lưu
+        return self.poller.table.version, self.poller.last_poll_at
+
+    def _take(self):
+        if not len(self.poller.table) or self._version() == self._saved_version:
+            return None, None
+        return self.poller.table.to_array(), self._version()
+
+    def _saved(self, version):
+        self._saved_version = version
+        self.saves += 1
+        self.last_saved_at = time.time()
+        self.last_error = None
+
+    async def save(self):
+        """
+        Ghi snapshot nếu bảng giá thay đổi kể từ lần ghi trước.
+
+        Bảng được sao chép trên event loop (nơi vòng poll cập nhật bảng), phần ghi
+        file chạy trên thread pool mặc định.
+
+        Returns:
+            True nếu đã ghi
+        """
+        array, version = self._take()
+        if array is None:
+            return False
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, self._write, array)
+        except Exception as e:
+            self.last_error = str(e)
+            logger.warning("Không ghi được snapshot %s: %s", self.path, e)
+            return False
+        self._saved(version)
+        return True
+
+    def save_now(self):
+        """Ghi snapshot đồng bộ (dùng khi tắt service)."""
+        array, version = self._take()
+        if array is None:
+            return
+        try:
+            self._write(array)
+        except Exception as e:
+            logger.warning("Không ghi được snapshot %s: %s", self.path, e)
+            return
+        self._saved(version)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.save()
+
+    def start(self):
+        """Nạp snapshot (nếu có) và khởi chạy task ghi định kỳ."""
+        self.load()
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+
+    def stop(self):
+        """Dừng task ghi định kỳ và ghi snapshot lần cuối."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self.save_now()
+
+    def stats(self):
+        return {
+            "path": self.path,
+            "loaded": self.loaded,
+            "saves": self.saves,
+            "last_saved_at": self.last_saved_at,
+            "interval": self.interval,
+            "last_error": self.last_error
+        }
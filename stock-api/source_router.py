@@ -0,0 +1,264 @@
+"""
+Chọn nguồn dữ liệu (TCBS, VCI, ...) cho các lời gọi vnstock theo tình trạng từng nguồn.
+
+Router theo dõi độ trễ và tỉ lệ lỗi (trung bình trượt EWMA) cho từng cặp
+(nguồn, loại lời gọi), sắp xếp các nguồn từ tốt tới kém và:
+- chuyển sang nguồn kế tiếp ngay khi nguồn đang gọi lỗi (failover);
+- gửi thêm một request dự phòng tới nguồn kế tiếp khi nguồn đang gọi chậm hơn
+  ngân sách độ trễ (hedged request), lấy kết quả về trước và huỷ phần còn lại.
+
+Nhờ vậy một nguồn chậm hoặc lỗi không còn quyết định độ trễ của cả service.
+Khi có resilience.UpstreamGuard, nguồn đang mở breaker hoặc hết lượt gọi bị bỏ
+qua ngay (chuyển sang nguồn kế tiếp) mà không tính vào số liệu của nguồn.
+"""
+import asyncio
+import time
+
+from logging_config import get_logger
+from resilience import CircuitOpenError, RateLimitedError
+
+logger = get_logger("router")
+
+# Độ trễ giả định (giây) cho nguồn chưa có số liệu, đủ thấp để nguồn mới vẫn được thử
+_UNKNOWN_LATENCY = 1.0
+
+
+class SourceHealth:
+    """Số liệu EWMA của một cặp (nguồn, loại lời gọi)."""
+
+    __slots__ = ("latency", "error_rate", "calls", "errors", "consecutive_errors", "last_error_at", "last_error")
+
+    def __init__(self):
+        self.latency = None
+        self.error_rate = 0.0
+        self.calls = 0
+        self.errors = 0
+        self.consecutive_errors = 0
+        self.last_error_at = None
+        self.last_error = None
+
+    def record(self, latency, ok, alpha):
+        if latency is not None:
+            self.latency = latency if self.latency is None else (1 - alpha) * self.latency + alpha * latency
+        if ok is None:
+            return
+        self.calls += 1
+        self.error_rate = (1 - alpha) * self.error_rate + alpha * (0.0 if ok else 1.0)
+        if ok:
+            self.consecutive_errors = 0
+        else:
+            self.errors += 1
+            self.consecutive_errors += 1
+            self.last_error_at = time.monotonic()
+
+    def stats(self):
+        return {
+            "latency": None if self.latency is None else round(self.latency, 3),
+            "error_rate": round(self.error_rate, 4),
+            "calls": self.calls,
+            "errors": self.errors,
+            "consecutive_errors": self.consecutive_errors,
+            "last_error": self.last_error
+        }
+
+
+class SourceRouter:
+    """
+    Định tuyến lời gọi upstream tới nguồn tốt nhất, có failover và hedged request.
+
+    Args:
+        sources: Dict {loại lời gọi: danh sách nguồn ứng viên}
+        alpha: Hệ số EWMA cho độ trễ và tỉ lệ lỗi
+        preferred_weight: Hệ số nhân điểm của nguồn client yêu cầu (< 1 để ưu tiên nguồn đó)
+        hedge_factor: Ngân sách độ trễ = hedge_factor x độ trễ EWMA của nguồn đang gọi
+        hedge_min: Ngân sách độ trễ tối thiểu (giây)
+        hedge_max: Ngân sách độ trễ tối đa (giây), cũng dùng khi nguồn chưa có số liệu
+        max_hedges: Số request dự phòng tối đa cho một lời gọi
+        max_consecutive_errors: Số lỗi liên tiếp để coi nguồn là không khoẻ
+        cooldown: Thời gian (giây) nguồn không khoẻ bị xếp cuối kể từ lỗi gần nhất
+        passthrough_errors: Các kiểu lỗi không phải do nguồn (ví dụ hàng đợi nội bộ đầy):
+            trả lỗi ngay, không failover và không tính vào tình trạng nguồn
+        guard: resilience.UpstreamGuard (giới hạn tốc độ + circuit breaker theo nguồn), tuỳ chọn
+    """
+
+    def __init__(self, sources, alpha=0.2, preferred_weight=0.5, hedge_factor=3.0,
+                 hedge_min=0.3, hedge_max=3.0, max_hedges=1, max_consecutive_errors=3,
+                 cooldown=30.0, passthrough_errors=(), guard=None):
+        self.sources = {method: tuple(s.upper() for s in candidates) for method, candidates in sources.items()}
+        self.alpha = alpha
+        self.preferred_weight = preferred_weight
+        self.hedge_factor = hedge_factor
+        self.hedge_min = hedge_min
+        self.hedge_max = hedge_max
+        self.max_hedges = max_hedges
+        self.max_consecutive_errors = max_consecutive_errors
+        self.cooldown = cooldown
+        self.passthrough_errors = tuple(passthrough_errors)
+        self.guard = guard
+        self._health = {}
+        self.failovers = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+
+    def health(self, source, method):
+        key = (source, method)
+        health = self._health.get(key)
+        if health is None:
+            health = self._health[key] = SourceHealth()
+        return health
+
+    def is_healthy(self, source, method):
+        health = self.health(source, method)
+        if health.consecutive_errors < self.max_consecutive_errors:
+            return True
+        return time.monotonic() - health.last_error_at >= self.cooldown
+
+    def score(self, source, method):
+        """Điểm của nguồn (càng thấp càng tốt): độ trễ EWMA phạt theo tỉ lệ lỗi."""
+        health = self.health(source, method)
+        latency = _UNKNOWN_LATENCY if health.latency is None else health.latency
+        return latency / (1.0 - min(health.error_rate, 0.9))
+
+    def order(self, method, preferred=None):
+        """
+        Các nguồn theo thứ tự sẽ thử cho một lời gọi.
+
+        Nguồn khoẻ đứng trước nguồn không khoẻ, trong mỗi nhóm sắp theo điểm;
+        nguồn client yêu cầu được giảm điểm theo preferred_weight.
+
+        Args:
+            method: Loại lời gọi (ví dụ "history", "price_board")
+            preferred: Nguồn client yêu cầu (có thể nằm ngoài danh sách ứng viên)
+        """
+        preferred = preferred.upper() if preferred else None
+        candidates = list(self.sources.get(method, ()))
+        if preferred and preferred not in candidates:
+            candidates.insert(0, preferred)
+
+        def _key(source):
+            score = self.score(source, method)
+            if source == preferred:
+                score *= self.preferred_weight
+            return (not self.is_healthy(source, method), score)
+
+        return sorted(candidates, key=_key)
+
+    def hedge_delay(self, source, method):
+        health = self.health(source, method)
+        if health.latency is None:
+            return self.hedge_max
+        return max(self.hedge_min, min(self.hedge_max, self.hedge_factor * health.latency))
+
+    async def _timed(self, source, method, fn):
+        if self.guard is not None:
+            # Breaker mở hoặc hết lượt gọi: lỗi ngay (CircuitOpenError/RateLimitedError)
+            await self.guard.acquire(source, method)
+        started = time.monotonic()
+        try:
+            result = await fn(source)
+        except self.passthrough_errors:
+            if self.guard is not None:
+                self.guard.release(source, method)
+            raise
+        except asyncio.CancelledError:
+            # Request bị huỷ vì nguồn khác trả về trước: vẫn ghi nhận độ trễ tối thiểu
+            self.health(source, method).record(time.monotonic() - started, None, self.alpha)
+            if self.guard is not None:
+                self.guard.release(source, method)
+            raise
+        except Exception as e:
+            health = self.health(source, method)
+            health.record(time.monotonic() - started, False, self.alpha)
+            health.last_error = f"{type(e).__name__}: {e}"[:200]
+            if self.guard is not None:
+                self.guard.record_failure(source, method)
+            raise
+        self.health(source, method).record(time.monotonic() - started, True, self.alpha)
+        if self.guard is not None:
+            self.guard.record_success(source, method)
+        return result
+
+    async def call(self, method, fn, preferred=None):
+        """
+        Gọi fn(source) với nguồn tốt nhất, failover và hedge sang các nguồn kế tiếp.
+
+        Args:
+            method: Loại lời gọi
+            fn: Coroutine function nhận tên nguồn
+            preferred: Nguồn client yêu cầu
+
+        Returns:
+            Tuple (kết quả, nguồn đã trả kết quả)
+
+        Raises:
+            Lỗi của nguồn cuối cùng khi mọi nguồn đều lỗi
+        """
+        queue = self.order(method, preferred)
+        primary = queue[0]
+        pending = {}
+        hedges = 0
+        last_error = None
+
+        def _launch():
+            source = queue.pop(0)
+            pending[asyncio.ensure_future(self._timed(source, method, fn))] = source
+
+        _launch()
+        try:
+            while pending:
+                timeout = None
+                if queue and hedges < self.max_hedges and len(pending) == 1:
+                    timeout = self.hedge_delay(next(iter(pending.values())), method)
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    # Nguồn đang gọi chậm hơn ngân sách: gửi thêm request tới nguồn kế tiếp
+                    hedges += 1
+                    self.hedged += 1
+                    _launch()
+                    continue
+                for task in done:
+                    source = pending.pop(task)
+                    try:
+                        result = task.result()
+                    except self.passthrough_errors:
+                        raise
+                    except (CircuitOpenError, RateLimitedError) as e:
+                        last_error = e
+                        logger.debug("Bỏ qua nguồn %s cho %s: %s", source, method, e)
+                        continue
+                    except Exception as e:
+                        last_error = e
+                        logger.warning("%s từ nguồn %s lỗi: %s", method, source, e)
+                        continue
+                    if source != primary and hedges:
+                        self.hedge_wins += 1
+                    return result, source
+                if not pending and queue:
+                    self.failovers += 1
+                    _launch()
+            raise last_error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def stats(self):
+        methods = {}
+        for method, candidates in self.sources.items():
+            methods[method] = list(candidates)
+        for source, method in list(self._health):
+            # Cả các nguồn ngoài danh sách ứng viên mà client từng yêu cầu
+            if source not in methods.setdefault(method, []):
+                methods[method].append(source)
+        return {
+            "sources": {
+                method: [
+                    {"source": source, "healthy": self.is_healthy(source, method),
+                     **self.health(source, method).stats()}
+                    for source in sources
+                ]
+                for method, sources in methods.items()
+            },
+            "failovers": self.failovers,
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins
+        }
@@ -0,0 +1,146 @@
+"""
+Chỉ mục thông tin mã cổ phiếu (ngành, sàn, tên hiển thị) dùng chung cho mọi endpoint.
+
+Chỉ mục được xây dựng một lần khi import module và không thay đổi trong suốt
+vòng đời tiến trình, tra cứu theo mã là O(1).
+"""
+from collections import namedtuple
+from types import MappingProxyType
+
+UNCLASSIFIED = "Chưa phân loại"
+
+# Mã ngành -> tên ngành hiển thị (thứ tự này cũng là thứ tự ưu tiên khi một mã nằm ở nhiều ngành)
+INDUSTRY_NAMES = MappingProxyType({
+    "banking": "Ngân hàng",
+    "real_estate": "Bất động sản",
+    "manufacturing": "Sản xuất & Tiêu dùng",
+    "steel_mining": "Thép & Khai khoáng",
+    "oil_gas": "Dầu khí",
+    "technology": "Công nghệ",
+    "retail": "Bán lẻ",
+    "aviation_logistics": "Hàng không & Logistics",
+    "utilities": "Điện & Tiện ích",
+    "food_agriculture": "Thực phẩm & Nông nghiệp",
+})
+
+# Danh sách cổ phiếu Việt Nam theo ngành
+_INDUSTRY_LISTS = {
+    "banking": ["VCB", "BID", "CTG", "TCB", "MBB", "VPB", "ACB", "HDB", "STB", "TPB", "EIB", "SHB", "MSB", "OCB", "LPB", "NAB", "BAB", "ABB", "VBB"],
+    "real_estate": ["VIC", "VHM", "NVL", "VRE", "KDH", "DXG", "PDR", "BCM", "DIG", "HDG", "IJC", "KBC", "SCR", "CEO", "HDC", "NLG", "IDC", "CRE", "TDH"],
+    "manufacturing": ["VNM", "SAB", "MSN", "MML", "VIS", "CII", "DHG", "TRA", "BHN", "KDC", "MCH", "ANV", "SBT", "VCF", "BBC", "TAC", "DPM", "BMP", "VHG"],
+    "steel_mining": ["HPG", "HSG", "NKG", "TLH", "SMC", "VGS", "TVN", "KSB", "POM", "TIS", "DTL", "VCA", "TNA", "VNS", "CSM", "VCS", "SHI", "VGC"],
+    "oil_gas": ["GAS", "PLX", "PVS", "PVD", "PVC", "PVB", "BSR", "OIL", "PVT", "CNG", "PVG", "PSH", "PVX", "PGS", "PGD", "PGC", "PSW", "PGV"],
+    "technology": ["FPT", "CMG", "ELC", "ITD", "SAM", "VGI", "VTC", "VNG", "SFI", "VCS", "CMT", "CMX", "ICT", "TNG", "VTI", "VTS", "VDS", "VGT"],
+    "retail": ["MWG", "PNJ", "DGW", "FRT", "VGR", "AST", "SCS", "VDS", "TNG", "HAG", "VRE", "VGC", "VGS", "VGI", "VGT", "VGV", "VGX"],
+    "aviation_logistics": ["VJC", "HVN", "ACV", "VTP", "GMD", "VSC", "TCO", "STG", "TMS", "HAH", "VOS", "VTO", "VTG", "VTS", "VTV", "VTX", "VTY", "VTZ"],
+    "utilities": ["POW", "GEG", "PC1", "NT2", "SBA", "REE", "EVE", "VSH", "BWE", "TBC", "EVG", "EVS", "EVF", "GEX", "HND", "SJD", "QTP", "VSI"],
+    "food_agriculture": ["VHC", "BAF", "LAF", "HNG", "SLS", "FMC", "CAP", "LSS", "ASM", "HAP", "VNF", "VIF", "VCG", "VTF", "VFF", "VGF", "VHF", "VKF"],
+}
+INDUSTRY_SYMBOLS = MappingProxyType({key: tuple(symbols) for key, symbols in _INDUSTRY_LISTS.items()})
+
+# Số mã đầu tiên của mỗi ngành thuộc danh sách lõi mà /api/stocks/by-industry và
+# /api/stock/realtime vẫn dùng (giữ nguyên nội dung phản hồi của các endpoint này)
+_CORE_SIZES = {
+    "banking": 15,
+    "real_estate": 13,
+    "manufacturing": 13,
+    "steel_mining": 10,
+    "oil_gas": 10,
+    "technology": 10,
+    "retail": 10,
+    "aviation_logistics": 10,
+    "utilities": 10,
+    "food_agriculture": 10,
+}
+CORE_INDUSTRY_SYMBOLS = MappingProxyType({key: INDUSTRY_SYMBOLS[key][:size] for key, size in _CORE_SIZES.items()})
+
+# Danh sách cổ phiếu phổ biến theo sàn (dùng khi không lấy được danh sách niêm yết)
+HOSE_SYMBOLS = (
+    "VCB", "BID", "CTG", "TCB", "MBB", "VPB", "ACB", "HDB", "STB", "TPB",
+    "VIC", "VHM", "NVL", "VRE", "KDH", "DXG", "PDR", "BCM", "DIG", "HDG",
+    "VNM", "SAB", "MSN", "MML", "VIS", "CII", "DHG", "TRA", "BHN", "KDC",
+    "HPG", "HSG", "NKG", "TLH", "SMC", "VGS", "TVN", "KSB", "POM", "TIS",
+    "GAS", "PLX", "PVS", "PVD", "PVC", "PVB", "BSR", "OIL", "PVT", "CNG",
+    "FPT", "CMG", "ELC", "ITD", "SAM", "VGI", "VTC", "VNG", "SFI", "VCS",
+    "MWG", "PNJ", "DGW", "FRT", "VGR", "AST", "SCS", "VDS", "TNG", "HAG",
+    "VJC", "HVN", "ACV", "VTP", "GMD", "VSC", "TCO", "STG", "TMS", "HAH",
+    "POW", "GEG", "PC1", "NT2", "SBA", "REE", "EVE", "VSH", "BWE", "TBC",
+)
+HNX_SYMBOLS = (
+    "SHB", "MSB", "OCB", "LPB", "EIB", "NAB", "BAB", "ABB", "VBB",
+    "CEO", "HDC", "NLG", "IDC", "CRE", "TDH", "IJC", "KBC", "SCR",
+    "VHC", "BAF", "LAF", "HNG", "SLS", "FMC", "CAP", "LSS", "ASM", "HAP",
+    "DTL", "VCA", "TNA", "VNS", "CSM", "VCS", "SHI", "VGC",
+    "PVG", "PSH", "PVX", "PGS", "PGD", "PGC", "PSW", "PGV",
+    "CMT", "CMX", "ICT", "VTI", "VTS", "VDS", "VGT",
+)
+
+SymbolInfo = namedtuple("SymbolInfo", ["symbol", "industry_key", "industry", "exchange", "name"])
+
+
+def _build_index():
+    hnx = set(HNX_SYMBOLS)
+    index = {}
+    for key, symbols in INDUSTRY_SYMBOLS.items():
+        for symbol in symbols:
+            # Mã thuộc nhiều ngành thì giữ ngành xuất hiện đầu tiên
+            if symbol not in index:
+                index[symbol] = SymbolInfo(symbol, key, INDUSTRY_NAMES[key], "HNX" if symbol in hnx else "HOSE", symbol)
+    for symbol in HOSE_SYMBOLS + HNX_SYMBOLS:
+        if symbol not in index:
+            index[symbol] = SymbolInfo(symbol, None, UNCLASSIFIED, "HNX" if symbol in hnx else "HOSE", symbol)
+    return MappingProxyType(index)
+
+
+SYMBOL_INDEX = _build_index()
+
+# Các mã đã được phân ngành, sắp xếp theo alphabet
+CLASSIFIED_SYMBOLS = tuple(sorted(s for s, info in SYMBOL_INDEX.items() if info.industry_key))
+
+# Số mã theo ngành (mỗi mã chỉ được đếm ở ngành chính của nó)
+INDUSTRY_COUNTS = MappingProxyType({
+    name: sum(1 for info in SYMBOL_INDEX.values() if info.industry == name)
+    for name in list(INDUSTRY_NAMES.values()) + [UNCLASSIFIED]
+})
+
+
+# Các mã thuộc danh sách lõi, sắp xếp theo alphabet
+CORE_CLASSIFIED_SYMBOLS = tuple(sorted({s for symbols in CORE_INDUSTRY_SYMBOLS.values() for s in symbols}))
+
+
+def _build_core_index():
+    index = {}
+    for key, symbols in CORE_INDUSTRY_SYMBOLS.items():
+        for symbol in symbols:
+            index.setdefault(symbol, INDUSTRY_NAMES[key])
+    return MappingProxyType(index)
+
+
+_CORE_INDEX = _build_core_index()
+
+
+def lookup(symbol):
+    """
+    Tra cứu thông tin một mã cổ phiếu.
+
+    Args:
+        symbol: Mã chứng khoán (không phân biệt hoa thường)
+
+    Returns:
+        SymbolInfo; mã không có trong chỉ mục được trả về với ngành "Chưa phân loại"
+    """
+    key = str(symbol).upper().strip()
+    info = SYMBOL_INDEX.get(key)
+    if info is None:
+        return SymbolInfo(key, None, UNCLASSIFIED, None, key)
+    return info
+
+
+def industry_of(symbol):
+    """Tên ngành hiển thị của một mã cổ phiếu."""
+    return lookup(symbol).industry
+
+
+def core_industry_of(symbol):
+    """Tên ngành hiển thị của một mã theo danh sách lõi ("Chưa phân loại" nếu không thuộc danh sách)."""
+    return _CORE_INDEX.get(str(symbol).upper().strip(), UNCLASSIFIED)
@@ -0,0 +1,174 @@
+"""
+Lịch giao dịch chứng khoán Việt Nam (HOSE/HNX).
+
+Xác định thị trường đang mở hay đóng (ngoài phiên, nghỉ trưa, cuối tuần, ngày lễ)
+và thời điểm mở cửa tiếp theo, để các lớp cache và vòng poll kéo dài thời gian
+chờ tới phiên kế tiếp khi giá không thể thay đổi.
+
+Phiên giao dịch và ngày nghỉ có thể cấu hình bằng file JSON (TRADING_CALENDAR_FILE):
+
+    {
+        "sessions": [["09:00", "11:30"], ["13:00", "15:00"]],
+        "holidays": ["2026-02-16", "2026-02-17", "2026-04-27"]
+    }
+"""
+import json
+from datetime import date, datetime, time, timedelta, timezone
+
+from logging_config import get_logger
+
+logger = get_logger("calendar")
+
+# Việt Nam không áp dụng giờ mùa hè nên dùng offset cố định UTC+7
+VN_TZ = timezone(timedelta(hours=7))
+
+# Phiên sáng và phiên chiều, nghỉ trưa 11:30 - 13:00
+DEFAULT_SESSIONS = ((time(9, 0), time(11, 30)), (time(13, 0), time(15, 0)))
+
+# Ngày lễ dương lịch cố định hằng năm (tháng, ngày). Tết Nguyên đán, Giỗ Tổ
+# Hùng Vương và các ngày nghỉ bù thay đổi theo năm nên cần khai báo trong file.
+FIXED_HOLIDAYS = ((1, 1), (4, 30), (5, 1), (9, 2))
+
+# Giới hạn số ngày tìm phiên kế tiếp (tránh lặp vô hạn khi cấu hình sai)
+_MAX_LOOKAHEAD_DAYS = 400
+
+
+def _parse_time(value):
+    hour, minute = (int(part) for part in str(value).split(":")[:2])
+    return time(hour, minute)
+
+
+class TradingCalendar:
+    """
+    Lịch phiên giao dịch theo giờ Việt Nam.
+
+    Args:
+        sessions: Các phiên trong ngày dạng (giờ bắt đầu, giờ kết thúc)
+        holidays: Các ngày nghỉ (date hoặc chuỗi 'YYYY-MM-DD')
+        fixed_holidays: Các ngày lễ (tháng, ngày) lặp lại hằng năm
+    """
+
+    def __init__(self, sessions=DEFAULT_SESSIONS, holidays=(), fixed_holidays=FIXED_HOLIDAYS):
+        self.sessions = tuple(sorted(sessions))
+        self.holidays = frozenset(
+            day if isinstance(day, date) else date.fromisoformat(str(day)) for day in holidays
+        )
+        self.fixed_holidays = frozenset(fixed_holidays)
+
+    @classmethod
+    def from_file(cls, path):
+        """
+        Đọc lịch từ file JSON; thiếu khoá nào thì dùng giá trị mặc định khoá đó.
+
+        Returns:
+            TradingCalendar
+        """
+        with open(path, encoding="utf-8") as f:
+            config = json.load(f)
+        if isinstance(config, list):
+            config = {"holidays": config}
+        sessions = DEFAULT_SESSIONS
+        if config.get("sessions"):
+            sessions = [(_parse_time(start), _parse_time(end)) for start, end in config["sessions"]]
+        return cls(sessions=sessions, holidays=config.get("holidays", ()))
+
+    @staticmethod
+    def now():
+        return datetime.now(VN_TZ)
+
+    def _local(self, now):
+        now = now or self.now()
+        if now.tzinfo is None:
+            return now.replace(tzinfo=VN_TZ)
+        return now.astimezone(VN_TZ)
+
+    def is_trading_day(self, day):
+        """Ngày có giao dịch hay không (không phải cuối tuần hoặc ngày nghỉ)."""
+        return (day.weekday() < 5
+                and day not in self.holidays
+                and (day.month, day.day) not in self.fixed_holidays)
+
+    def is_open(self, now=None):
+        """
+        Thị trường có đang trong phiên giao dịch hay không.
+
+        Args:
+            now: Thời điểm cần kiểm tra (mặc định: hiện tại theo giờ Việt Nam)
+        """
+        now = self._local(now)
+        if not self.is_trading_day(now.date()):
+            return False
+        current = now.time()
+        return any(start <= current < end for start, end in self.sessions)
+
+    def next_open(self, now=None):
+        """
+        Thời điểm bắt đầu phiên giao dịch kế tiếp (chính `now` nếu đang trong phiên).
+
+        Returns:
+            datetime theo giờ Việt Nam, None nếu không tìm thấy phiên nào
+        """
+        now = self._local(now)
+        if self.is_open(now):
+            return now
+        for offset in range(_MAX_LOOKAHEAD_DAYS):
+            day = now.date() + timedelta(days=offset)
+            if not self.is_trading_day(day):
+                continue
+            for start, _ in self.sessions:
+                candidate = datetime.combine(day, start, tzinfo=VN_TZ)
+                if candidate > now:
+                    return candidate
+        return None
+
+    def last_close(self, now=None):
+        """
+        Thời điểm kết thúc phiên giao dịch gần nhất đã qua.
+
+        Returns:
+            datetime theo giờ Việt Nam, None nếu không tìm thấy phiên nào
+        """
+        now = self._local(now)
+        for offset in range(_MAX_LOOKAHEAD_DAYS):
+            day = now.date() - timedelta(days=offset)
+            if not self.is_trading_day(day):
+                continue
+            for _, end in reversed(self.sessions):
+                candidate = datetime.combine(day, end, tzinfo=VN_TZ)
+                if candidate <= now:
+                    return candidate
+        return None
+
+    def seconds_until_open(self, now=None):
+        """Số giây tới phiên kế tiếp (0 nếu đang trong phiên)."""
+        now = self._local(now)
+        next_open = self.next_open(now)
+        if next_open is None:
+            return float(_MAX_LOOKAHEAD_DAYS * 86400)
+        return max(0.0, (next_open - now).total_seconds())
+
+    def stats(self, now=None):
+        now = self._local(now)
+        next_open = self.next_open(now)
+        return {
+            "is_open": self.is_open(now),
+            "next_open": None if next_open is None else next_open.isoformat(),
+            "sessions": [f"{start:%H:%M}-{end:%H:%M}" for start, end in self.sessions],
+            "holidays": len(self.holidays)
+        }
+
+
+def load_calendar(path=None):
+    """
+    Tạo lịch giao dịch từ file cấu hình, dùng lịch mặc định nếu không có file
+    hoặc file không hợp lệ.
+    """
+    if not path:
+        return TradingCalendar()
+    try:
+        calendar = TradingCalendar.from_file(path)
+    except (OSError, ValueError, TypeError) as e:
+        logger.warning("Không đọc được lịch giao dịch %s, dùng lịch mặc định: %s", path, e)
+        return TradingCalendar()
+    logger.info("Đã nạp lịch giao dịch từ %s (%d ngày nghỉ)", path, len(calendar.holidays))
+    return calendar
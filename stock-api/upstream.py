@@ -0,0 +1,93 @@
+"""
+Executor riêng cho các lời gọi vnstock (HTTP blocking).
+
+Các endpoint async đẩy lời gọi vnstock sang một thread pool có kích thước
+cấu hình được, kèm timeout cho từng lời gọi và giới hạn số lời gọi đang chờ,
+để upstream chậm không chiếm hết threadpool mặc định của Starlette.
+"""
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class UpstreamBusyError(Exception):
+    """Hàng đợi lời gọi upstream đã đầy."""
+
+
+class UpstreamTimeoutError(Exception):
+    """Lời gọi upstream vượt quá thời gian cho phép."""
+
+
+class UpstreamExecutor:
+    """
+    Thread pool giới hạn cho các lời gọi vnstock.
+
+    Args:
+        max_workers: Số thread tối đa gọi upstream đồng thời
+        max_queue: Số lời gọi tối đa được xếp hàng chờ thread rảnh
+        timeout: Timeout mặc định (giây) cho mỗi lời gọi
+    """
+
+    def __init__(self, max_workers=16, max_queue=64, timeout=15.0):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="vnstock")
+        self._lock = threading.Lock()
+        self._pending = 0
+        self.rejected = 0
+        self.timeouts = 0
+
+    def _release(self, _future):
+        with self._lock:
+            self._pending -= 1
+
+    async def run(self, fn, *args, timeout=None, **kwargs):
+        """
+        Chạy fn(*args, **kwargs) trên executor và chờ kết quả.
+
+        Args:
+            fn: Hàm blocking cần chạy
+            timeout: Timeout (giây) cho lời gọi này, mặc định dùng self.timeout
+
+        Returns:
+            Kết quả của fn
+
+        Raises:
+            UpstreamBusyError: Khi số lời gọi đang chạy và chờ vượt giới hạn
+            UpstreamTimeoutError: Khi lời gọi không hoàn thành trong thời gian cho phép
+        """
+        with self._lock:
+            if self._pending >= self.max_workers + self.max_queue:
+                self.rejected += 1
+                raise UpstreamBusyError(f"Hàng đợi upstream đã đầy ({self._pending} lời gọi)")
+            self._pending += 1
+
+        # Bộ đếm chỉ giảm khi thread thực sự chạy xong, kể cả khi request đã timeout
+        future = self._executor.submit(functools.partial(fn, *args, **kwargs))
+        future.add_done_callback(self._release)
+
+        timeout = self.timeout if timeout is None else timeout
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+        except asyncio.TimeoutError:
+            with self._lock:
+                self.timeouts += 1
+            raise UpstreamTimeoutError(f"{getattr(fn, '__name__', 'upstream')} vượt quá {timeout}s")
+
+    def shutdown(self):
+        """Dừng executor, không chờ các lời gọi đang chạy."""
+        self._executor.shutdown(wait=False)
+
+    def stats(self):
+        """Thống kê trạng thái executor."""
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "timeout": self.timeout,
+                "pending": self._pending,
+                "rejected": self.rejected,
+                "timeouts": self.timeouts
+            }
@@ -82,6 +82,88 @@ async function checkStockApiHealth() {
     }
 }
 
+// Số mã tối đa trong một request batch (Stock API giới hạn bởi PRICE_BATCH_MAX_SYMBOLS, mặc định 500)
+const STOCK_API_BATCH_SIZE = parseInt(process.env.STOCK_API_BATCH_SIZE, 10) || 500;
+
+/**
+ * Lấy giá của một lô mã trong một request tới endpoint batch của Stock API (có retry).
+ * Response có trường `error` được coi là lỗi để retry và circuit breaker xử lý.
+ * Trả về Map symbol -> dữ liệu giá, chỉ gồm các mã lấy được giá.
+ */
+async function fetchStockPriceBatch(symbols) {
+    let retryCount = 0;
+    const maxRetries = 3;
+    const retryDelay = 2000; // 2 seconds
+
+    while (true) {
+        try {
+            const response = await axios.post(`${STOCK_API_URL}/batch`, { symbols }, {
+                timeout: 30000, // 30 second timeout cho cả lô
+                headers: {
+                    'User-Agent': 'VanLang-Budget-Scheduler/1.0'
+                }
+            });
+
+            if (response.data?.error) {
+                throw new Error(`Stock API batch error: ${response.data.error}`);
+            }
+            recordSuccess(); // Record successful API call
+
+            const prices = new Map();
+            for (const item of response.data?.prices || []) {
+                if (item.status === 'ok') {
+                    prices.set(item.symbol, item);
+                } else {
+                    logger.warn(`[Scheduler] No price for ${item.symbol}: ${item.error}`);
+                }
+            }
+            return prices;
+        } catch (error) {
+            retryCount++;
+            logger.warn(`[Scheduler] Batch price attempt ${retryCount}/${maxRetries} failed: ${error.message}`);
+
+            if (retryCount >= maxRetries) {
+                logger.error(`[Scheduler] All ${maxRetries} batch price attempts failed.`);
+                recordFailure(); // Record failure for circuit breaker
+                throw error;
+            }
+
+            // Wait before retry
+            await new Promise(resolve => setTimeout(resolve, retryDelay * retryCount));
+        }
+    }
+}
+
+/**
+ * Lấy giá của nhiều mã, chia thành các lô tối đa STOCK_API_BATCH_SIZE mã.
+ * Lô lỗi được bỏ qua; chỉ ném lỗi khi không lô nào lấy được giá.
+ * Trả về Map symbol -> dữ liệu giá, chỉ gồm các mã lấy được giá.
+ */
+async function fetchStockPrices(symbols) {
+    const prices = new Map();
+    let lastError = null;
+
+    for (let i = 0; i < symbols.length; i += STOCK_API_BATCH_SIZE) {
+        const batch = symbols.slice(i, i + STOCK_API_BATCH_SIZE);
+        try {
+            for (const [symbol, item] of await fetchStockPriceBatch(batch)) {
+                prices.set(symbol, item);
+            }
+        } catch (error) {
+            lastError = error;
+            if (!checkCircuitBreaker()) {
+                // Circuit breaker vừa mở: không gửi các lô còn lại
+                break;
+            }
+        }
+    }
+
+    if (lastError && !prices.size) {
+        throw lastError;
+    }
+    return prices;
+}
+
 /**
  * Cập nhật giá cổ phiếu định kỳ.
  * Chạy mỗi 2 phút.
@@ -114,61 +196,36 @@ const updateStockPricesJob = cron.schedule('*/2 * * * *', async () => {
         const uniqueSymbols = [...new Set(stockInvestments.map(inv => inv.symbol))].filter(Boolean);
         logger.info(`[Scheduler] Unique stock symbols to update: ${uniqueSymbols.join(', ')}`);
 
+        // Lấy giá của tất cả các mã theo lô
+        let prices;
+        try {
+            logger.info(`[Scheduler] Fetching prices for ${uniqueSymbols.length} symbols from ${STOCK_API_URL}/batch`);
+            prices = await fetchStockPrices(uniqueSymbols);
+        } catch (error) {
+            // Phân loại lỗi để xử lý phù hợp
+            if (error.code === 'ECONNREFUSED') {
+                logger.error('[Scheduler] Connection refused. Stock API may be down.');
+            } else if (error.code === 'ENOTFOUND') {
+                logger.error('[Scheduler] DNS resolution failed. Check stock API URL.');
+            } else if (error.code === 'ETIMEDOUT') {
+                logger.error('[Scheduler] Request timeout. Stock API is slow to respond.');
+            } else if (error.response) {
+                logger.error(`[Scheduler] HTTP ${error.response.status} error: ${error.response.statusText}`);
+            } else {
+                logger.error(`[Scheduler] Unexpected error fetching stock prices: ${error.message}`);
+            }
+            return;
+        }
+
         for (const symbol of uniqueSymbols) {
             try {
-                // ---- PHẦN GIẢ ĐỊNH CẦN THAY THẾ BẰNG LOGIC GỌI stock-api THỰC TẾ ----
-                // Giả sử stock-api có endpoint GET /price/:symbol
-                // const response = await axios.get(`${STOCK_API_URL}/price/${symbol}`);
-                // const newPrice = response.data.price;
-                // logger.info(`[Scheduler] Fetched price for ${symbol}: ${newPrice}`);
-
-                // ----- LOGIC MOCK CHO ĐẾN KHI CÓ stock-api -----
-                // const mockPrice = Math.random() * 100000 + 10000; // Giá ngẫu nhiên từ 10k đến 110k
-                // const newPrice = parseFloat(mockPrice.toFixed(2));
-                // logger.info(`[Scheduler] MOCK price for ${symbol}: ${newPrice}`);
-                // ----- KẾT THÚC LOGIC MOCK -----
-
-                // ----- LOGIC GỌI stock-api VỚI RETRY VÀ ERROR HANDLING -----
-                logger.info(`[Scheduler] Fetching price for symbol: ${symbol} from ${STOCK_API_URL}?symbol=${symbol}`);
-
-                let response;
-                let retryCount = 0;
-                const maxRetries = 3;
-                const retryDelay = 2000; // 2 seconds
-
-                while (retryCount < maxRetries) {
-                    try {
-                        response = await axios.get(`${STOCK_API_URL}`, {
-                            params: { symbol: symbol },
-                            timeout: 10000, // 10 second timeout
-                            headers: {
-                                'User-Agent': 'VanLang-Budget-Scheduler/1.0'
-                            }
-                        });
-                        recordSuccess(); // Record successful API call
-                        break; // Success, exit retry loop
-                    } catch (error) {
-                        retryCount++;
-                        logger.warn(`[Scheduler] Attempt ${retryCount}/${maxRetries} failed for ${symbol}: ${error.message}`);
-
-                        if (retryCount >= maxRetries) {
-                            logger.error(`[Scheduler] All ${maxRetries} attempts failed for ${symbol}. Skipping this symbol.`);
-                            recordFailure(); // Record failure for circuit breaker
-                            throw error; // Re-throw to be caught by outer try-catch
-                        }
-
-                        // Wait before retry
-                        await new Promise(resolve => setTimeout(resolve, retryDelay * retryCount));
-                    }
-                }
-
-                if (!response.data || response.data.price === null || response.data.price === undefined) {
-                    logger.warn(`[Scheduler] No price data received from API for ${symbol}. API Response:`, response.data);
+                const priceData = prices.get(symbol.toUpperCase());
+                if (!priceData || priceData.price === null || priceData.price === undefined) {
+                    logger.warn(`[Scheduler] No price data received from API for ${symbol}.`);
                     continue;
                 }
-                const newPrice = parseFloat(response.data.price);
+                const newPrice = parseFloat(priceData.price);
                 logger.info(`[Scheduler] Successfully fetched price for ${symbol}: ${newPrice}`);
-                // ----- KẾT THÚC LOGIC GỌI stock-api VỚI RETRY -----
 
                 if (typeof newPrice !== 'number' || isNaN(newPrice) || newPrice < 0) {
                     logger.warn(`[Scheduler] Invalid price received for ${symbol}: ${newPrice}. Skipping update.`);
@@ -223,18 +280,7 @@ const updateStockPricesJob = cron.schedule('*/2 * * * *', async () => {
                     }
                 }
             } catch (error) {
-                // Phân loại lỗi để xử lý phù hợp
-                if (error.code === 'ECONNREFUSED') {
-                    logger.error(`[Scheduler] Connection refused for ${symbol}. Stock API may be down.`);
-                } else if (error.code === 'ENOTFOUND') {
-                    logger.error(`[Scheduler] DNS resolution failed for ${symbol}. Check stock API URL.`);
-                } else if (error.code === 'ETIMEDOUT') {
-                    logger.error(`[Scheduler] Request timeout for ${symbol}. Stock API is slow to respond.`);
-                } else if (error.response) {
-                    logger.error(`[Scheduler] HTTP ${error.response.status} error for ${symbol}: ${error.response.statusText}`);
-                } else {
-                    logger.error(`[Scheduler] Unexpected error updating price for symbol ${symbol}: ${error.message}`);
-                }
+                logger.error(`[Scheduler] Unexpected error updating price for symbol ${symbol}: ${error.message}`);
 
                 // Log chi tiết cho debugging (chỉ khi cần)
                 if (process.env.NODE_ENV === 'development') {